@@ -0,0 +1,342 @@
+import abc
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from typing import BinaryIO, Dict, List, Optional
+
+
+# Directories no analyzer looks into.
+SKIP_DIRS = {".git", "node_modules"}
+# Build output is walked like any other directory (a payload can hide in a
+# published dist/ bundle); analyzers that only want sources drop it with
+# in_build_output().
+BUILD_DIRS = {"dist", "build", "out"}
+
+# Decompressed tarballs stay in memory up to this size, then spill to disk.
+TAR_SPOOL_MAX_MEMORY = 64 * 1024 * 1024
+
+
+class FileEntry:
+    """One file from the shared walk."""
+
+    __slots__ = ("path", "rel", "size", "mtime")
+
+    def __init__(self, path: str, rel: str, size: int, mtime: float):
+        self.path = path
+        self.rel = rel
+        self.size = size
+        self.mtime = mtime
+
+    def __repr__(self) -> str:
+        return f"FileEntry({self.rel!r}, size={self.size})"
+
+
+def _skipped(rel: str) -> bool:
+    return any(part in SKIP_DIRS for part in rel.split("/")[:-1])
+
+
+def in_build_output(rel: str) -> bool:
+    """True for a file under a dist/, build/ or out/ directory."""
+    return any(part in BUILD_DIRS for part in rel.split("/")[:-1])
+
+
+def _escapes(name: str) -> bool:
+    return name.startswith("/") or ".." in name.replace("\\", "/").split("/")
+
+
+class DirectoryFS:
+    """A plain directory on disk."""
+
+    is_archive = False
+
+    def __init__(self, root: str):
+        self.root = str(root)
+
+    def walk(self) -> List[FileEntry]:
+        # Same top-down order as os.walk, but one scandir per directory and
+        # one stat per file.
+        entries: List[FileEntry] = []
+        stack = [self.root]
+        while stack:
+            current = stack.pop()
+            subdirs = []
+            try:
+                with os.scandir(current) as it:
+                    for de in it:
+                        try:
+                            if de.is_dir():
+                                if de.name not in SKIP_DIRS:
+                                    subdirs.append(de.path)
+                            elif de.is_file():
+                                st = de.stat()
+                                rel = os.path.relpath(de.path, self.root).replace(os.sep, "/")
+                                entries.append(FileEntry(de.path, rel, st.st_size, st.st_mtime))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            stack.extend(reversed(subdirs))
+        return entries
+
+    def exists(self, rel: str) -> bool:
+        return os.path.isfile(os.path.join(self.root, rel))
+
+    def open(self, rel: str) -> BinaryIO:
+        return open(os.path.join(self.root, rel), "rb")
+
+    def materialize(self) -> str:
+        return self.root
+
+    def close(self):
+        pass
+
+
+class _ArchiveFS(abc.ABC):
+    """Shared logic for archives: members under one top-level folder
+    (npm's "package/", GitHub's "<repo>-<branch>/") are presented relative
+    to it, and materialize() extracts to a temp dir only when asked."""
+
+    is_archive = True
+
+    def __init__(self, archive_path: str):
+        self.archive_path = archive_path
+        self.root = archive_path
+        self._members: Optional[Dict[str, object]] = None
+        self._entries: List[FileEntry] = []
+        self._prefix = ""
+        self._materialized: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Open handles stay behind; a copy in another process reopens the archive.
+        state = dict(self.__dict__)
+        state["_members"] = None
+        state["_materialized"] = None
+        del state["_lock"]
+        self._drop_handles(state)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _drop_handles(self, state: Dict):
+        pass
+
+    @abc.abstractmethod
+    def _list(self) -> List[tuple]:
+        """(member name, size, mtime, member handle) for regular files."""
+
+    def _index(self) -> Dict[str, object]:
+        with self._lock:
+            if self._members is None:
+                # Entries that would escape the root are never presented (nor extracted).
+                listed = [m for m in self._list() if not _escapes(m[0])]
+                tops = {name.split("/", 1)[0] for name, _, _, _ in listed}
+                if len(tops) == 1 and all("/" in name for name, _, _, _ in listed):
+                    self._prefix = tops.pop() + "/"
+                self._members = {}
+                self._entries = []
+                for name, size, mtime, handle in listed:
+                    rel = name[len(self._prefix):]
+                    self._members[rel] = handle
+                    if not _skipped(rel):
+                        self._entries.append(FileEntry(f"{self.archive_path}!/{name}", rel, size, mtime))
+            return self._members
+
+    def walk(self) -> List[FileEntry]:
+        self._index()
+        return list(self._entries)
+
+    def exists(self, rel: str) -> bool:
+        return rel in self._index()
+
+    def materialize(self) -> str:
+        """Extract to a temp dir once (for tools like semgrep that need real files)."""
+        members = self._index()
+        with self._lock:
+            if self._materialized is None:
+                dest = tempfile.mkdtemp(prefix="scd-")
+                for rel in members:
+                    target = os.path.realpath(os.path.join(dest, rel))
+                    if not target.startswith(os.path.realpath(dest) + os.sep):
+                        continue
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with self._open_unlocked(rel) as src, open(target, "wb") as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                self._materialized = dest
+            return self._materialized
+
+    @abc.abstractmethod
+    def _open_unlocked(self, rel: str) -> BinaryIO:
+        """Open an indexed member for reading, without taking self._lock."""
+
+    def close(self):
+        if self._materialized is not None:
+            shutil.rmtree(self._materialized, ignore_errors=True)
+            self._materialized = None
+
+
+class _MemberReader(io.RawIOBase):
+    """Seekable read-only view of one member inside a shared file.
+
+    Every read seeks the shared file under the archive's lock, so several
+    analyzer threads can read different members at once."""
+
+    def __init__(self, shared, lock: threading.Lock, offset: int, size: int):
+        super().__init__()
+        self._shared = shared
+        self._lock = lock
+        self._offset = offset
+        self._size = size
+        self._pos = 0
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0 or self._pos + n > self._size:
+            n = self._size - self._pos
+        if n <= 0:
+            return b""
+        with self._lock:
+            self._shared.seek(self._offset + self._pos)
+            data = self._shared.read(n)
+        self._pos += len(data)
+        return data
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def seek(self, pos: int, whence: int = 0) -> int:
+        base = {0: 0, 1: self._pos, 2: self._size}[whence]
+        self._pos = max(0, min(base + pos, self._size))
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+
+class TarFS(_ArchiveFS):
+    """A .tgz/.tar.gz (or plain .tar) read in place.
+
+    The compressed stream is inflated once into a spooled temp file, after
+    which every member is a cheap seek away; nothing is extracted."""
+
+    def __init__(self, archive_path: str):
+        super().__init__(archive_path)
+        self._data = None
+        self._io_lock = threading.Lock()
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._io_lock = threading.Lock()
+
+    def _drop_handles(self, state: Dict):
+        state["_data"] = None
+        del state["_io_lock"]
+
+    def _list(self) -> List[tuple]:
+        spool = tempfile.SpooledTemporaryFile(max_size=TAR_SPOOL_MAX_MEMORY)
+        with open(self.archive_path, "rb") as raw:
+            magic = raw.read(2)
+            raw.seek(0)
+            src = gzip.GzipFile(fileobj=raw) if magic == b"\x1f\x8b" else raw
+            shutil.copyfileobj(src, spool, 1024 * 1024)
+        spool.seek(0)
+        self._data = spool
+        listed = []
+        with tarfile.open(fileobj=spool, mode="r:") as tar:
+            for member in tar:
+                if member.isfile():
+                    name = member.name[2:] if member.name.startswith("./") else member.name
+                    listed.append((name, member.size, float(member.mtime), (member.offset_data, member.size)))
+        return listed
+
+    def _open_unlocked(self, rel: str) -> BinaryIO:
+        offset, size = self._members[rel]
+        return _MemberReader(self._data, self._io_lock, offset, size)
+
+    def open(self, rel: str) -> BinaryIO:
+        members = self._index()
+        if rel not in members:
+            raise FileNotFoundError(rel)
+        return self._open_unlocked(rel)
+
+    def close(self):
+        super().close()
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+
+class ZipFS(_ArchiveFS):
+    """A .zip read in place; zipfile already supports concurrent member reads."""
+
+    def __init__(self, archive_path: str):
+        super().__init__(archive_path)
+        self._zip: Optional[zipfile.ZipFile] = None
+
+    def _drop_handles(self, state: Dict):
+        state["_zip"] = None
+
+    def _list(self) -> List[tuple]:
+        self._zip = zipfile.ZipFile(self.archive_path)
+        listed = []
+        for info in self._zip.infolist():
+            if info.is_dir():
+                continue
+            try:
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+            except (OverflowError, ValueError):
+                mtime = 0.0
+            listed.append((info.filename, info.file_size, mtime, info))
+        return listed
+
+    def _open_unlocked(self, rel: str) -> BinaryIO:
+        return self._zip.open(self._members[rel])
+
+    def open(self, rel: str) -> BinaryIO:
+        members = self._index()
+        if rel not in members:
+            raise FileNotFoundError(rel)
+        return self._open_unlocked(rel)
+
+    def close(self):
+        super().close()
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+
+def is_archive_file(path: str) -> bool:
+    """Whether open_archive() can read path: a zip, or a gzipped or plain tar."""
+    if zipfile.is_zipfile(path):
+        return True
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    try:
+        with tarfile.open(path, "r:gz" if magic == b"\x1f\x8b" else "r:"):
+            return True
+    except (tarfile.TarError, OSError, EOFError):
+        return False
+
+
+def open_archive(archive_path: str):
+    """TarFS or ZipFS for an archive file, picked by its magic bytes."""
+    with open(archive_path, "rb") as f:
+        magic = f.read(4)
+    if magic.startswith(b"PK"):
+        return ZipFS(archive_path)
+    return TarFS(archive_path)
@@ -0,0 +1,204 @@
+"""Build popular_npm.txt, the typosquat corpus, from published rankings and real trees.
+
+Rankings are top-package lists ordered most popular first: a JSON list
+(or {"packages": [...]}) of names or {"project": name} objects, as
+shipped by guarddog, or a text file in popular_npm.txt's own format. A
+name keeps its best position across the rankings (ties go to the list
+given first). Names from dependency trees (lockfiles, or directories
+searched for lockfiles and installed node_modules packages) that no
+ranking has follow, sorted. Names that are not valid npm names, lorem-
+ipsum filler published in bulk, and the reviewed spam in DENYLIST are
+dropped: anything in the corpus is trusted as a real package, and a
+typo of it is flagged.
+
+The bundled list was built from:
+
+  pip download guarddog==3.2.0 guarddog==2.0.0 guarddog==1.0.0 --no-deps
+  (each wheel's guarddog/analyzer/metadata/resources/top_npm_packages.json,
+  in that order, then the previous bundled list), plus
+  jupyterlab 4.6.4's sdist (jupyterlab/staging/yarn.lock), gradio 6.30.0's
+  sdist (its package-lock.json files) and the lib/node_modules trees of
+  Node.js 10, 12, 14, 16, 18, 20 and 22:
+
+  python analyzers/data/build_popular_npm.py \\
+      --ranking=top-3.2.0.json --ranking=top-2.0.0.json --ranking=top-1.0.0.json \\
+      --ranking=previous.txt jupyterlab-4.6.4 gradio-6.30.0 ~/.nvm/versions/node/*/lib/node_modules \\
+      > analyzers/data/popular_npm.txt
+
+Usage: python analyzers/data/build_popular_npm.py [--ranking=FILE]... [TREE_OR_LOCKFILE]...
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from analyzers.lockfile_parsers import iter_npm_lock, iter_pnpm_lock, iter_yarn_lock  # noqa: E402
+from analyzers.typo_index import parse_names  # noqa: E402
+
+
+HEADER = """\
+# Popular npm package names, most popular first.
+# Typosquat checks compare package names against this list; set
+# SCD_POPULAR_PACKAGES to a file in the same format (one name per line,
+# most popular first) to use a larger corpus.
+#
+# Generated by build_popular_npm.py (see its docstring for the sources):
+# published npm popularity rankings, a name keeping its best position in
+# any of them, followed by further packages from real dependency trees.
+# Names missing from this list look like typos of their popular
+# neighbours, so a larger list means fewer false positives.
+"""
+
+_VALID = re.compile(r"^(@[a-z0-9][a-z0-9._~-]*/)?[a-z0-9][a-z0-9._~-]*$")
+
+_LOCKFILES = {
+    "package-lock.json": iter_npm_lock,
+    "npm-shrinkwrap.json": iter_npm_lock,
+    ".package-lock.json": iter_npm_lock,
+    "yarn.lock": iter_yarn_lock,
+    "pnpm-lock.yaml": iter_pnpm_lock,
+}
+
+# Spam publishers fill the download rankings with names made of lorem
+# ipsum words ("@zitterorg/nisi-molestiae-ut"); three or more such words
+# are never a real package name.
+_LOREM = frozenset("""
+    a ab accusamus accusantium ad adipisci adipiscing alias aliqua aliquam aliquid amet anim animi aperiam
+    architecto asperiores aspernatur assumenda at atque aut aute autem beatae blanditiis cillum commodi
+    consectetur consequatur consequuntur corporis corrupti culpa cum cumque cupiditate cupidatat debitis
+    delectus deleniti deserunt dicta dignissimos distinctio dolor dolore dolorem doloremque dolores doloribus
+    dolorum ducimus ea eaque earum eius eiusmod eligendi elit enim eos error esse est et eum eveniet ex
+    excepteur excepturi exercitationem expedita explicabo facere facilis fuga fugiat fugit harum hic id illo
+    illum impedit in incididunt incidunt inventore ipsa ipsam ipsum irure iste itaque iure iusto labore
+    laboriosam laboris laborum laudantium libero lorem magna magnam magni maiores maxime minim minima minus
+    modi molestiae molestias mollit mollitia nam natus necessitatibus nemo neque nesciunt nihil nisi nobis
+    non nostrud nostrum nulla numquam obcaecati occaecat occaecati odio odit officia officiis omnis optio
+    pariatur perferendis perspiciatis placeat porro possimus praesentium proident provident quae quaerat
+    quam quas quasi qui quia quibusdam quidem quis quisquam quo quod quos ratione recusandae reiciendis rem
+    repellat repellendus reprehenderit repudiandae rerum saepe sapiente sed sequi similique sint sit soluta
+    sunt suscipit tempora tempore temporibus tenetur totam ullam ullamco unde ut vel velit veniam veritatis
+    vero vitae voluptas voluptate voluptatem voluptates voluptatibus voluptatum
+""".split())
+
+# Reviewed by hand: throwaway and spam packages that made the download
+# rankings (word-salad names, tutorial uploads, bot "web3" packages).
+DENYLIST = frozenset("""
+    @libphamton/chatfanpage @libphamton/fb-group @saeedha/math-first @saeedha/math-power
+    @saeedha/math-power-dev acertea aid-guard1 beauty-foot-compass5 boarding_pass_mint branch-body-web3-feel
+    chicken-fell-spread code-formlly color-pale-generatorly color_generator_complex corcojs-qrcode cucumberry
+    data-visualizer-csv deep-consist-ability3 dependents-zaty distance-its-clear-rate
+    electricity-death-web3-story eth-bsc-sniperbot feature-rising-small7 fluxmax form-valid-js
+    fresh-dangerous fur-race-web3-pale government-letter-web3-till hay-against-any-hurry honor-fresh-web3-leg
+    hope-slight-walk1 imagemanipulatorly lainan mental-oxygen-dozen mirror-jet-printed-supper
+    motor-positive-spirit move-wolf-throughout ndms npm-adaptiveme-nibble number-extrarandom-cli
+    polycalculator randomly-password-generator rarerteat react-easy-router react-random-number-generator
+    recall-shut-say round-number-cli sails-react scrape-tiktok slow-voice-spell-pass
+    snake-seven-recall-interior speed-cloudflare-cli spring-dust-wall-size strange-lady-riding9
+    sugar-policeman-entire tail-iron-became5 teanager team20 teapackage-1740 test-cutting text-summarizerly
+    textmoji tiktok-src tiktokapi-src tradingcalc train-stick-swept7 unusual-rope verum-cli victory-mouth
+    web3-be web3-compass web3-eve-cli web3-exactly6 web3-fruit web3finance
+""".split())
+
+
+def is_junk(name: str) -> bool:
+    """True for a name that must not be in the corpus."""
+    if not _VALID.match(name) or name in DENYLIST:
+        return True
+    words = re.split(r"[-_.]", name.rsplit("/", 1)[-1])
+    return len(words) >= 3 and all(w in _LOREM for w in words)
+
+
+def read_ranking(path: str) -> List[str]:
+    """Names of one ranking file, most popular first."""
+    with open(path, encoding="utf-8") as f:
+        if not path.endswith(".json"):
+            return parse_names(f)
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("packages", [])
+    names = []
+    for item in data:
+        name = item.get("project") if isinstance(item, dict) else item
+        if isinstance(name, str):
+            names.append(name.strip().lower())
+    return names
+
+
+def _registry_entry(meta: Dict) -> bool:
+    # Workspace links, git checkouts and local tarballs are not published names.
+    if meta.get("link"):
+        return False
+    resolved = meta.get("resolved")
+    return not resolved or (resolved.startswith(("http://", "https://")) and "/-/" in resolved)
+
+
+def _lockfile_names(path: str) -> Iterator[str]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for name, _, meta in _LOCKFILES[os.path.basename(path)](f):
+            if name and _registry_entry(meta):
+                yield name.lower()
+
+
+def _installed_name(path: str) -> str:
+    # ".../node_modules/@scope/name" -> "@scope/name"; "" outside node_modules
+    head, base = os.path.split(path)
+    head, scope = os.path.split(head)
+    if scope.startswith("@") and os.path.basename(head) == "node_modules":
+        return f"{scope}/{base}"
+    return base if scope == "node_modules" else ""
+
+
+def tree_names(path: str) -> Iterator[str]:
+    """Registry package names in a lockfile, or in a directory's lockfiles and installed packages."""
+    if os.path.isfile(path):
+        yield from _lockfile_names(path)
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name in _LOCKFILES:
+                yield from _lockfile_names(os.path.join(root, name))
+        # Only a package.json whose "name" matches where it is installed:
+        # fixtures and test packages nested inside a package don't count.
+        installed = _installed_name(root)
+        if installed and "package.json" in files:
+            try:
+                with open(os.path.join(root, "package.json"), encoding="utf-8") as f:
+                    declared = json.load(f).get("name")
+            except (OSError, ValueError, AttributeError):
+                continue
+            if isinstance(declared, str) and declared.lower() == installed.lower():
+                yield installed.lower()
+
+
+def build(rankings: Iterable[List[str]], trees: Iterable[str]) -> List[str]:
+    """Ranked names by best (position, ranking), then the remaining tree names sorted."""
+    best: Dict[str, Tuple[int, int]] = {}
+    for r, names in enumerate(rankings):
+        for position, name in enumerate(names):
+            if name not in best or (position, r) < best[name]:
+                best[name] = (position, r)
+    ranked = [name for name in sorted(best, key=best.__getitem__) if not is_junk(name)]
+    seen: Set[str] = set(best)
+    extra = {name for path in trees for name in tree_names(path) if name not in seen and not is_junk(name)}
+    return ranked + sorted(extra)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the typosquat corpus (popular_npm.txt) on stdout.")
+    parser.add_argument("--ranking", action="append", default=[], metavar="FILE",
+                        help="top-package list, most popular first (repeatable; earlier lists win ties)")
+    parser.add_argument("trees", nargs="*", metavar="TREE_OR_LOCKFILE",
+                        help="lockfile or directory whose registry packages are added after the ranked names")
+    args = parser.parse_args(argv)
+    names = build([read_ranking(path) for path in args.ranking], args.trees)
+    sys.stdout.write(HEADER)
+    sys.stdout.write("".join(f"{name}\n" for name in names))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,169 @@
+import base64
 import os
 import shutil
 import tarfile
 import tempfile
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
 
-import requests
+from analyzers.fetch_cache import FetchCache, shared_session
+from analyzers.result_cache import file_integrity
 
 
-def download_and_extract_npm(package_name):
+DEFAULT_REGISTRY = "https://registry.npmjs.org"
+# The abbreviated ("corgi") packument: only what installs need, a fraction of the full document.
+ABBREVIATED_PACKUMENT = "application/vnd.npm.install-v1+json; q=1.0, application/json; q=0.8"
+
+
+def _npm_session():
+    return shared_session("npm")
+
+
+def expected_digest(dist: dict) -> Optional[Tuple[str, bytes]]:
+    """(algorithm, digest) from a packument's dist block, strongest first."""
+    integrity = dist.get("integrity") or ""
+    candidates = {}
+    for item in integrity.split():
+        algo, _, b64 = item.partition("-")
+        try:
+            candidates[algo] = base64.b64decode(b64)
+        except ValueError:
+            continue
+    for algo in ("sha512", "sha384", "sha256", "sha1"):
+        if algo in candidates:
+            return algo, candidates[algo]
+    shasum = dist.get("shasum")
+    if shasum:
+        return "sha1", bytes.fromhex(shasum)
+    return None
+
+
+def integrity_string(algorithm: str, digest: bytes) -> str:
+    """Canonical "<algorithm>-<base64>" form of a digest from expected_digest()."""
+    return f"{algorithm}-{base64.b64encode(digest).decode('ascii')}"
+
+
+def _safe_extract_stream(tar: tarfile.TarFile, dest: str) -> Dict[str, int]:
+    """Extract a streaming tarfile into dest, member by member.
+
+    Entries that would land outside dest (absolute paths, "..", links) and
+    anything that isn't a regular file or directory are rejected. Returns
+    extracted/rejected counts.
+    """
+    root = os.path.realpath(dest)
+    counts = {"bytes_extracted": 0, "files_extracted": 0, "files_rejected": 0}
+    for member in tar:
+        target = os.path.realpath(os.path.join(root, member.name))
+        inside = target == root or target.startswith(root + os.sep)
+        if not inside or not (member.isfile() or member.isdir()):
+            print(f"⚠️  Rejected tarball entry: {member.name}")
+            counts["files_rejected"] += 1
+            continue
+        if hasattr(tarfile, "data_filter"):
+            tar.extract(member, root, set_attrs=False, filter="data")
+        else:
+            tar.extract(member, root, set_attrs=False)
+        if member.isfile():
+            counts["bytes_extracted"] += member.size
+            counts["files_extracted"] += 1
+    return counts
+
+
+def split_npm_spec(spec: str) -> Tuple[str, Optional[str]]:
+    """"name@version" -> (name, version); a bare name or "@scope/name" has no version."""
+    name, sep, version = spec.rpartition("@")
+    if not sep or not name:
+        return spec, None
+    return name, version or None
+
+
+def registry_url(registry: Optional[str] = None) -> str:
+    """npm registry base URL: explicit, $SCD_NPM_REGISTRY (mirror or local stand-in), or the public one."""
+    return (registry or os.environ.get("SCD_NPM_REGISTRY") or DEFAULT_REGISTRY).rstrip("/")
+
+
+def resolve_package(package_name, version: Optional[str] = None, registry: Optional[str] = None,
+                    cache: Optional[FetchCache] = None) -> Tuple[str, dict, int]:
+    """(version, its dist block, bytes downloaded) from the registry packument.
+
+    version defaults to the "latest" dist-tag. The abbreviated packument
+    is fetched through the cache; for a pinned version a cached packument
+    that already lists it is used without asking the registry at all.
+    """
+    cache = cache or FetchCache()
+    url = f"{registry_url(registry)}/{quote(package_name, safe='@')}"
+    fresh_if = (lambda body: version in body.get("versions", {})) if version else None
+    data, nbytes = cache.get_json(_npm_session(), url, "packument", url, headers={"Accept": ABBREVIATED_PACKUMENT},
+                                  fresh_if=fresh_if)
+    version = version or data["dist-tags"]["latest"]
+    if version not in data.get("versions", {}):
+        raise ValueError(f"❌ {package_name}@{version} not found in registry")
+    return version, data["versions"][version]["dist"], nbytes
+
+
+def download_npm_tarball(package_name, version: Optional[str] = None, stats: Optional[Dict] = None,
+                         registry: Optional[str] = None, cache: Optional[FetchCache] = None) -> str:
+    """Fetch an npm package's tarball (latest unless version is given) into the cache.
+
+    Tarballs are stored by their registry integrity value and checked
+    against it on download, so a package seen before costs no tarball
+    bytes. Returns the cached .tgz path (owned by the cache, don't delete
+    it); scan it in place with ScanContext.from_archive().
+    """
     print(f"🌐 Downloading npm package: {package_name}")
-    registry_url = f"https://registry.npmjs.org/{package_name}"
-    response = requests.get(registry_url)
-    response.raise_for_status()
+    cache = cache or FetchCache()
+    version, dist, packument_bytes = resolve_package(package_name, version, registry, cache)
+    expected = expected_digest(dist)
 
-    data = response.json()
-    latest_version = data["dist-tags"]["latest"]
-    tarball_url = data["versions"][latest_version]["dist"]["tarball"]
+    if expected is None:
+        print("⚠️  Registry published no integrity value; tarball not verified.")
+        # Without a digest, fall back to the (immutable) tarball URL as the key.
+        tarball_path, tarball_bytes = cache.fetch_url_blob(_npm_session(), dist["tarball"], "tarball",
+                                                           dist["tarball"], max_age=float("inf"))
+    else:
+        try:
+            tarball_path, tarball_bytes = cache.fetch_blob(_npm_session(), dist["tarball"], *expected)
+        except ValueError:
+            raise ValueError(f"❌ Integrity mismatch for {package_name}@{version} ({expected[0]})")
 
-    tarball_response = requests.get(tarball_url, stream=True)
-    tarball_response.raise_for_status()
+    downloaded = packument_bytes + tarball_bytes
+    if stats is not None:
+        stats.update({"source": f"npm:{package_name}@{version}", "bytes_downloaded": downloaded,
+                      "cache": "hit" if tarball_bytes == 0 else "miss",
+                      "integrity": integrity_string(*expected) if expected else file_integrity(tarball_path)})
+    print(f"📦 Tarball at: {tarball_path} ({downloaded} bytes downloaded)")
+    return tarball_path
 
-    temp_dir = tempfile.mkdtemp()
-    tar_path = os.path.join(temp_dir, f"{package_name}.tgz")
 
-    with open(tar_path, "wb") as f:
-        f.write(tarball_response.content)
+def download_and_extract_npm(package_name, version: Optional[str] = None, stats: Optional[Dict] = None,
+                             registry: Optional[str] = None, cache: Optional[FetchCache] = None):
+    """Download an npm package (latest unless version is given) and extract it.
 
-    with tarfile.open(tar_path, "r:gz") as tar:
-        tar.extractall(path=temp_dir)
+    The tarball comes from the fetch cache (see download_npm_tarball). If
+    stats is given it is filled with bytes downloaded/extracted and file
+    counts for the report.
+    """
+    stats = {} if stats is None else stats
+    tarball_path = download_npm_tarball(package_name, version, stats, registry, cache)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with tarfile.open(tarball_path, mode="r|gz") as tar:
+            counts = _safe_extract_stream(tar, temp_dir)
+    except (tarfile.TarError, OSError):
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
 
     # npm packages often have "package/" as root folder
     package_folder = os.path.join(temp_dir, "package")
+    if not os.path.isdir(package_folder):
+        subfolders = [d for d in os.listdir(temp_dir) if os.path.isdir(os.path.join(temp_dir, d))]
+        if len(subfolders) == 1:
+            package_folder = os.path.join(temp_dir, subfolders[0])
 
+    stats.update(counts)
     print(f"📦 Package extracted to: {package_folder}")
     return package_folder
 
 if __name__ == "__main__":
     download_and_extract_npm("express")
-
@@ -0,0 +1,67 @@
+import math
+from collections import Counter
+from typing import List, Sequence
+
+try:
+    import numpy as np  # optional: vectorized batch scoring
+except ImportError:
+    np = None
+
+
+# Below this many tokens the NumPy setup costs more than it saves.
+_NUMPY_MIN_BATCH = 64
+# Tokens per histogram block: bounds the (tokens x alphabet) count matrix.
+_NUMPY_BLOCK = 8192
+# NumPy and the per-token loop sum in a different order; scores this close
+# to the threshold are recomputed the slow way in exact mode.
+_EXACT_MARGIN = 1e-9
+
+
+def shannon_entropy(s: str) -> float:
+    if not s:
+        return 0.0
+    entropy = 0.0
+    length = len(s)
+    for count in Counter(s).values():
+        p = count / length
+        entropy -= p * math.log2(p)
+    return entropy
+
+
+def _entropy_numpy(tokens: Sequence[str]) -> "np.ndarray":
+    # Tokens come from the ASCII-only candidate regex, so one byte per char.
+    # Remap bytes to a dense alphabet so each row of the histogram is small.
+    data = np.frombuffer("".join(tokens).encode("ascii"), dtype=np.uint8)
+    present = np.bincount(data, minlength=256) > 0
+    dense = (np.cumsum(present) - 1)[data]
+    width = int(present.sum())
+    lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+    token_ids = np.repeat(np.arange(len(tokens), dtype=np.int64), lengths)
+    counts = np.bincount(token_ids * width + dense, minlength=len(tokens) * width)
+    counts = counts.reshape(len(tokens), width).astype(np.float64)
+    # H = log2(L) - sum(c * log2(c)) / L
+    c_log_c = counts * np.log2(np.maximum(counts, 1.0))
+    return np.log2(lengths) - c_log_c.sum(axis=1) / lengths
+
+
+def high_entropy_mask(tokens: Sequence[str], threshold: float, exact: bool = True) -> List[bool]:
+    """Score a batch of ASCII tokens; True where entropy >= threshold.
+
+    Uses NumPy byte histograms when available and the batch is large enough.
+    In exact mode, scores within floating-point noise of the threshold are
+    recomputed with shannon_entropy so the result always matches scoring
+    each token on its own.
+    """
+    if np is None or len(tokens) < _NUMPY_MIN_BATCH:
+        return [shannon_entropy(t) >= threshold for t in tokens]
+
+    mask: List[bool] = []
+    for start in range(0, len(tokens), _NUMPY_BLOCK):
+        block = tokens[start:start + _NUMPY_BLOCK]
+        scores = _entropy_numpy(block)
+        block_mask = (scores >= threshold).tolist()
+        if exact:
+            for i in np.flatnonzero(np.abs(scores - threshold) < _EXACT_MARGIN).tolist():
+                block_mask[i] = shannon_entropy(block[i]) >= threshold
+        mask.extend(block_mask)
+    return mask
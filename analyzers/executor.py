@@ -0,0 +1,136 @@
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource  # not on Windows: no peak RSS there
+except ImportError:
+    resource = None
+
+
+# Where an analyzer runs: subprocess/I/O-bound work is fine on a thread,
+# pure-Python CPU work needs its own process to get around the GIL.
+THREAD = "thread"
+PROCESS = "process"
+
+
+# Counters analyzers report in their own results, copied into their metrics.
+_REPORTED = ("files", "bytes", "subprocess_seconds")
+
+
+def _peak_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _timed_call(func: Callable, args: tuple, kwargs: Dict) -> Tuple[Optional[Dict], float, Optional[str], Dict]:
+    # Module-level so it can be pickled into a process pool worker.
+    # CPU time is the calling thread's: an analyzer on a thread is not
+    # charged for its neighbours. Peak RSS is per process, so for analyzers
+    # sharing this process it is how much the peak grew while this one ran.
+    rss = _peak_rss()
+    cpu = time.thread_time()
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+        error = None
+    except Exception as e:
+        result = None
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    metrics = {"wall_seconds": round(elapsed, 3), "cpu_seconds": round(time.thread_time() - cpu, 3)}
+    if rss is not None:
+        metrics["peak_rss_delta_bytes"] = _peak_rss() - rss
+    return result, elapsed, error, metrics
+
+
+def _with_reported(metrics: Dict, result: Dict) -> Dict:
+    for key in _REPORTED:
+        if result.get(key) is not None:
+            metrics[key] = result[key]
+    cache = result.get("cache")
+    if isinstance(cache, dict):
+        metrics["cache_hits"] = cache.get("hits", 0)
+        metrics["cache_misses"] = cache.get("misses", 0)
+    return metrics
+
+
+def _failed_result(error: str) -> Dict:
+    return {"score": 0, "issues": [], "error": error}
+
+
+def run_analyzers(jobs: List[Tuple], max_threads: Optional[int] = None, max_processes: Optional[int] = None,
+                  on_result: Optional[Callable[[str, Optional[Dict]], None]] = None,
+                  inline: bool = False) -> Dict[str, Optional[Dict]]:
+    """Run independent analyzers concurrently and collect their results.
+
+    jobs: list of (name, func, args, kind) or (name, func, args, kind, kwargs)
+    tuples, where kind is THREAD or PROCESS.
+
+    Returns {name: result_dict}. Every result dict gets an "elapsed" key with
+    the analyzer's wall time in seconds and a "metrics" dict (wall and CPU
+    time, peak RSS growth, plus files, bytes, cache hits and subprocess
+    time where the analyzer reports them); an analyzer that raised (or whose
+    worker process died) gets a zero-score result with an "error" key instead,
+    so one crash never loses the other analyzers' results.
+
+    on_result(name, result) is called as each analyzer finishes, in
+    completion order (e.g. to stream its findings into the report); the
+    returned dict is always in job order. inline runs every job one after
+    the other in the calling thread instead (for --profile).
+    """
+    results: Dict[str, Optional[Dict]] = {}
+
+    def collect(name: str, result: Optional[Dict], elapsed: float, error: Optional[str], metrics: Dict):
+        if error is not None:
+            print(f"❌ Analyzer '{name}' failed: {error}")
+            result = _failed_result(error)
+        if isinstance(result, dict):
+            result["elapsed"] = round(elapsed, 3)
+            result["metrics"] = _with_reported(metrics, result)
+        results[name] = result
+        if on_result is not None:
+            on_result(name, result)
+
+    if inline:
+        for job in jobs:
+            collect(job[0], *_timed_call(job[1], job[2], job[4] if len(job) > 4 else {}))
+        return results
+
+    thread_jobs = [j for j in jobs if j[3] == THREAD]
+    process_jobs = [j for j in jobs if j[3] == PROCESS]
+
+    futures = {}
+    thread_pool = ThreadPoolExecutor(max_workers=max_threads or max(len(thread_jobs), 1))
+    process_pool = None
+    if process_jobs:
+        process_pool = ProcessPoolExecutor(max_workers=max_processes or len(process_jobs))
+    try:
+        # Submit process jobs first: with the fork start method the workers
+        # are forked on first submit, and forking while analyzer threads are
+        # already running (and holding locks such as stdout's) can deadlock.
+        for job in process_jobs + thread_jobs:
+            name, func, args, kind = job[:4]
+            kwargs = job[4] if len(job) > 4 else {}
+            pool = process_pool if kind == PROCESS else thread_pool
+            futures[pool.submit(_timed_call, func, args, kwargs)] = (name, time.perf_counter())
+
+        for future in as_completed(futures):
+            name, submitted = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # e.g. BrokenProcessPool when a worker is killed
+                elapsed = time.perf_counter() - submitted
+                outcome = None, elapsed, f"{type(e).__name__}: {e}", {"wall_seconds": round(elapsed, 3)}
+            collect(name, *outcome)
+    finally:
+        thread_pool.shutdown(wait=True)
+        if process_pool is not None:
+            process_pool.shutdown(wait=True)
+
+    return {job[0]: results[job[0]] for job in jobs}
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from analyzers.result_cache import default_cache_dir
+
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# Cached documents younger than this are used without asking the server.
+DEFAULT_MAX_AGE = 300
+# Connections kept open per host; batch mode runs many downloads at once.
+POOL_SIZE = 32
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+class OfflineCacheMiss(Exception):
+    """Raised in offline mode when something isn't in the cache."""
+
+
+def create_retrying_session() -> requests.Session:
+    session = requests.Session()
+    retries = Retry(
+        total=5,
+        connect=5,
+        read=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET", "OPTIONS"]
+    )
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": "supply-chain-detector/1.0"})
+    return session
+
+
+def shared_session(name: str, configure: Optional[Callable[[requests.Session], None]] = None) -> requests.Session:
+    """One pooled, retrying session per name (e.g. "npm", "github") for the whole run.
+
+    configure runs once, when the session is created (auth headers etc.).
+    """
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = create_retrying_session()
+            if configure is not None:
+                configure(session)
+            _sessions[name] = session
+        return session
+
+
+class FetchCache:
+    """Local cache for everything the downloaders fetch.
+
+    Blobs (tarballs, zipballs) are content-addressed under
+    blobs/<algorithm>/<digest>, so a tarball is found by its registry
+    integrity value before any request is made. Documents (packuments,
+    GitHub repo info) and URL-addressed blobs keep the server's ETag and
+    Last-Modified and are revalidated with conditional requests once older
+    than max_age. In offline mode nothing touches the network and a miss
+    raises OfflineCacheMiss.
+
+    Blobs are kept under max_bytes by dropping the least recently used;
+    the store is walked once per instance to size it, then only when it
+    has grown past max_bytes. network_bytes counts response bytes actually
+    received.
+    """
+
+    def __init__(self, root: Optional[str] = None, offline: bool = False, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root or os.path.join(default_cache_dir(), "fetch")
+        self.offline = offline
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.network_bytes = 0
+        self._blob_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _count(self, field: str, nbytes: int = 0):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+            self.network_bytes += nbytes
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated,
+                "network_bytes": self.network_bytes}
+
+    # -- content-addressed blobs ------------------------------------------
+
+    def blob_path(self, algorithm: str, digest: bytes) -> str:
+        hexdigest = digest.hex()
+        return os.path.join(self.root, "blobs", algorithm, hexdigest[:2], hexdigest)
+
+    def lookup_blob(self, algorithm: str, digest: bytes) -> Optional[str]:
+        path = self.blob_path(algorithm, digest)
+        try:
+            os.utime(path)  # mark as recently used for eviction
+        except OSError:
+            return None
+        return path
+
+    def store_blob(self, chunks: Iterable[bytes], algorithm: str = "sha512",
+                   expected: Optional[bytes] = None) -> Tuple[str, int]:
+        """Write chunks into the store, hashing on the way; returns (path, size).
+
+        With expected set, a digest mismatch discards the data and raises
+        ValueError. Writes go through a temp file, so concurrent fetches of
+        the same blob never see a partial file.
+        """
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        h = hashlib.new(algorithm)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in chunks:
+                    if chunk:
+                        h.update(chunk)
+                        out.write(chunk)
+                        size += len(chunk)
+            digest = h.digest()
+            if expected is not None and digest != expected:
+                raise ValueError(f"integrity mismatch ({algorithm})")
+            path = self.blob_path(algorithm, digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            added = 0 if os.path.exists(path) else size
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._account(added)
+        return path, size
+
+    def fetch_blob(self, session: requests.Session, url: str, algorithm: str, expected: bytes) -> Tuple[str, int]:
+        """Path of the blob with this digest, downloading it only if missing.
+
+        Returns (path, bytes downloaded): 0 bytes on a cache hit.
+        """
+        path = self.lookup_blob(algorithm, expected)
+        if path is not None:
+            self._count("hits")
+            return path, 0
+        if self.offline:
+            raise OfflineCacheMiss(f"{url} ({algorithm}-{expected.hex()[:16]}…) is not cached")
+        with session.get(url, stream=True, timeout=(10, 180)) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            path, size = self.store_blob(_iter_raw(response.raw), algorithm, expected)
+        self._count("misses", size)
+        return path, size
+
+    def _account(self, added: int):
+        # Running total of the store's size; walks it only the first time
+        # and when the budget is exceeded, not on every stored blob.
+        with self._lock:
+            if self._blob_bytes is None:
+                self._blob_bytes = sum(size for _, size, _ in self._list_blobs())
+            else:
+                self._blob_bytes += added
+            if self._blob_bytes > self.max_bytes:
+                self._blob_bytes = self._prune()
+
+    def _list_blobs(self) -> List[Tuple[float, int, str]]:
+        # (mtime, size, path) of every blob.
+        blobs = []
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, "blobs")):
+            for name in filenames:
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                blobs.append((st.st_mtime, st.st_size, full))
+        return blobs
+
+    def _prune(self) -> int:
+        """Drop least recently used blobs once over budget; returns the store's size after."""
+        # Walked again: other processes may have added or used blobs since.
+        blobs = self._list_blobs()
+        total = sum(size for _, size, _ in blobs)
+        if total <= self.max_bytes:
+            return total
+        # Oldest first, down to 10% under budget.
+        target = int(self.max_bytes * 0.9)
+        for _, size, full in sorted(blobs):
+            if total <= target:
+                break
+            try:
+                os.remove(full)
+                total -= size
+            except OSError:
+                continue
+        return total
+
+    # -- revalidated documents --------------------------------------------
+
+    def _doc_path(self, kind: str, key: str) -> str:
+        return os.path.join(self.root, "docs", kind, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_doc(self, kind: str, key: str) -> Optional[Dict]:
+        try:
+            with open(self._doc_path(kind, key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_doc(self, kind: str, key: str, entry: Dict):
+        path = self._doc_path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _is_fresh(self, entry: Optional[Dict], max_age: float) -> bool:
+        return entry is not None and (self.offline or time.time() - entry.get("fetched_at", 0) < max_age)
+
+    def get_json(self, session: requests.Session, url: str, kind: str, key: str,
+                 headers: Optional[Dict[str, str]] = None, max_age: float = DEFAULT_MAX_AGE,
+                 fresh_if: Optional[Callable[[Dict], bool]] = None) -> Tuple[Dict, int]:
+        """Fetch a JSON document through the cache; returns (body, bytes downloaded).
+
+        A cached copy is used as-is while younger than max_age, or whenever
+        fresh_if(body) says it is still good enough (e.g. it already lists
+        a pinned, immutable version); otherwise it is revalidated.
+        """
+        entry = self._read_doc(kind, key)
+        if entry is not None and (self._is_fresh(entry, max_age) or (fresh_if and fresh_if(entry["body"]))):
+            self._count("hits")
+            return entry["body"], 0
+        if self.offline:
+            raise OfflineCacheMiss(f"{url} is not cached")
+        response = session.get(url, headers={**(headers or {}), **self._conditional_headers(entry)}, timeout=30)
+        nbytes = len(response.content)
+        if response.status_code == 304 and entry is not None:
+            entry["fetched_at"] = time.time()
+            self._write_doc(kind, key, entry)
+            self._count("revalidated", nbytes)
+            return entry["body"], nbytes
+        response.raise_for_status()
+        body = response.json()
+        self._write_doc(kind, key, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "body": body,
+        })
+        self._count("misses", nbytes)
+        return body, nbytes
+
+    def fetch_url_blob(self, session: requests.Session, url: str, kind: str, key: str,
+                       max_age: float = DEFAULT_MAX_AGE, validate: Optional[Callable[[str], bool]] = None) -> Tuple[str, int]:
+        """Blob addressed by URL (no digest known up front), revalidated like get_json.
+
+        validate(path) can reject a downloaded body (e.g. an error page
+        instead of a zip); it is then discarded and ValueError raised.
+        """
+        entry = self._read_doc(kind, key)
+        cached = self.lookup_blob(entry["algorithm"], bytes.fromhex(entry["digest"])) if entry else None
+        if cached is not None and self._is_fresh(entry, max_age):
+            self._count("hits")
+            return cached, 0
+        if self.offline:
+            raise OfflineCacheMiss(f"{url} is not cached")
+        headers = self._conditional_headers(entry) if cached is not None else {}
+        with session.get(url, headers=headers, stream=True, timeout=(10, 180)) as response:
+            if response.status_code == 304 and cached is not None:
+                entry["fetched_at"] = time.time()
+                self._write_doc(kind, key, entry)
+                self._count("revalidated")
+                return cached, 0
+            response.raise_for_status()
+            response.raw.decode_content = True
+            path, size = self.store_blob(_iter_raw(response.raw), "sha256")
+        if validate is not None and not validate(path):
+            os.remove(path)
+            raise ValueError(f"unexpected content from {url}")
+        self._write_doc(kind, key, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "algorithm": "sha256",
+            "digest": os.path.basename(path),
+        })
+        self._count("misses", size)
+        return path, size
+
+
+def _iter_raw(raw, chunk_size: int = 1024 * 1024):
+    while True:
+        chunk = raw.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
@@ -0,0 +1,97 @@
+import codecs
+import os
+from typing import Optional
+
+
+BINARY = "binary"
+MINIFIED = "minified"
+GENERATED = "generated"
+TEXT = "text"
+
+# How much of each file is read to classify it.
+SNIFF_BYTES = 8192
+
+# Formats that are binary by definition: skip without reading them.
+_BINARY_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".pdf", ".webp", ".avif", ".tif", ".tiff",
+    ".zip", ".gz", ".tgz", ".xz", ".7z", ".bz2", ".zst", ".br", ".tar", ".jar", ".exe", ".dll",
+    ".so", ".dylib", ".node", ".wasm", ".o", ".a", ".lib", ".class", ".pyc",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+    ".mp3", ".mp4", ".m4a", ".ogg", ".wav", ".webm", ".mov",
+}
+
+_MINIFIED_SUFFIXES = (".min.js", ".min.mjs", ".min.cjs", ".min.css")
+
+_GENERATED_NAMES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml",
+}
+_GENERATED_MARKERS = (b"@generated", b"DO NOT EDIT", b"auto-generated", b"autogenerated")
+# Generators put their marker in the header comment.
+_MARKER_WINDOW = 512
+
+# Control bytes that never appear in text (everything below 0x20 except
+# \b \t \n \f \r, plus DEL).
+_CONTROL_BYTES = bytes(b for b in range(32) if b not in (8, 9, 10, 12, 13)) + b"\x7f"
+
+# Lines this long only come out of a bundler or minifier.
+_MINIFIED_LINE_LENGTH = 500
+
+
+def is_binary_name(name: str) -> bool:
+    """True for file names whose extension is a binary format."""
+    return os.path.splitext(name.lower())[1] in _BINARY_EXTENSIONS
+
+
+def _looks_binary(head: bytes) -> bool:
+    if b"\x00" in head:
+        return True
+    if len(head.translate(None, _CONTROL_BYTES)) < len(head) * 0.9:
+        return True
+    try:
+        # The sample may end halfway through a multi-byte character.
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=len(head) < SNIFF_BYTES)
+        return False
+    except UnicodeDecodeError:
+        # Not UTF-8: call it binary when most of it is high-bit bytes.
+        high = len(head) - len(head.translate(None, bytes(range(128, 256))))
+        return high > len(head) * 0.3
+
+
+def classify_bytes(name: str, head: bytes) -> str:
+    """Classify a file from its name and first SNIFF_BYTES bytes."""
+    lower = name.lower()
+    base = os.path.basename(lower)
+    if is_binary_name(lower):
+        return BINARY
+    if not head:
+        return TEXT
+    if _looks_binary(head):
+        return BINARY
+    if base in _GENERATED_NAMES or lower.endswith(".map") or any(m in head[:_MARKER_WINDOW] for m in _GENERATED_MARKERS):
+        return GENERATED
+    if lower.endswith(_MINIFIED_SUFFIXES):
+        return MINIFIED
+    lines = head.split(b"\n")
+    # Ignore the last (probably cut-off) line unless it is the only one.
+    complete = lines[:-1] or lines
+    if max(len(line) for line in complete) >= _MINIFIED_LINE_LENGTH and len(head) / len(complete) > 200:
+        return MINIFIED
+    return TEXT
+
+
+def classify_file(path: str, name: Optional[str] = None) -> str:
+    """Classify a file on disk as BINARY, MINIFIED, GENERATED or TEXT.
+
+    Only the first few KB are read: NUL bytes or a high share of control or
+    non-UTF-8 bytes mean binary; lockfiles, source maps and files with a
+    generated marker in their header are GENERATED; very long lines mean MINIFIED.
+    """
+    name = name or path
+    if is_binary_name(name):
+        return BINARY
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return BINARY
+    return classify_bytes(name, head)
@@ -0,0 +1,142 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+
+
+# Stands in for None in integer columns (line numbers and counts are >= 0).
+_NO_INT = -1
+
+
+class _Table:
+    """Each distinct value stored once; columns hold its index."""
+
+    __slots__ = ("values", "index")
+
+    def __init__(self):
+        self.values: List = []
+        self.index: Dict = {}
+
+    def intern(self, value) -> int:
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+class FindingStore:
+    """Compact, columnar storage for one analyzer's findings.
+
+    Every finding has a type and a file, plus the fields named at
+    construction, in that order. Types and files (and any field listed in
+    tables) go into a table once and are referenced by index from array
+    columns; fields listed in ints are stored in an integer array. So 100k
+    findings across a few hundred files cost a few hundred path strings
+    instead of 100k dicts. Per-type counts are kept as findings are added,
+    for scoring and report summaries.
+
+    Findings only become dicts when read: iterating, indexing and slicing
+    return the same {"type", "file", **fields} dicts analyzers used to
+    return, so reports, JSON output and pickling to a worker work as before.
+    """
+
+    __slots__ = ("fields", "counts", "_types", "_paths", "_type_col", "_path_col", "_columns", "_tables", "_ints")
+
+    def __init__(self, fields: Sequence[str] = (), ints: Sequence[str] = (), tables: Sequence[str] = ()):
+        self.fields = tuple(fields)
+        self.counts: Dict[str, int] = {}
+        self._types = _Table()
+        self._paths = _Table()
+        self._type_col = array("I")
+        self._path_col = array("I")
+        self._tables = tuple(_Table() if name in tables else None for name in self.fields)
+        self._ints = tuple(name in ints for name in self.fields)
+        self._columns = tuple(array("I") if table is not None else array("q") if is_int else []
+                              for table, is_int in zip(self._tables, self._ints))
+
+    def add(self, type: str, file: Optional[str], *values):
+        """Append one finding; values are the extra fields in construction order."""
+        self._type_col.append(self._types.intern(type))
+        self._path_col.append(self._paths.intern(file))
+        for column, table, is_int, value in zip(self._columns, self._tables, self._ints, values):
+            if table is not None:
+                column.append(table.intern(value))
+            elif is_int:
+                column.append(_NO_INT if value is None else value)
+            else:
+                column.append(value)
+        self.counts[type] = self.counts.get(type, 0) + 1
+
+    def _row(self, i: int) -> Dict:
+        row = {"type": self._types.values[self._type_col[i]], "file": self._paths.values[self._path_col[i]]}
+        for name, column, table, is_int in zip(self.fields, self._columns, self._tables, self._ints):
+            value = column[i]
+            if table is not None:
+                value = table.values[value]
+            elif is_int and value == _NO_INT:
+                value = None
+            row[name] = value
+        return row
+
+    def __len__(self) -> int:
+        return len(self._type_col)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return map(self._row, range(len(self)))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._row(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("finding index out of range")
+        return self._row(key)
+
+    def column(self, name: str) -> List:
+        """All values of one field (or "type"/"file"), in insertion order."""
+        if name in ("type", "file"):
+            table, column = (self._types, self._type_col) if name == "type" else (self._paths, self._path_col)
+            return [table.values[i] for i in column]
+        f = self.fields.index(name)
+        table, column = self._tables[f], self._columns[f]
+        if table is not None:
+            return [table.values[i] for i in column]
+        if self._ints[f]:
+            return [None if v == _NO_INT else v for v in column]
+        return list(column)
+
+    def to_list(self) -> List[Dict]:
+        return list(self)
+
+
+def issue_types(issues) -> Set[str]:
+    """Distinct finding types of a FindingStore or a plain list of issues."""
+    if isinstance(issues, FindingStore):
+        return set(issues.counts)
+    # Some analyzers report bare strings
+    return {i["type"] for i in issues if isinstance(i, dict) and "type" in i}
+
+
+def type_counts(issues) -> Dict[str, int]:
+    """{type: count} of a FindingStore or a plain list of issues."""
+    if isinstance(issues, FindingStore):
+        return dict(issues.counts)
+    counts: Dict[str, int] = {}
+    for f in issues:
+        t = f.get("type", "unknown") if isinstance(f, dict) else str(f)
+        counts[t] = counts.get(t, 0) + 1
+    return counts
+
+
+# Risk levels by minimum total score, highest first. Every report, the
+# results store and batch summaries label a total with risk_level().
+RISK_LEVELS = (("HIGH", 7), ("MEDIUM", 4), ("LOW", 0))
+RISK_ICONS = {"HIGH": "🚨", "MEDIUM": "⚠️", "LOW": "✅"}
+
+
+def risk_level(total: int) -> str:
+    """HIGH, MEDIUM or LOW for a total risk score."""
+    for level, minimum in RISK_LEVELS:
+        if total >= minimum:
+            return level
+    return "LOW"
@@ -1,98 +1,175 @@
-import io
+import fnmatch
 import os
+import shutil
 import tempfile
 import zipfile
+from typing import Callable, Dict, Iterable, Optional, Tuple
 
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
-
-def _create_retrying_session() -> requests.Session:
-    session = requests.Session()
-    retries = Retry(
-        total=5,
-        connect=5,
-        read=5,
-        backoff_factor=0.5,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS"]
-    )
-    adapter = HTTPAdapter(max_retries=retries)
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
+
+from analyzers.archive_fs import SKIP_DIRS
+from analyzers.fetch_cache import FetchCache, OfflineCacheMiss, shared_session
+from analyzers.file_classifier import is_binary_name
+from analyzers.result_cache import file_integrity
+
+
+DEFAULT_API = "https://api.github.com"
+DEFAULT_CODELOAD = "https://codeload.github.com"
+# The default branch rarely changes; don't ask the API on every run.
+REPO_INFO_MAX_AGE = 24 * 3600
+
+
+def _api_url() -> str:
+    return (os.environ.get("SCD_GITHUB_API") or DEFAULT_API).rstrip("/")
+
+
+def _codeload_url() -> str:
+    return (os.environ.get("SCD_GITHUB_CODELOAD") or DEFAULT_CODELOAD).rstrip("/")
+
+
+def _configure_session(session: requests.Session):
     # Identify client to GitHub and use token if provided
-    session.headers.update({"User-Agent": "supply-chain-detector/1.0"})
     token = os.environ.get("GITHUB_TOKEN") or os.environ.get("GH_TOKEN")
     if token:
         session.headers.update({"Authorization": f"token {token}"})
-    return session
 
 
-def _get_default_branch(session: requests.Session, owner: str, repo: str) -> str:
+def _github_session() -> requests.Session:
+    return shared_session("github", _configure_session)
+
+
+def _get_default_branch(session: requests.Session, owner: str, repo: str, cache: FetchCache) -> str:
     default_branch = "main"
+    url = f"{_api_url()}/repos/{owner}/{repo}"
     try:
-        resp = session.get(f"https://api.github.com/repos/{owner}/{repo}", timeout=10)
-        if resp.ok:
-            api_branch = (resp.json() or {}).get("default_branch")
-            if api_branch:
-                default_branch = api_branch
-    except requests.RequestException:
+        info, _ = cache.get_json(session, url, "github-repo", url, max_age=REPO_INFO_MAX_AGE)
+        api_branch = (info or {}).get("default_branch")
+        if api_branch:
+            default_branch = api_branch
+    except (requests.RequestException, ValueError, OfflineCacheMiss):
         # Fall back to defaults if API unavailable
         pass
     return default_branch
 
 
-def _download_zip_to_memory(session: requests.Session, zip_url: str) -> io.BytesIO:
-    with session.get(zip_url, stream=True, timeout=(10, 180)) as response:
-        response.raise_for_status()
-        buffer = io.BytesIO()
-        for chunk in response.iter_content(chunk_size=1024 * 1024):  # 1MB chunks
-            if chunk:
-                buffer.write(chunk)
-        buffer.seek(0)
-        return buffer
-
-
-def download_and_extract_github(repo_path):
-    print(f"🌐 Downloading GitHub repo: {repo_path}")
-    owner, repo = repo_path.split("/")
-
-    session = _create_retrying_session()
-
-    # Determine branch to download
-    branch = _get_default_branch(session, owner, repo)
-
+def _fetch_zipball(session: requests.Session, cache: FetchCache, owner: str, repo: str,
+                   stats: Optional[Dict]) -> Tuple[str, str, int]:
+    """(cached zip path, branch, bytes downloaded), trying likely branches in turn."""
     # Use codeload, which is optimized for archive downloads
-    base_url = f"https://codeload.github.com/{owner}/{repo}/zip/refs/heads/"
-
-    temp_dir = tempfile.mkdtemp()
-
+    base_url = f"{_codeload_url()}/{owner}/{repo}/zip/refs/heads/"
     # Try default branch, then fall back to common alternatives
-    candidate_branches = [branch, "main", "master", "canary"]
+    candidate_branches = list(dict.fromkeys([_get_default_branch(session, owner, repo, cache),
+                                             "main", "master", "canary"]))
     last_error = None
-
     for candidate in candidate_branches:
         zip_url = base_url + candidate
         try:
-            zip_bytes = _download_zip_to_memory(session, zip_url)
-            with zipfile.ZipFile(zip_bytes) as zf:
-                zf.extractall(temp_dir)
-            # Success
-            subfolders = os.listdir(temp_dir)
-            if not subfolders:
-                raise Exception("❌ No content found in GitHub ZIP")
-            extracted_path = os.path.join(temp_dir, subfolders[0])
-            print(f"✅ Repo extracted to: {extracted_path}")
-            return extracted_path
-        except (requests.RequestException, zipfile.BadZipFile, zipfile.LargeZipFile) as e:
+            zip_path, downloaded = cache.fetch_url_blob(session, zip_url, "zipball", zip_url, validate=zipfile.is_zipfile)
+        except (requests.RequestException, ValueError, OfflineCacheMiss) as e:
             last_error = e
             # Try next candidate branch
             continue
+        if stats is not None:
+            stats.update({"source": f"github:{owner}/{repo}", "branch": candidate, "bytes_downloaded": downloaded,
+                          "cache": "hit" if downloaded == 0 else "miss", "integrity": file_integrity(zip_path)})
+        return zip_path, candidate, downloaded
 
     # If all candidates failed, raise the last error with context
-    msg = (
+    raise Exception(
         f"❌ Failed to download GitHub repo '{owner}/{repo}'. "
         f"Tried branches: {candidate_branches}. Last error: {last_error}"
     )
-    raise Exception(msg)
+
+
+def make_extract_filter(max_file_bytes: Optional[int] = None,
+                        skip_binary: bool = True,
+                        exclude_globs: Iterable[str] = (),
+                        include_globs: Optional[Iterable[str]] = None) -> Callable[[zipfile.ZipInfo], bool]:
+    """Build a predicate deciding which zip members get extracted.
+
+    Members under directories no analyzer walks (node_modules, .git, ...)
+    are always skipped. Paths are matched without the zipball's top-level
+    "<repo>-<branch>/" folder, e.g. exclude_globs=["test/fixtures/*"].
+    """
+    exclude_globs = list(exclude_globs)
+    include_globs = list(include_globs) if include_globs is not None else None
+
+    def _filter(info: zipfile.ZipInfo) -> bool:
+        parts = info.filename.split("/")
+        rel = "/".join(parts[1:])
+        if any(p in SKIP_DIRS for p in parts[1:-1]):
+            return False
+        if max_file_bytes is not None and info.file_size > max_file_bytes:
+            return False
+        if skip_binary and is_binary_name(rel):
+            return False
+        if any(fnmatch.fnmatch(rel, g) for g in exclude_globs):
+            return False
+        if include_globs is not None and not any(fnmatch.fnmatch(rel, g) for g in include_globs):
+            return False
+        return True
+
+    return _filter
+
+
+def _extract_selected(zf: zipfile.ZipFile, dest: str, member_filter: Callable[[zipfile.ZipInfo], bool]) -> Dict[str, int]:
+    # Extract only members the filter accepts, refusing paths that escape dest.
+    root = os.path.realpath(dest)
+    counts = {"bytes_extracted": 0, "files_extracted": 0, "files_skipped": 0}
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        target = os.path.realpath(os.path.join(root, info.filename))
+        if not target.startswith(root + os.sep) or not member_filter(info):
+            counts["files_skipped"] += 1
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with zf.open(info) as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        counts["bytes_extracted"] += info.file_size
+        counts["files_extracted"] += 1
+    return counts
+
+
+def download_github_zipball(repo_path, stats: Optional[Dict] = None, cache: Optional[FetchCache] = None) -> str:
+    """Fetch a repo's zipball into the cache without extracting it.
+
+    The zip is revalidated with its ETag once the cached copy is a few
+    minutes old. Returns the cached .zip path (owned by the cache, don't
+    delete it); scan it in place with ScanContext.from_archive().
+    """
+    print(f"🌐 Downloading GitHub repo: {repo_path}")
+    owner, repo = repo_path.split("/")
+    zip_path, _, downloaded = _fetch_zipball(_github_session(), cache or FetchCache(), owner, repo, stats)
+    print(f"✅ Zipball at: {zip_path} ({downloaded} bytes downloaded)")
+    return zip_path
+
+
+def download_and_extract_github(repo_path, member_filter: Optional[Callable[[zipfile.ZipInfo], bool]] = None,
+                                stats: Optional[Dict] = None, cache: Optional[FetchCache] = None):
+    """Download a repo's zipball and extract the files the analyzers read.
+
+    member_filter decides which zip members hit the disk (default:
+    make_extract_filter()). The zip itself comes from the fetch cache. If
+    stats is given it is filled with bytes downloaded/extracted and file
+    counts for the report.
+    """
+    print(f"🌐 Downloading GitHub repo: {repo_path}")
+    member_filter = member_filter or make_extract_filter()
+    owner, repo = repo_path.split("/")
+    zip_path, _, downloaded = _fetch_zipball(_github_session(), cache or FetchCache(), owner, repo, stats)
+
+    temp_dir = tempfile.mkdtemp()
+    with zipfile.ZipFile(zip_path) as zf:
+        counts = _extract_selected(zf, temp_dir, member_filter)
+    subfolders = os.listdir(temp_dir)
+    if not subfolders:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise Exception("❌ No content found in GitHub ZIP")
+    extracted_path = os.path.join(temp_dir, subfolders[0])
+    if stats is not None:
+        stats.update(counts)
+    print(f"✅ Repo extracted to: {extracted_path} "
+          f"({downloaded} bytes downloaded, {counts['files_extracted']} files / "
+          f"{counts['bytes_extracted']} bytes extracted, {counts['files_skipped']} skipped)")
+    return extracted_path
@@ -0,0 +1,325 @@
+import bisect
+import re
+from typing import Dict, Optional, Set
+
+from analyzers.findings import FindingStore, issue_types
+from analyzers.lockfile_checker import SUSPICIOUS_SCRIPT_KEYS
+from analyzers.scan_context import ScanContext
+
+
+JS_SUFFIXES = (".js", ".cjs", ".mjs", ".jsx", ".ts", ".cts", ".mts", ".tsx")
+
+# Points per finding type, counted once per type; the total is capped like
+# every other analyzer's.
+TYPE_POINTS = {
+    "decode_exec": 3,
+    "install_script_network": 3,
+    "obfuscation": 2,
+    "child_process": 1,
+    "eval": 1,
+    "new_function": 1,
+    "dynamic_require": 1,
+}
+MAX_SCORE = 5
+
+_GLOBAL_OBJECTS = {"window", "global", "globalThis", "self"}
+
+# Every trigger pattern starts with a literal, so the regex engine jumps
+# from one occurrence to the next at memchr speed, and each one only runs
+# when its keyword is in the file at all. Files with nothing suspicious
+# (no eval, only static require()s, ...) are never tokenized.
+_TRIGGERS = [
+    # (keyword, kind, pattern)
+    ("child_process", "module", re.compile(r"""['"](?:node:)?child_process['"]""")),
+    ("eval", "eval", re.compile(r"eval\s*\(")),
+    ("Function", "function", re.compile(r"Function\s*\(")),
+    ("require", "require", re.compile(r"require\s*\(")),
+    ("import", "require", re.compile(r"import\s*\(")),
+    ("Buffer", "decoder", re.compile(r"Buffer\s*\.\s*from\s*\(")),
+    ("atob", "decoder", re.compile(r"atob\s*\(")),
+    ("fromCharCode", "decoder", re.compile(r"fromCharCode\s*\(")),
+    ("runIn", "vm", re.compile(r"runIn(?:This|New)?Context\s*\(")),
+    # Escaped printable ASCII: code hidden in a string, not a charset table.
+    ("\\", "escapes", re.compile(r"\\(?:x[2-7][0-9a-fA-F]|u00[2-7][0-9a-fA-F])(?:\\x[2-7][0-9a-fA-F]|\\u00[2-7][0-9a-fA-F]){3,}")),
+    ("_0x", "hexname", re.compile(r"_0x[0-9a-fA-F]{4,}")),
+]
+# Only looked for where they can matter: shell calls in files that import
+# child_process (exec() is also RegExp.prototype.exec), network access in
+# files that install hooks run.
+_EXEC_TRIGGER = re.compile(r"(?:exec|execSync|execFile|execFileSync|spawn|spawnSync|fork)\s*\(")
+_NETWORK_TRIGGER = re.compile(r"""['"](?:node:)?(?:https?|http2|net|tls|dns|dgram|axios|request|node-fetch|got|undici)['"]|fetch\s*\(""")
+
+# Comments, strings and regex literals, to tell code from text that only
+# looks like code. A regex literal is recognized by the token before it,
+# the way a JS parser tells it from division (fixed-width lookbehinds, so
+# every alternative starts with / " ' or ` and the engine can skip
+# straight to those characters). A backtick only opens a template
+# literal: its text runs to the closing backtick or to a ${, and the
+# substitution after that is code again (_literal_spans).
+_LITERAL_PATTERN = r"""
+    //[^\n]*|/\*.*?(?:\*/|\Z)
+  | "[^"\\\n]*(?:\\.[^"\\\n]*)*"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'|`
+  | /(?:(?<=[(,=:\[!&|?;{}]/)|(?<=[(,=:\[!&|?;{}]\s/)|(?<=return\s/))
+      (?![*/])(?:[^/\\\n\[]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/
+"""
+_LITERALS = re.compile(_LITERAL_PATTERN, re.S | re.X)
+# Inside a ${...} substitution braces are counted too, to find its end.
+_SUBSTITUTION_TOKENS = re.compile(_LITERAL_PATTERN + r"|[{}]", re.S | re.X)
+# Template text from just after a backtick or a substitution's closing
+# brace, up to and including the next backtick or ${.
+_TEMPLATE_TEXT = re.compile(r"""[^`\\$]*(?:(?:\\.|\$(?!\{))[^`\\$]*)*(?:`|\$\{|\Z)""", re.S)
+_CODE, _STRING, _COMMENT, _REGEX = range(4)
+
+# What a call's argument list contains, scanned from its opening paren.
+_ARG_TOKEN = re.compile(r"""[()]|"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*'|`(?:[^`\\]|\\.)*`""")
+_MAX_ARGS = 4096
+
+_RECEIVER = re.compile(r"""([A-Za-z_$][\w$]*)?\s*(\??\.)\s*$""")
+_STATIC_SPECIFIER = re.compile(r"""\s*(?:'[^'\\\n]*'|"[^"\\\n]*"|`[^`\\$]*`)\s*\)""")
+_IMPORT_BEFORE = re.compile(r"""(?:\brequire\s*\(|\bfrom|\bimport\s*\(?)\s*$""")
+_ENCODING_ARG = re.compile(r"""['"](?:base64|hex)['"]""")
+_DECODER_IN_ARGS = re.compile(r"""\bBuffer\s*\.\s*from\s*\([^)]*['"](?:base64|hex)['"]|\batob\s*\(|\bfromCharCode\s*\(""")
+_ASSIGNED = re.compile(r"""([A-Za-z_$][\w$]*)\s*=\s*[^;=,{}()]*$""")
+_HOOK_SCRIPT = re.compile(r"""\bnode\s+(?:-{1,2}[\w-]+(?:=\S+)?\s+)*['"]?([^\s'";&|]+\.[cm]?js)""")
+_IDENT_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$")
+
+# Obfuscation thresholds, per file: escape sequences in runs of four or
+# more inside strings (one long run, or many that are a real share of the
+# file rather than a few in a big data blob), and javascript-obfuscator
+# style _0x1a2b names.
+_ESCAPE_RUN_FOR_OBFUSCATION = 32
+_ESCAPES_FOR_OBFUSCATION = 64
+_ESCAPE_SHARE_FOR_OBFUSCATION = 0.01
+_HEXNAMES_FOR_OBFUSCATION = 20
+
+
+def _call_args(text: str, open_paren: int) -> str:
+    # Text between a call's parentheses, skipping strings; cut at _MAX_ARGS.
+    depth = 0
+    limit = min(len(text), open_paren + _MAX_ARGS)
+    for m in _ARG_TOKEN.finditer(text, open_paren, limit):
+        token = m.group()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+            if depth == 0:
+                return text[open_paren + 1:m.start()]
+    return text[open_paren + 1:limit]
+
+
+def _receiver(text: str, start: int) -> Optional[str]:
+    # None for a bare call, "obj" for obj.fn(...), "" when the receiver is
+    # an expression such as require("x").fn(...).
+    m = _RECEIVER.search(text, max(0, start - 64), start)
+    if m is None:
+        return None
+    return m.group(1) or ""
+
+
+def _literal_spans(text: str, until: int):
+    # Sorted starts and ends of every literal that begins at or before until.
+    # A template literal is split into its text segments, each starting at
+    # the backtick or the "}" before it; its ${...} substitutions are code
+    # and tokenized like any other, nested templates included.
+    starts, ends = [], []
+    depths = []  # open "{" count of each enclosing substitution, innermost last
+    pos = 0
+    while True:
+        m = (_SUBSTITUTION_TOKENS if depths else _LITERALS).search(text, pos)
+        if m is None or m.start() > until:
+            break
+        token = m.group()
+        pos = m.end()
+        if token == "{":
+            depths[-1] += 1
+            continue
+        if token == "}" and depths[-1]:
+            depths[-1] -= 1
+            continue
+        if token == "}":
+            depths.pop()
+        elif token != "`":
+            starts.append(m.start())
+            ends.append(pos)
+            continue
+        segment = _TEMPLATE_TEXT.match(text, pos)
+        starts.append(m.start())
+        ends.append(segment.end())
+        pos = segment.end()
+        if segment.group().endswith("${"):
+            depths.append(0)
+    return starts, ends
+
+
+def _literal_kind(text: str, start: int) -> int:
+    if text[start] in "\"'`}":
+        return _STRING
+    return _COMMENT if text[start + 1] in "/*" else _REGEX
+
+
+def install_scripts(pkg: Dict) -> Set[str]:
+    """Files run by node from package.json install hooks, relative to the root."""
+    scripts = pkg.get("scripts") if isinstance(pkg, dict) else None
+    if not isinstance(scripts, dict):
+        return set()
+    found = set()
+    for key, cmd in scripts.items():
+        if key in SUSPICIOUS_SCRIPT_KEYS and isinstance(cmd, str):
+            for m in _HOOK_SCRIPT.finditer(cmd):
+                found.add(m.group(1)[2:] if m.group(1).startswith("./") else m.group(1))
+    return found
+
+
+def scan_source(text: str, install_script: bool = False) -> Dict[str, Dict]:
+    """{finding type: {"offset", "count", "detail"}} for one JavaScript/TypeScript source.
+
+    Candidates come from the keyword triggers; only when there are some is
+    the file tokenized into literals, to drop the ones inside comments and
+    strings. Only the text of a template literal counts as a string; its
+    ${...} substitutions are code.
+    """
+    triggers = [(kind, pattern) for keyword, kind, pattern in _TRIGGERS if keyword in text]
+    if "child_process" in text:
+        triggers.append(("exec", _EXEC_TRIGGER))
+    if install_script:
+        triggers.append(("network", _NETWORK_TRIGGER))
+    candidates = []
+    for kind, pattern in triggers:
+        for m in pattern.finditer(text):
+            offset = m.start()
+            # Drop what needs no tokenizing to rule out: the tail of a longer
+            # identifier (medieval(), myFunction()) and require("literal").
+            if m.group()[0] not in "'\"\\" and offset > 0 and text[offset - 1] in _IDENT_CHARS:
+                continue
+            if kind == "require" and _STATIC_SPECIFIER.match(text, m.end()):
+                continue
+            candidates.append((offset, kind, m))
+    if not candidates:
+        return {}
+    candidates.sort(key=lambda c: c[0])
+    starts, ends = _literal_spans(text, candidates[-1][0])
+
+    found: Dict[str, Dict] = {}
+
+    def hit(kind: str, offset: int, detail: str):
+        entry = found.get(kind)
+        if entry is None:
+            found[kind] = {"offset": offset, "count": 1, "detail": detail}
+        else:
+            entry["count"] += 1
+
+    escapes = longest_run = 0
+    hexnames = set()
+    network = None
+    uses_child_process = False
+    decoded_names: Set[str] = set()
+    decoders = 0
+    sinks = []
+    for offset, kind, m in candidates:
+        i = bisect.bisect_right(starts, offset) - 1
+        where = _literal_kind(text, starts[i]) if i >= 0 and offset < ends[i] else _CODE
+        if kind in ("module", "network") and m.group().startswith(("'", '"')):
+            # A module name counts when it is the whole string, right after require( / from / import.
+            if where == _STRING and starts[i] == offset and _IMPORT_BEFORE.search(text, max(0, offset - 16), offset):
+                if kind == "module":
+                    uses_child_process = True
+                    hit("child_process", offset, m.group()[1:-1])
+                elif network is None:
+                    network = (offset, m.group()[1:-1])
+            continue
+        if kind == "escapes":
+            if where == _STRING:
+                run = m.group().count("\\")
+                escapes += run
+                longest_run = max(longest_run, run)
+            continue
+        if where != _CODE:
+            continue
+        if kind == "hexname":
+            hexnames.add(m.group())
+            continue
+        recv = _receiver(text, offset)
+        open_paren = m.end() - 1
+        if kind == "require":
+            if recv is None:
+                hit("dynamic_require", offset, _call_args(text, open_paren)[:80].strip())
+        elif kind in ("eval", "function"):
+            if recv is None or recv in _GLOBAL_OBJECTS:
+                if kind == "eval":
+                    hit("eval", offset, "eval()")
+                else:
+                    hit("new_function", offset, "Function()")
+                sinks.append((kind, open_paren))
+        elif kind == "network":
+            if (recv is None or recv in _GLOBAL_OBJECTS) and network is None:
+                network = (offset, "fetch()")
+        elif kind in ("vm", "exec"):
+            sinks.append((kind, open_paren))
+        elif kind == "decoder":
+            name = m.group().split("(", 1)[0].rstrip()
+            if (name.startswith("Buffer") and _ENCODING_ARG.search(_call_args(text, open_paren))) \
+                    or (name == "atob" and recv is None) or (name == "fromCharCode" and recv == "String"):
+                decoders += 1
+                assigned = _ASSIGNED.search(text, max(0, offset - 120), offset)
+                if assigned:
+                    decoded_names.add(assigned.group(1))
+
+    # Decoded data reaching eval, Function, vm or a shell. Checked after the
+    # whole file, since a sink is often defined before the decode that feeds it.
+    if decoders:
+        names = re.compile(r"(?<![\w$])(?:" + "|".join(map(re.escape, decoded_names)) + r")(?![\w$])") \
+            if decoded_names else None
+        for kind, open_paren in sinks:
+            if kind == "exec" and not uses_child_process:
+                continue
+            args = _call_args(text, open_paren)
+            if _DECODER_IN_ARGS.search(args) or (names is not None and names.search(args)):
+                hit("decode_exec", open_paren, "decoded data executed")
+
+    if install_script and network is not None:
+        hit("install_script_network", network[0], network[1])
+    escape_share = escapes * 4 / len(text)
+    if longest_run >= _ESCAPE_RUN_FOR_OBFUSCATION or len(hexnames) >= _HEXNAMES_FOR_OBFUSCATION \
+            or (escapes >= _ESCAPES_FOR_OBFUSCATION and escape_share >= _ESCAPE_SHARE_FOR_OBFUSCATION):
+        hit("obfuscation", 0, f"{escapes} escaped chars, {len(hexnames)} _0x names")
+    return found
+
+
+def score_issues(issues) -> int:
+    return min(sum(TYPE_POINTS.get(t, 1) for t in issue_types(issues)), MAX_SCORE)
+
+
+def run_js_heuristics(path: str, context: Optional[ScanContext] = None, max_file_bytes: Optional[int] = None) -> Dict:
+    """Fast triage of JavaScript/TypeScript sources without semgrep.
+
+    Flags child_process imports, eval and the Function constructor,
+    require() of computed names, base64/hex/char-code payloads that reach
+    eval or a shell, network access from files run by install hooks, and
+    escape-heavy or _0x-style obfuscation. One issue per file and type,
+    with the first line it was seen on and how often.
+    """
+    print("⚡ Running JavaScript heuristics...")
+    context = context or ScanContext(path)
+    hooks = install_scripts(context.read_json("package.json"))
+
+    issues = FindingStore(("line", "count", "detail"), ints=("line", "count"))
+    files_scanned = 0
+    bytes_scanned = 0
+    for entry in context.text_files():
+        if not entry.rel.endswith(JS_SUFFIXES):
+            continue
+        try:
+            with context.open(entry.rel) as f:
+                data = f.read(max_file_bytes) if max_file_bytes else f.read()
+        except OSError:
+            continue
+        files_scanned += 1
+        bytes_scanned += len(data)
+        text = data.decode("utf-8", errors="replace")
+        for kind, hit in scan_source(text, install_script=entry.rel in hooks).items():
+            issues.add(kind, entry.path, text.count("\n", 0, hit["offset"]) + 1, hit["count"], hit["detail"])
+
+    score = score_issues(issues)
+    print(f"⚡ Heuristic findings: {len(issues)} in {files_scanned} files")
+    return {"score": score, "issues": issues, "files": files_scanned, "bytes": bytes_scanned}
@@ -1,7 +1,8 @@
-import json
-import os
 import re
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
+
+from analyzers.lockfile_parsers import LockEntry, find_lockfile, iter_locked_entries, iter_lockfile
+from analyzers.scan_context import ScanContext
 
 
 SUSPICIOUS_SCRIPT_KEYS = {
@@ -20,14 +21,6 @@ SUSPICIOUS_COMMAND_PATTERNS = [
 ]
 
 
-def _read_json(path: str) -> Dict:
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
 def _check_scripts(pkg: Dict) -> List[Dict]:
     findings: List[Dict] = []
     scripts = pkg.get("scripts", {})
@@ -44,69 +37,85 @@ def _check_scripts(pkg: Dict) -> List[Dict]:
     return findings
 
 
-def _check_lockfile(lock: Dict) -> List[Dict]:
-    findings: List[Dict] = []
-    if not lock:
-        findings.append({"type": "no_lockfile"})
-        return findings
-
-    # npm v2 and v3 lock formats
-    packages = lock.get("packages")
-    if isinstance(packages, dict):
-        for name, meta in packages.items():
-            if not isinstance(meta, dict):
-                continue
-            resolved = meta.get("resolved", "")
-            integrity = meta.get("integrity")
-            if isinstance(resolved, str):
-                low = resolved.lower()
-                if low.startswith("git+") or low.startswith("git://") or low.startswith("ssh://"):
-                    findings.append({"type": "git_dependency", "package": name, "resolved": resolved})
-                if low.startswith("http://") or low.startswith("https://") and ".tgz" not in low:
-                    findings.append({"type": "url_dependency", "package": name, "resolved": resolved})
-            if integrity is None:
-                findings.append({"type": "missing_integrity", "package": name})
-        return findings
+_GIT_PREFIXES = ("git+", "git://", "ssh://")
 
-    # npm v1: dependencies tree under dependencies
-    def walk_deps(tree: Dict, prefix: str = ""):
-        for pkg, meta in tree.items():
-            if not isinstance(meta, dict):
-                continue
-            resolved = meta.get("resolved", "")
-            integrity = meta.get("integrity")
-            name = f"{prefix}{pkg}"
-            if isinstance(resolved, str):
-                low = resolved.lower()
-                if low.startswith("git+") or low.startswith("git://") or low.startswith("ssh://"):
-                    findings.append({"type": "git_dependency", "package": name, "resolved": resolved})
-                if low.startswith("http://") or low.startswith("https://") and ".tgz" not in low:
-                    findings.append({"type": "url_dependency", "package": name, "resolved": resolved})
-            if integrity is None:
-                findings.append({"type": "missing_integrity", "package": name})
-            deps = meta.get("dependencies", {})
-            if isinstance(deps, dict):
-                walk_deps(deps, prefix=name+"/")
-    deps_root = lock.get("dependencies")
-    if isinstance(deps_root, dict):
-        walk_deps(deps_root)
 
+def _check_entry(package: str, meta: Dict) -> List[Dict]:
+    findings: List[Dict] = []
+    resolved = meta.get("resolved", "")
+    integrity = meta.get("integrity")
+    if isinstance(resolved, str):
+        low = resolved.lower()
+        if low.startswith(_GIT_PREFIXES):
+            findings.append({"type": "git_dependency", "package": package, "resolved": resolved})
+        if low.startswith("http://") or low.startswith("https://") and ".tgz" not in low:
+            findings.append({"type": "url_dependency", "package": package, "resolved": resolved})
+    if integrity is None:
+        findings.append({"type": "missing_integrity", "package": package})
     return findings
 
 
-def run_lockfile_and_scripts_check(path: str) -> Dict:
+def _check_lockfile(lock: Dict) -> List[Dict]:
+    if not lock:
+        return [{"type": "no_lockfile"}]
+    return [f for _, path, meta in iter_locked_entries(lock, project_entries=True) for f in _check_entry(path, meta)]
+
+
+def collect_locked_packages(entries: Iterable[LockEntry]) -> List[Dict]:
+    """Registry tarballs a lockfile pins, one entry per integrity value.
+
+    entries come from iter_lockfile() or iter_locked_entries(). Each
+    result has name, version, resolved, integrity and paths (every place
+    in the tree the same tarball is installed), so a version shared by
+    many dependents or workspaces is listed, fetched and scanned once.
+    Links, git/file dependencies, registry entries without a tarball URL
+    (yarn berry, pnpm) and entries without integrity are left to the
+    lockfile checks.
+    """
+    by_integrity: Dict[str, Dict] = {}
+    for name, path, meta in entries:
+        resolved = meta.get("resolved")
+        integrity = meta.get("integrity")
+        if meta.get("link") or not isinstance(resolved, str) or not isinstance(integrity, str):
+            continue
+        if not resolved.lower().startswith(("http://", "https://")):
+            continue
+        entry = by_integrity.get(integrity)
+        if entry is None:
+            entry = by_integrity[integrity] = {
+                "name": name, "version": meta.get("version"), "resolved": resolved,
+                "integrity": integrity, "paths": [],
+            }
+        entry["paths"].append(path)
+    return list(by_integrity.values())
+
+
+def run_lockfile_and_scripts_check(path: str, context: Optional[ScanContext] = None,
+                                   require_lockfile: bool = True) -> Dict:
+    """Lifecycle scripts and lockfile hygiene.
+
+    Reads package-lock.json, npm-shrinkwrap.json, yarn.lock (v1 and berry)
+    or pnpm-lock.yaml, streamed entry by entry. require_lockfile=False for
+    published dependencies, which normally ship without a lockfile: a
+    missing one is then not a finding.
+    """
     print("📄 Checking lockfile and scripts...")
-    pkg = _read_json(os.path.join(path, "package.json"))
+    context = context or ScanContext(path)
+    pkg = context.read_json("package.json")
     scripts_findings = _check_scripts(pkg) if pkg else []
 
-    lockfile_path = None
-    for candidate in ["package-lock.json", "npm-shrinkwrap.json"]:
-        p = os.path.join(path, candidate)
-        if os.path.exists(p):
-            lockfile_path = p
-            break
-    lock = _read_json(lockfile_path) if lockfile_path else {}
-    lock_findings = _check_lockfile(lock)
+    lockfile_name = find_lockfile(context)
+    lock_findings: List[Dict] = []
+    if lockfile_name is None:
+        if require_lockfile:
+            lock_findings.append({"type": "no_lockfile"})
+    else:
+        try:
+            for _, package, meta in iter_lockfile(context, lockfile_name, project_entries=True):
+                lock_findings.extend(_check_entry(package, meta))
+        except ValueError:
+            # An unreadable lockfile counts as a missing one.
+            lock_findings = [{"type": "no_lockfile"}] if require_lockfile else []
 
     findings = scripts_findings + lock_findings
 
@@ -125,6 +134,5 @@ def run_lockfile_and_scripts_check(path: str) -> Dict:
     return {
         "score": score,
         "issues": findings,
+        "lockfile": lockfile_name,
     }
-
-
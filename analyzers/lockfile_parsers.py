@@ -0,0 +1,356 @@
+import json
+import re
+from typing import Dict, Iterator, Optional, TextIO, Tuple
+
+from analyzers.scan_context import ScanContext
+
+
+# In npm's own order of precedence, then the other package managers.
+LOCKFILE_NAMES = ("package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml")
+
+# (package name, install path, entry with version/resolved/integrity/link)
+LockEntry = Tuple[str, str, Dict]
+
+_CHUNK = 1024 * 1024
+_WS = re.compile(r"[ \t\n\r]*")
+# Yarn berry / pnpm protocols that point at the project's own files.
+_LOCAL_PROTOCOLS = ("workspace:", "link:", "portal:", "file:", "patch:")
+
+
+def find_lockfile(context: ScanContext) -> Optional[str]:
+    for candidate in LOCKFILE_NAMES:
+        if context.exists(candidate):
+            return candidate
+    return None
+
+
+def tree_path(install_path: str) -> str:
+    # "node_modules/a/node_modules/@scope/b" -> "a > @scope/b"
+    return " > ".join(p.strip("/") for p in install_path.split("node_modules/") if p.strip("/"))
+
+
+def _name_from_lock_key(key: str) -> str:
+    # "node_modules/a/node_modules/@scope/b" -> "@scope/b"
+    return key.rsplit("node_modules/", 1)[-1]
+
+
+# -- package-lock.json / npm-shrinkwrap.json --------------------------------
+
+def _walk_v1(tree: Dict, prefix: str = "") -> Iterator[LockEntry]:
+    # npm v1 nests dependencies inside dependencies; walk with a stack.
+    stack = [(tree, prefix)]
+    while stack:
+        tree, prefix = stack.pop()
+        if not isinstance(tree, dict):
+            continue
+        for name, meta in tree.items():
+            if not isinstance(meta, dict):
+                continue
+            path = f"{prefix}node_modules/{name}"
+            yield name, path, meta
+            stack.append((meta.get("dependencies"), path + "/"))
+
+
+def iter_locked_entries(lock: Dict, project_entries: bool = False) -> Iterator[LockEntry]:
+    """(package name, install path, lock entry) for every package a parsed package-lock installs.
+
+    Install paths use the v2/v3 "node_modules/a/node_modules/b" form for
+    every format. The root and workspace folders (keys outside
+    node_modules) are the project's own code and are skipped unless
+    project_entries is set.
+    """
+    # npm v2 and v3 lock formats
+    packages = lock.get("packages")
+    if isinstance(packages, dict):
+        for key, meta in packages.items():
+            if (project_entries or "node_modules/" in key) and isinstance(meta, dict):
+                yield meta.get("name") or _name_from_lock_key(key), key, meta
+        return
+    yield from _walk_v1(lock.get("dependencies"))
+
+
+class _JsonStream:
+    """Pull parser over a text stream, just enough to walk objects member by member.
+
+    Values are decoded one at a time with raw_decode, so memory holds the
+    current value and a read buffer, never the whole document.
+    """
+
+    def __init__(self, f: TextIO):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _more(self) -> bool:
+        if self.eof:
+            return False
+        # Grow with the pending data so a large value is re-decoded O(log n) times.
+        chunk = self.f.read(max(_CHUNK, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, ch: str):
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} in lockfile")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._more():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk.
+            if end == len(self.buf) and self._more():
+                continue
+            self.pos = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """Keys of the object at the current position.
+
+        The caller consumes each key's value (value() or a nested
+        members()) before asking for the next key.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("expected an object key in lockfile")
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError("expected ',' or '}' in lockfile")
+
+
+def iter_npm_lock(f: TextIO, project_entries: bool = False) -> Iterator[LockEntry]:
+    """Entries of a package-lock.json read incrementally from f.
+
+    v2/v3 stop after the "packages" map; the legacy "dependencies" copy
+    that follows it is never read. v1 trees are decoded one top-level
+    dependency at a time. project_entries as for iter_locked_entries().
+    """
+    stream = _JsonStream(f)
+    version = None
+    for key in stream.members():
+        if key == "lockfileVersion":
+            version = stream.value()
+        elif key == "packages":
+            for lock_key in stream.members():
+                meta = stream.value()
+                if (project_entries or "node_modules/" in lock_key) and isinstance(meta, dict):
+                    yield meta.get("name") or _name_from_lock_key(lock_key), lock_key, meta
+            return
+        elif key == "dependencies" and not (isinstance(version, int) and version >= 2):
+            for name in stream.members():
+                yield from _walk_v1({name: stream.value()})
+        else:
+            stream.value()
+
+
+# -- yarn.lock (v1 and berry) -----------------------------------------------
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def _split_descriptor(descriptor: str) -> Tuple[str, str]:
+    # "@scope/name@npm:^1.0.0" -> ("@scope/name", "npm:^1.0.0")
+    at = descriptor.find("@", 1)
+    if at < 0:
+        return descriptor, ""
+    return descriptor[:at], descriptor[at + 1:]
+
+
+def _yarn_entry(header: str, fields: Dict[str, str], berry: bool) -> Optional[LockEntry]:
+    descriptor = header.split(",", 1)[0].strip().strip("\"'")
+    name, spec = _split_descriptor(descriptor)
+    meta: Dict = {"version": fields.get("version")}
+    if not berry:
+        meta["resolved"] = fields.get("resolved")
+        meta["integrity"] = fields.get("integrity")
+        if spec.startswith(_LOCAL_PROTOCOLS):
+            meta["link"] = True
+        return name, f"node_modules/{name}", meta
+    if header == "__metadata":
+        return None
+    _, protocol = _split_descriptor(fields.get("resolution", descriptor))
+    if protocol.startswith(_LOCAL_PROTOCOLS):
+        meta["link"] = True
+    elif not protocol.startswith("npm:"):
+        # git, github: and tarball URLs keep their source as "resolved".
+        meta["resolved"] = protocol
+    meta["integrity"] = fields.get("checksum")
+    return name, f"node_modules/{name}", meta
+
+
+def iter_yarn_lock(f: TextIO) -> Iterator[LockEntry]:
+    """Entries of a yarn.lock, v1 or berry, one line at a time.
+
+    Both formats put each entry's descriptors on an unindented line and
+    its fields two spaces in ("version "1.0.0"" in v1, "version: 1.0.0"
+    in berry); deeper lines (dependency lists) are skipped.
+    """
+    berry = False
+    header: Optional[str] = None
+    fields: Dict[str, str] = {}
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        if indent == 0:
+            if header is not None:
+                entry = _yarn_entry(header, fields, berry)
+                if entry is not None:
+                    yield entry
+            header = stripped[:-1] if stripped.endswith(":") else stripped
+            berry = berry or header == "__metadata"
+            fields = {}
+        elif indent == 2 and header is not None:
+            key, _, value = stripped.partition(":" if berry else " ")
+            fields[_unquote(key)] = _unquote(value)
+    if header is not None:
+        entry = _yarn_entry(header, fields, berry)
+        if entry is not None:
+            yield entry
+
+
+# -- pnpm-lock.yaml ----------------------------------------------------------
+
+def _flow_mapping(value: str) -> Dict[str, str]:
+    # "{integrity: sha512-..., tarball: https://...}" -> dict; pnpm writes
+    # resolutions on one line in this form.
+    out = {}
+    for part in value.strip().strip("{}").split(", "):
+        key, _, val = part.partition(": ")
+        if key.strip():
+            out[key.strip()] = _unquote(val)
+    return out
+
+
+def _pnpm_name_version(key: str) -> Tuple[str, str]:
+    # v5: "/@scope/name/1.0.0_peer@2.0.0"; v6/v9: "/@scope/name@1.0.0(peer@2.0.0)"
+    key = _unquote(key).lstrip("/")
+    parts = key.split("/")
+    width = 2 if key.startswith("@") else 1
+    if len(parts) == width + 1 and parts[width][:1].isdigit():
+        return "/".join(parts[:width]), parts[width].split("_", 1)[0]
+    key = key.split("(", 1)[0]
+    name, version = _split_descriptor(key)
+    if version:
+        return name, version
+    name, _, version = key.rpartition("/")
+    return name, version
+
+
+def _pnpm_entry(key: str, fields: Dict[str, str], resolution: Dict[str, str]) -> LockEntry:
+    name, version = _pnpm_name_version(key)
+    name = fields.get("name") or name
+    meta: Dict = {"version": fields.get("version") or version, "integrity": resolution.get("integrity")}
+    if resolution.get("type") == "directory" or "directory" in resolution:
+        meta["link"] = True
+    elif resolution.get("type") == "git" or "repo" in resolution:
+        meta["resolved"] = f"git+{resolution.get('repo', '')}#{resolution.get('commit', '')}"
+    elif "tarball" in resolution:
+        meta["resolved"] = resolution["tarball"]
+    elif version.startswith(_LOCAL_PROTOCOLS):
+        meta["link"] = True
+    return name, f"node_modules/{name}", meta
+
+
+def iter_pnpm_lock(f: TextIO) -> Iterator[LockEntry]:
+    """Entries under "packages:" in a pnpm-lock.yaml (v5 to v9), one line at a time.
+
+    Only the subset of YAML pnpm writes there is understood: two-space
+    indented package keys, scalar fields, and a resolution given either
+    as a {flow: mapping} or as a nested block.
+    """
+    section = None
+    key: Optional[str] = None
+    fields: Dict[str, str] = {}
+    resolution: Dict[str, str] = {}
+    in_resolution = False
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        if indent <= 2 and key is not None:
+            yield _pnpm_entry(key, fields, resolution)
+            key = None
+        if indent == 0:
+            section = stripped.rstrip(":")
+        elif section != "packages":
+            continue
+        elif indent == 2:
+            key = stripped[:-1] if stripped.endswith(":") else stripped
+            fields, resolution, in_resolution = {}, {}, False
+        elif key is None:
+            continue
+        elif indent == 4:
+            field, _, value = stripped.partition(":")
+            value = value.strip()
+            in_resolution = field == "resolution" and not value
+            if field == "resolution" and value:
+                resolution = _flow_mapping(value)
+            elif field in ("name", "version"):
+                fields[field] = _unquote(value)
+        elif indent == 6 and in_resolution:
+            field, _, value = stripped.partition(":")
+            resolution[field.strip()] = _unquote(value)
+    if key is not None:
+        yield _pnpm_entry(key, fields, resolution)
+
+
+_PARSERS = {
+    "package-lock.json": iter_npm_lock,
+    "npm-shrinkwrap.json": iter_npm_lock,
+    "yarn.lock": iter_yarn_lock,
+    "pnpm-lock.yaml": iter_pnpm_lock,
+}
+
+
+def iter_lockfile(context: ScanContext, lockfile_name: str, project_entries: bool = False) -> Iterator[LockEntry]:
+    """Stream (name, install path, entry) from any supported lockfile in the target.
+
+    project_entries also yields a package-lock's root and workspace
+    folders (yarn and pnpm lockfiles list workspaces as links anyway).
+    Raises ValueError (json.JSONDecodeError included) for a malformed npm
+    lockfile, possibly after some entries have been yielded.
+    """
+    parser = _PARSERS[lockfile_name.rsplit("/", 1)[-1]]
+    with context.open_text(lockfile_name, errors="replace") as f:
+        if parser is iter_npm_lock:
+            yield from iter_npm_lock(f, project_entries)
+        else:
+            yield from parser(f)
@@ -1,21 +1,19 @@
-import json
-import os
+from typing import Optional
 
+from analyzers.scan_context import ScanContext
 
-def run_metadata_check(path):
+
+def run_metadata_check(path, context: Optional[ScanContext] = None):
     print("📋 Checking metadata...")
+    context = context or ScanContext(path)
 
-    metadata_file = os.path.join(path, "package.json")
-    if not os.path.exists(metadata_file):
+    data, error = context.load_json("package.json")
+    if error == "missing":
         print("❌ No package.json found.")
         return {"score": 0, "issues": ["no_metadata"]}
-
-    with open(metadata_file, 'r', encoding='utf-8') as f:
-        try:
-            data = json.load(f)
-        except:
-            print("❌ Error reading package.json")
-            return {"score": 1, "issues": ["invalid_json"]}
+    if error == "invalid" or not isinstance(data, dict):
+        print("❌ Error reading package.json")
+        return {"score": 1, "issues": ["invalid_json"]}
 
     score = 0
     issues = []
@@ -0,0 +1,155 @@
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# SQLite's default limit on bound parameters is 999 on older builds.
+_BATCH = 500
+
+
+def default_cache_dir() -> str:
+    return os.environ.get("SCD_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "supply-chain-detector")
+
+
+def stream_digest(f: BinaryIO, max_bytes: Optional[int] = None) -> str:
+    """SHA-256 of a binary stream from its current position (only max_bytes if given)."""
+    h = hashlib.sha256()
+    remaining = max_bytes
+    while remaining is None or remaining > 0:
+        chunk = f.read(1024 * 1024 if remaining is None else min(1024 * 1024, remaining))
+        if not chunk:
+            break
+        h.update(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+    return h.hexdigest()
+
+
+def file_digest(path: str, max_bytes: Optional[int] = None) -> str:
+    """SHA-256 of a file's contents (only the first max_bytes if given)."""
+    with open(path, "rb") as f:
+        return stream_digest(f, max_bytes)
+
+
+def file_integrity(path: str) -> str:
+    """Subresource-integrity string ("sha256-<base64>") of a file, like npm's integrity field."""
+    return "sha256-" + base64.b64encode(bytes.fromhex(file_digest(path))).decode("ascii")
+
+
+class ResultCache:
+    """On-disk cache of per-file analyzer results.
+
+    Entries are keyed by file content hash + analyzer name + rule-set
+    version, so a byte-identical file is never rescanned with the same
+    rules, and changing the rules invalidates old entries automatically.
+    The database is kept under max_bytes by evicting least recently used
+    entries. hits/misses count lookups for the report.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path or os.path.join(default_cache_dir(), "results.sqlite")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Connections don't cross processes; the copy reopens on first use.
+        state = dict(self.__dict__)
+        state["_conn"] = None
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _key(digest: str, analyzer: str, version: str) -> str:
+        return f"{analyzer}:{version}:{digest}"
+
+    def get_many(self, digests: Iterable[str], analyzer: str, version: str) -> Dict[str, Any]:
+        """Look up several files at once; returns {digest: cached value} for hits."""
+        wanted = {self._key(d, analyzer, version): d for d in digests}
+        found: Dict[str, Any] = {}
+        keys = list(wanted)
+        with self._lock:
+            conn = self._connect()
+            for i in range(0, len(keys), _BATCH):
+                batch = keys[i:i + _BATCH]
+                marks = ",".join("?" * len(batch))
+                for key, value in conn.execute(f"SELECT key, value FROM results WHERE key IN ({marks})", batch):
+                    found[wanted[key]] = json.loads(value)
+                hit_keys = [k for k in batch if wanted[k] in found]
+                if hit_keys:
+                    conn.execute(
+                        f"UPDATE results SET last_used = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                        [time.time()] + hit_keys,
+                    )
+            conn.commit()
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Any]], analyzer: str, version: str):
+        """Store (digest, value) pairs in one transaction, then evict if over budget."""
+        now = time.time()
+        rows: List[Tuple[str, str, int, float]] = []
+        for digest, value in items:
+            encoded = json.dumps(value, separators=(",", ":"))
+            rows.append((self._key(digest, analyzer, version), encoded, len(encoded), now))
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop the oldest entries until 10% under budget, so we don't evict on every put.
+        target = int(self.max_bytes * 0.9)
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+        conn.commit()
+        self.evictions += len(doomed)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
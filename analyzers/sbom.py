@@ -1,6 +1,6 @@
-import json
-import os
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional
+
+from analyzers.scan_context import ScanContext
 
 
 _DISALLOWED_LICENSES = {
@@ -8,17 +8,6 @@ _DISALLOWED_LICENSES = {
 }
 
 
-def _read_package_json(path: str) -> Dict:
-    package_file = os.path.join(path, "package.json")
-    if not os.path.exists(package_file):
-        return {}
-    try:
-        with open(package_file, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
 def _collect_dependencies(pkg: Dict) -> Dict[str, str]:
     deps = {}
     for key in ("dependencies", "devDependencies", "peerDependencies", "optionalDependencies"):
@@ -39,13 +28,14 @@ def _extract_license(pkg: Dict) -> str:
     return "UNKNOWN"
 
 
-def generate_sbom(path: str) -> Dict:
+def generate_sbom(path: str, context: Optional[ScanContext] = None) -> Dict:
     """Generate a simple SBOM-like structure for npm projects.
 
     Returns a dict with components, detected license, and policy issues.
     """
     print("📦 Generating SBOM...")
-    pkg = _read_package_json(path)
+    context = context or ScanContext(path)
+    pkg = context.read_json("package.json")
     if not pkg:
         return {"components": [], "license": "UNKNOWN", "issues": ["no_package_json"], "score": 0}
 
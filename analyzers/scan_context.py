@@ -0,0 +1,137 @@
+import io
+import json
+import threading
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from analyzers.archive_fs import DirectoryFS, FileEntry, open_archive
+from analyzers.file_classifier import BINARY, SNIFF_BYTES, classify_bytes, is_binary_name
+
+
+class ScanContext:
+    """Per-target state shared by every analyzer.
+
+    Holds a single directory walk (paths, sizes, mtimes, content-sniffed
+    file classification) and a memoized cache of parsed JSON manifests and
+    lockfiles, so each file is stat'ed once and each manifest parsed once
+    no matter how many analyzers ask for it. Both are built lazily on
+    first use. Safe to share between analyzer threads.
+
+    root is a directory, or an archive_fs filesystem (see from_archive) so
+    a downloaded .tgz/.zip can be scanned without extracting it. Analyzers
+    read files through open()/open_text(), never by path.
+    """
+
+    def __init__(self, root):
+        self.fs = root if hasattr(root, "walk") else DirectoryFS(root)
+        self.root = self.fs.root
+        self._files: Optional[List[FileEntry]] = None
+        self._by_rel: Dict[str, FileEntry] = {}
+        self._json_cache: Dict[str, Tuple[Any, Optional[str]]] = {}
+        self._kinds: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_archive(cls, archive_path: str) -> "ScanContext":
+        return cls(open_archive(archive_path))
+
+    @property
+    def is_archive(self) -> bool:
+        return self.fs.is_archive
+
+    def __getstate__(self):
+        # Locks can't be pickled; process-pool analyzers get a copy of the
+        # walk and whatever manifests were already parsed.
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def files(self) -> List[FileEntry]:
+        with self._lock:
+            if self._files is None:
+                self._files = self.fs.walk()
+                self._by_rel = {e.rel: e for e in self._files}
+            return self._files
+
+    def classify(self, entry: FileEntry) -> str:
+        """BINARY, MINIFIED, GENERATED or TEXT (see file_classifier), once per path."""
+        kind = self._kinds.get(entry.rel)
+        if kind is None:
+            kind = self._classify(entry)
+            self._kinds[entry.rel] = kind
+        return kind
+
+    def _classify(self, entry: FileEntry) -> str:
+        if is_binary_name(entry.rel):
+            return BINARY
+        try:
+            with self.fs.open(entry.rel) as f:
+                head = f.read(SNIFF_BYTES)
+        except OSError:
+            return BINARY
+        return classify_bytes(entry.rel, head)
+
+    def is_text(self, entry: FileEntry) -> bool:
+        return self.classify(entry) != BINARY
+
+    def text_files(self) -> List[FileEntry]:
+        return [e for e in self.files if self.is_text(e)]
+
+    def exists(self, rel: str) -> bool:
+        if self._files is not None:
+            return rel in self._by_rel
+        return self.fs.exists(rel)
+
+    def open(self, rel: str) -> BinaryIO:
+        """Binary stream of a file relative to the root (or archive top folder)."""
+        return self.fs.open(rel)
+
+    def open_text(self, rel: str, encoding: str = "utf-8", errors: str = "strict"):
+        return io.TextIOWrapper(self.fs.open(rel), encoding=encoding, errors=errors)
+
+    def materialize(self) -> str:
+        """A real directory with the target's files, for external tools.
+
+        The root itself for directories; archives are extracted to a temp
+        dir on first call and removed again by close()."""
+        return self.fs.materialize()
+
+    def close(self):
+        self.fs.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load_json(self, rel: str) -> Tuple[Any, Optional[str]]:
+        if not self.exists(rel):
+            return None, "missing"
+        try:
+            with self.open_text(rel) as f:
+                return json.load(f), None
+        except Exception:
+            return None, "invalid"
+
+    def load_json(self, rel: str) -> Tuple[Any, Optional[str]]:
+        """Parse a JSON file relative to the root, once.
+
+        Returns (data, error) where error is None, "missing" or "invalid".
+        """
+        with self._lock:
+            cached = self._json_cache.get(rel)
+        if cached is not None:
+            return cached
+        loaded = self._load_json(rel)
+        with self._lock:
+            return self._json_cache.setdefault(rel, loaded)
+
+    def read_json(self, rel: str) -> Dict:
+        """Like load_json, but {} for a missing, invalid or non-object file."""
+        data, _ = self.load_json(rel)
+        return data if isinstance(data, dict) else {}
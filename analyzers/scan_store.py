@@ -0,0 +1,175 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analyzers.findings import risk_level
+from analyzers.result_cache import default_cache_dir, file_integrity
+from analyzers.static_analyzer import RULEPACK_VERSION
+
+
+# Bump when any analyzer changes what it reports or how it scores: stored
+# results from another version are never reused.
+SCANNER_VERSION = "2026.10.2"
+# Metadata and maintainer checks look at data that changes over time, so
+# even a byte-identical package is rescanned after a while.
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+# Row-value lookups bind four parameters each; stay well under SQLite's limit.
+_BATCH = 200
+
+# (ecosystem, name, version, integrity)
+Identity = Tuple[str, str, str, str]
+
+
+def analyzer_version(deep: bool = False, as_dependency: bool = False) -> str:
+    """Version string stored results are keyed by: scanner version plus scan profile."""
+    if as_dependency:
+        return f"{SCANNER_VERSION}/dependency"
+    if deep:
+        return f"{SCANNER_VERSION}/deep+rules.{RULEPACK_VERSION}"
+    return f"{SCANNER_VERSION}/default"
+
+
+def scan_identity(label, path, download_stats: Optional[Dict] = None) -> Optional[Identity]:
+    """(ecosystem, name, version, integrity) of a scan target, None if it has none.
+
+    Downloads carry their integrity in download_stats; a local archive is
+    hashed. A local directory has no identity (its contents can change
+    under the same path) and is never stored.
+    """
+    stats = download_stats or {}
+    integrity = stats.get("integrity")
+    if integrity is None:
+        if not os.path.isfile(path):
+            return None
+        integrity = file_integrity(path)
+    source = stats.get("source") or str(label)
+    if source.startswith("npm:"):
+        name, _, version = source[4:].rpartition("@")
+        if not name:
+            # "@scope/name" or "name" without a version
+            name, version = source[4:], ""
+        return "npm", name, version, integrity
+    if source.startswith("github:"):
+        return "github", source[7:], stats.get("branch", ""), integrity
+    return "file", os.path.basename(os.path.normpath(str(label))), "", integrity
+
+
+class ScanStore:
+    """SQLite store of per-target scan summaries.
+
+    Keyed by ecosystem, name, version, integrity and analyzer version, so a
+    result is only reused for the very same bytes scanned by the same
+    analyzers; get() and get_many() ignore results older than max_age.
+    Indexed by scan time and score for history queries ("everything
+    scoring >= 4 this week"). Stores summaries (scores, finding counts,
+    issue types), not findings: those are in the reports.
+    """
+
+    def __init__(self, analyzer_version: str, path: Optional[str] = None, max_age: float = DEFAULT_MAX_AGE):
+        self.analyzer_version = analyzer_version
+        self.path = path or os.path.join(default_cache_dir(), "scans.sqlite")
+        self.max_age = max_age
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Connections don't cross processes; the copy reopens on first use.
+        state = dict(self.__dict__)
+        state["_conn"] = None
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scans ("
+                " ecosystem TEXT NOT NULL, name TEXT NOT NULL, version TEXT NOT NULL, integrity TEXT NOT NULL,"
+                " analyzer_version TEXT NOT NULL, scanned_at REAL NOT NULL, total INTEGER NOT NULL,"
+                " risk TEXT NOT NULL, summary TEXT NOT NULL,"
+                " PRIMARY KEY (ecosystem, name, version, integrity, analyzer_version))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS scans_scanned_at ON scans (scanned_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS scans_total ON scans (total, scanned_at)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, identity: Identity) -> Optional[Dict]:
+        """The fresh stored summary for one target, or None."""
+        return self.get_many([identity]).get(identity)
+
+    def get_many(self, identities: Iterable[Identity]) -> Dict[Identity, Dict]:
+        """Look up several targets at once; returns {identity: summary} for fresh results."""
+        wanted = list(dict.fromkeys(identities))
+        found: Dict[Identity, Dict] = {}
+        oldest = time.time() - self.max_age
+        with self._lock:
+            conn = self._connect()
+            for i in range(0, len(wanted), _BATCH):
+                batch = wanted[i:i + _BATCH]
+                rows = ",".join(["(?, ?, ?, ?)"] * len(batch))
+                params = [value for identity in batch for value in identity]
+                query = (f"SELECT ecosystem, name, version, integrity, scanned_at, summary FROM scans"
+                         f" WHERE (ecosystem, name, version, integrity) IN (VALUES {rows})"
+                         f" AND analyzer_version = ? AND scanned_at >= ?")
+                for *identity, scanned_at, summary in conn.execute(query, params + [self.analyzer_version, oldest]):
+                    summary = json.loads(summary)
+                    # Relabel from the total: older rows used a different risk scale.
+                    found[tuple(identity)] = dict(summary, risk=risk_level(summary["total"]), scanned_at=scanned_at)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[Identity, Dict]]):
+        """Store (identity, summary) pairs in one transaction; summary needs "total"."""
+        now = time.time()
+        rows = [(*identity, self.analyzer_version, now, summary["total"], risk_level(summary["total"]),
+                 json.dumps(summary, separators=(",", ":"))) for identity, summary in items]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO scans (ecosystem, name, version, integrity, analyzer_version,"
+                             " scanned_at, total, risk, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+
+    def query(self, min_score: Optional[int] = None, since: Optional[float] = None, ecosystem: Optional[str] = None,
+              name: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Stored results, newest first, from any analyzer version.
+
+        since is a Unix time; min_score and since use the score and time
+        indexes, ecosystem and name the primary key.
+        """
+        where, params = [], []
+        if min_score is not None:
+            where.append("total >= ?")
+            params.append(min_score)
+        if since is not None:
+            where.append("scanned_at >= ?")
+            params.append(since)
+        if ecosystem is not None:
+            where.append("ecosystem = ?")
+            params.append(ecosystem)
+        if name is not None:
+            where.append("name = ?")
+            params.append(name)
+        sql = ("SELECT ecosystem, name, version, integrity, analyzer_version, scanned_at, total, risk FROM scans"
+               + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY scanned_at DESC LIMIT ?")
+        columns = ("ecosystem", "name", "version", "integrity", "analyzer_version", "scanned_at", "total", "risk")
+        with self._lock:
+            rows = self._connect().execute(sql, params + [limit]).fetchall()
+        return [dict(zip(columns, row), risk=risk_level(row[6])) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,37 +1,86 @@
-import os
+import hashlib
+import heapq
+import io
+import multiprocessing
 import re
-import math
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import List, Dict, Optional, Tuple
 
+from analyzers.archive_fs import in_build_output
+from analyzers.entropy import high_entropy_mask, shannon_entropy as _shannon_entropy
+from analyzers.file_classifier import TEXT
+from analyzers.findings import FindingStore
+from analyzers.result_cache import ResultCache, stream_digest
+from analyzers.scan_context import FileEntry, ScanContext
 
+
+try:
+    import ahocorasick  # optional: pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+def _case_variants(literal: str) -> Tuple[str, ...]:
+    return tuple("".join(p) for p in product(*[{c.lower(), c.upper()} for c in literal]))
+
+
+# (kind, anchors, pattern). Every match of a pattern starts with one of its
+# literal anchors, so the full regex only has to run where an anchor occurs.
+# Add new token types here; patterns without a fixed prefix can use an empty
+# anchor tuple and fall back to a full finditer of their own.
 _SECRET_PATTERNS = [
-    ("aws_access_key", re.compile(r"AKIA[0-9A-Z]{16}")),
-    ("aws_secret_key", re.compile(r"(?i)aws(.{0,20})?(secret|access)[\s:=\"']{0,5}([A-Za-z0-9/+=]{40})")),
-    ("github_token", re.compile(r"ghp_[A-Za-z0-9]{36}")),
-    ("slack_token", re.compile(r"xox[baprs]-[A-Za-z0-9-]{10,48}")),
-    ("google_api_key", re.compile(r"AIza[0-9A-Za-z\-_]{35}")),
-    ("private_key", re.compile(r"-----BEGIN (RSA|DSA|EC|OPENSSH) PRIVATE KEY-----")),
+    ("aws_access_key", ("AKIA",), re.compile(r"AKIA[0-9A-Z]{16}")),
+    ("aws_secret_key", _case_variants("aws"), re.compile(r"(?i)aws(.{0,20})?(secret|access)[\s:=\"']{0,5}([A-Za-z0-9/+=]{40})")),
+    ("github_token", ("ghp_",), re.compile(r"ghp_[A-Za-z0-9]{36}")),
+    ("slack_token", ("xox",), re.compile(r"xox[baprs]-[A-Za-z0-9-]{10,48}")),
+    ("google_api_key", ("AIza",), re.compile(r"AIza[0-9A-Za-z\-_]{35}")),
+    ("private_key", ("-----BEGIN ",), re.compile(r"-----BEGIN (RSA|DSA|EC|OPENSSH) PRIVATE KEY-----")),
+    ("npm_token", ("npm_",), re.compile(r"npm_[A-Za-z0-9]{36}")),
+    ("stripe_secret_key", ("sk_live_", "rk_live_"), re.compile(r"[rs]k_live_[0-9A-Za-z]{24,99}")),
+    ("gitlab_token", ("glpat-",), re.compile(r"glpat-[0-9A-Za-z_\-]{20}")),
 ]
 
+# A str.find sweep per anchor is about as fast as CPython gets for a handful
+# of anchors. Past roughly a dozen, a single Aho-Corasick pass wins and keeps
+# the prefilter cost flat no matter how many token types are listed.
+_AHO_MIN_ANCHORS = 12
+
+
+def _build_automaton():
+    anchors = [a for _, anchor_set, _ in _SECRET_PATTERNS for a in anchor_set]
+    if ahocorasick is None or len(anchors) < _AHO_MIN_ANCHORS:
+        return None
+    automaton = ahocorasick.Automaton()
+    for idx, (_, anchor_set, _) in enumerate(_SECRET_PATTERNS):
+        for anchor in anchor_set:
+            _, owners = automaton.get(anchor, (len(anchor), []))
+            owners.append(idx)
+            automaton.add_word(anchor, (len(anchor), owners))
+    automaton.make_automaton()
+    return automaton
 
-_BINARY_EXTENSIONS = {
-    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".pdf",
-    ".zip", ".gz", ".tgz", ".xz", ".7z", ".jar", ".exe", ".dll",
-}
 
+_AUTOMATON = _build_automaton()
 
-def _shannon_entropy(s: str) -> float:
-    if not s:
-        return 0.0
-    freq = {}
-    for ch in s:
-        freq[ch] = freq.get(ch, 0) + 1
-    entropy = 0.0
-    length = len(s)
-    for count in freq.values():
-        p = count / length
-        entropy -= p * math.log2(p)
-    return entropy
+_CANDIDATE_TOKEN = re.compile(r"[A-Za-z0-9/_+=-]{20,}")
+_TOKEN_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789/_+=-")
+_ENTROPY_THRESHOLD = 3.5
+
+# Files up to this size are read in one go; larger ones are streamed in
+# windows of _CHUNK_SIZE, each extended by _CHUNK_OVERLAP bytes so matches
+# crossing a chunk boundary are still found. The overlap comfortably exceeds
+# the longest hard-secret pattern; only a high-entropy token longer than it
+# is scored on its first window's part alone.
+_WHOLE_READ_LIMIT = 1024 * 1024
+_CHUNK_SIZE = 1024 * 1024
+_CHUNK_OVERLAP = 4096
+
+# Cached results are only reused under the exact same rules and windowing.
+_RULESET_VERSION = hashlib.sha256(repr((
+    [(kind, anchors, pattern.pattern, pattern.flags) for kind, anchors, pattern in _SECRET_PATTERNS],
+    _CANDIDATE_TOKEN.pattern, _ENTROPY_THRESHOLD, _WHOLE_READ_LIMIT, _CHUNK_SIZE, _CHUNK_OVERLAP,
+)).encode("utf-8")).hexdigest()[:16]
 
 
 def _looks_like_secret_candidate(token: str) -> bool:
@@ -39,59 +88,301 @@ def _looks_like_secret_candidate(token: str) -> bool:
         return False
     if re.fullmatch(r"[A-Za-z0-9/_+=-]+", token) is None:
         return False
-    return _shannon_entropy(token) >= 3.5
+    return _shannon_entropy(token) >= _ENTROPY_THRESHOLD
 
 
-def _iter_text_files(root: str):
-    for dirpath, dirnames, filenames in os.walk(root):
-        # skip common large/noise dirs
-        dirnames[:] = [d for d in dirnames if d not in {".git", "node_modules", "dist", "build", "out"}]
-        for fname in filenames:
-            ext = os.path.splitext(fname)[1].lower()
-            if ext in _BINARY_EXTENSIONS:
-                continue
-            path = os.path.join(dirpath, fname)
-            try:
-                if os.path.getsize(path) > 1024 * 1024:  # 1MB cap
-                    continue
-            except OSError:
+def _anchor_hits(content: str) -> List[List[int]]:
+    """Start offsets of anchor occurrences, per entry in _SECRET_PATTERNS."""
+    hits: List[List[int]] = [[] for _ in _SECRET_PATTERNS]
+    if _AUTOMATON is not None:
+        for end, (length, owners) in _AUTOMATON.iter(content):
+            for idx in owners:
+                hits[idx].append(end - length + 1)
+        return hits
+
+    for idx, (_, anchor_set, _) in enumerate(_SECRET_PATTERNS):
+        positions = hits[idx]
+        for anchor in anchor_set:
+            pos = content.find(anchor)
+            while pos != -1:
+                positions.append(pos)
+                pos = content.find(anchor, pos + 1)
+        if len(anchor_set) > 1:
+            positions.sort()
+    return hits
+
+
+def _match_patterns(content: str) -> List[List["re.Match"]]:
+    """Run every secret pattern over content, only where its anchor occurs.
+
+    Returns one list of matches per entry in _SECRET_PATTERNS: the same
+    non-overlapping, left-to-right matches pattern.finditer gives.
+    """
+    matches: List[List[re.Match]] = []
+    for (_, anchor_set, pattern), positions in zip(_SECRET_PATTERNS, _anchor_hits(content)):
+        if not anchor_set:
+            matches.append(list(pattern.finditer(content)))
+            continue
+        found = []
+        next_allowed = 0
+        for pos in positions:
+            if pos < next_allowed:
                 continue
-            yield path
+            m = pattern.match(content, pos)
+            if m is not None:
+                found.append(m)
+                next_allowed = max(m.end(), pos + 1)
+        matches.append(found)
+    return matches
 
 
-def run_secrets_scan(path: str) -> Dict:
-    print("🔑 Running secrets scan...")
-    findings: List[Dict] = []
+def _scan_text(content: str, limit: Optional[int] = None, in_token: bool = False,
+               entropy: bool = True) -> List[Tuple[str, str]]:
+    """Return (kind, matched text) for every finding in content.
+
+    limit: only keep findings that start before this offset (the rest of the
+    text is overlap that the next window scans again).
+    in_token: content starts in the middle of a candidate token, so a
+    candidate at offset 0 is the tail of one already scored.
+    entropy: also run the high-entropy token heuristic. Off for minified and
+    generated files, where long random-looking tokens are the norm.
+    """
+    found: List[Tuple[str, str]] = []
+
+    # Regex-based detections
+    for (kind, _, _), matched in zip(_SECRET_PATTERNS, _match_patterns(content)):
+        for m in matched:
+            if limit is None or m.start() < limit:
+                found.append((kind, m.group(0)))
+
+    if not entropy:
+        return found
+
+    # Entropy-based heuristic on long tokens. The candidate regex already
+    # enforces the length and alphabet _looks_like_secret_candidate
+    # checks, so the whole text's candidates only need scoring, in one batch.
+    candidates = []
+    for m in _CANDIDATE_TOKEN.finditer(content):
+        if limit is not None and m.start() >= limit:
+            break
+        if in_token and m.start() == 0:
+            continue
+        candidates.append(m.group(0))
+    for candidate, is_secret in zip(candidates, high_entropy_mask(candidates, _ENTROPY_THRESHOLD)):
+        if is_secret:
+            found.append(("high_entropy_token", candidate))
+    return found
+
+
+def _read_exact(f, n: int) -> bytes:
+    # Archive member streams may return short reads.
+    parts = []
+    while n > 0:
+        data = f.read(n)
+        if not data:
+            break
+        parts.append(data)
+        n -= len(data)
+    return b"".join(parts)
+
+
+def _scan_range(f, start: int, stop: int, end: int, entropy: bool = True) -> List[Tuple[str, str]]:
+    """Scan bytes [start, stop) of a binary file in overlapping windows.
 
-    for file_path in _iter_text_files(path):
+    Each window is up to _CHUNK_SIZE bytes plus _CHUNK_OVERLAP bytes of
+    lookahead (never past end), so a match that crosses a chunk boundary is
+    still seen whole, and only matches starting inside the chunk itself are
+    kept. Memory stays at one window regardless of file size. The file is
+    only ever read forward, so compressed archive members stream cheaply.
+    """
+    found: List[Tuple[str, str]] = []
+    # One byte before the window tells whether it starts mid-token.
+    lead = b""
+    if start > 0:
+        f.seek(start - 1)
+        lead = f.read(1)
+    pending = b""
+    pos = start
+    while pos < stop:
+        head_end = min(pos + _CHUNK_SIZE, stop)
+        tail_end = min(head_end + _CHUNK_OVERLAP, end)
+        data = pending + _read_exact(f, tail_end - pos - len(pending))
+        in_token = bool(lead) and lead.decode("ascii", errors="ignore") in _TOKEN_CHARS
+        split = head_end - pos
+        head_text = data[:split].decode("utf-8", errors="ignore")
+        tail = data[split:]
+        if tail:
+            text = head_text + tail.decode("utf-8", errors="ignore")
+            found.extend(_scan_text(text, limit=len(head_text), in_token=in_token, entropy=entropy))
+        else:
+            found.extend(_scan_text(head_text, in_token=in_token, entropy=entropy))
+        # The overlap already read is the start of the next window.
+        lead = data[split - 1:split]
+        pending = tail
+        pos = head_end
+    return found
+
+
+def _scan_piece(fs, rel: str, size: int, start: int, stop: int, end: int, entropy: bool) -> List[Tuple[str, str]]:
+    """Scan one file, or one chunk-aligned slice of a big one.
+
+    Returns (kind, shortened match) pairs: the match is cut to the same
+    preview the report shows, so results stay small crossing processes.
+    """
+    if size <= _WHOLE_READ_LIMIT and end == size:
+        with io.TextIOWrapper(fs.open(rel), encoding="utf-8", errors="ignore") as f:
+            found = _scan_text(f.read(), entropy=entropy)
+    else:
+        with fs.open(rel) as f:
+            found = _scan_range(f, start, stop, end, entropy)
+    return [(kind, matched[:8]) for kind, matched in found]
+
+
+def _plan_pieces(fs, indexed: List[Tuple[int, FileEntry, bool]], max_bytes: Optional[int],
+                 piece_size: Optional[int]) -> List[Tuple]:
+    """Split files into scan tasks: (key, fs, rel, size, start, stop, end, entropy).
+
+    indexed holds (position in walk order, entry, entropy) triples. Files bigger than
+    piece_size are cut into chunk-aligned slices so one huge file can be
+    spread over several workers; keys sort in walk order.
+    """
+    tasks = []
+    for file_idx, entry, entropy in indexed:
+        end = entry.size if max_bytes is None else min(entry.size, max_bytes)
+        step = end if not piece_size or end <= piece_size else max(piece_size // _CHUNK_SIZE, 1) * _CHUNK_SIZE
+        start = 0
+        piece_idx = 0
+        while True:
+            stop = min(start + step, end) if step else end
+            tasks.append(((file_idx, piece_idx), fs, entry.rel, entry.size, start, stop, end, entropy))
+            piece_idx += 1
+            start = stop
+            if start >= end:
+                break
+    return tasks
+
+
+def _scan_shard(tasks: List[Tuple]) -> List[Tuple[Tuple[int, int], List[Tuple[str, str]]]]:
+    # Process-pool entry point; unreadable files are skipped like before.
+    results = []
+    for key, fs, rel, size, start, stop, end, entropy in tasks:
         try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read()
+            results.append((key, _scan_piece(fs, rel, size, start, stop, end, entropy)))
         except Exception:
             continue
+    return results
+
+
+def _shard_by_bytes(tasks: List[Tuple], num_shards: int) -> List[List[Tuple]]:
+    # Greedy longest-first: each task goes to the shard with the fewest bytes.
+    heap = [(0, i) for i in range(num_shards)]
+    shards: List[List[Tuple]] = [[] for _ in range(num_shards)]
+    for task in sorted(tasks, key=lambda t: t[5] - t[4], reverse=True):
+        load, i = heapq.heappop(heap)
+        shards[i].append(task)
+        heapq.heappush(heap, (load + (task[5] - task[4]), i))
+    return [shard for shard in shards if shard]
+
+
+def _scan_parallel(tasks: List[Tuple], workers: int) -> List[Tuple[Tuple[int, int], List[Tuple[str, str]]]]:
+    # A few shards per worker so a slow shard doesn't leave the others idle.
+    shards = _shard_by_bytes(tasks, workers * 4)
+    # spawn, not fork: the scan may be running next to other analyzer threads.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = []
+        for shard_results in pool.map(_scan_shard, shards):
+            results.extend(shard_results)
+    return results
+
+
+def _iter_text_files(context: ScanContext):
+    # Walk, stat and content-sniffed classification come from the shared
+    # context. Build output repeats the sources' strings; it is skipped.
+    for entry in context.text_files():
+        if not in_build_output(entry.rel):
+            yield entry
+
+
+def run_secrets_scan(path: str, context: Optional[ScanContext] = None, max_file_bytes: Optional[int] = None,
+                     workers: Optional[int] = None, cache: Optional[ResultCache] = None) -> Dict:
+    """Scan every text file for hard-coded secrets and high-entropy tokens.
+
+    Files up to 1 MB are read whole; larger ones are streamed in overlapping
+    windows. max_file_bytes caps how much of any one file is scanned (None
+    scans everything); files cut short are listed under "truncated".
+
+    workers > 1 spreads the files over a process pool, sharded by bytes
+    rather than file count. Findings come back in walk order either way, so
+    reports stay identical between serial and parallel runs.
+
+    With a cache, files whose content hash was already scanned under the
+    current rule set are not scanned again; hit/miss counts are returned
+    under "cache".
+    """
+    print("🔑 Running secrets scan...")
+    context = context or ScanContext(path)
+    entries = list(_iter_text_files(context))
+    # Minified and generated files only get the hard-secret patterns.
+    entropy_for = [context.classify(e) == TEXT for e in entries]
+    truncated_files = [e.path for e in entries if max_file_bytes is not None and e.size > max_file_bytes]
+
+    per_file: Dict[int, List[Tuple[str, str]]] = {}
+    digests: Dict[int, str] = {}
+    if cache is not None:
+        for file_idx, entry in enumerate(entries):
+            try:
+                with context.open(entry.rel) as f:
+                    digest = stream_digest(f, max_file_bytes)
+            except OSError:
+                continue
+            # Same bytes scanned without the entropy pass is a different result.
+            digests[file_idx] = digest if entropy_for[file_idx] else digest + ":patterns"
+        cached = cache.get_many(set(digests.values()), "secrets", _RULESET_VERSION)
+        for file_idx, digest in digests.items():
+            if digest in cached:
+                per_file[file_idx] = [tuple(f) for f in cached[digest]]
+    pending = [(i, e, entropy_for[i]) for i, e in enumerate(entries) if i not in per_file]
+
+    # Archives are scanned in-process: each worker would have to inflate its own copy.
+    if workers and workers > 1 and len(pending) > 1 and not context.is_archive:
+        total = sum(e.size for _, e, _ in pending)
+        tasks = _plan_pieces(context.fs, pending, max_file_bytes, piece_size=max(total // (workers * 4), _CHUNK_SIZE))
+        results = _scan_parallel(tasks, workers)
+    else:
+        tasks = _plan_pieces(context.fs, pending, max_file_bytes, piece_size=None)
+        results = _scan_shard(tasks)
+    results.sort(key=lambda r: r[0])
+
+    pieces_expected: Dict[int, int] = {}
+    for (file_idx, _), *_ in tasks:
+        pieces_expected[file_idx] = pieces_expected.get(file_idx, 0) + 1
+    pieces_done: Dict[int, int] = {}
+    for (file_idx, _), piece_findings in results:
+        per_file.setdefault(file_idx, []).extend(piece_findings)
+        pieces_done[file_idx] = pieces_done.get(file_idx, 0) + 1
+
+    cache_stats = None
+    if cache is not None:
+        # Only files that were scanned completely are worth remembering.
+        cache.put_many(
+            ((digests[i], per_file[i]) for i, _, _ in pending
+             if i in digests and pieces_done.get(i) == pieces_expected.get(i)),
+            "secrets", _RULESET_VERSION,
+        )
+        hits = len(entries) - len(pending)
+        cache_stats = {"hits": hits, "misses": len(pending)}
 
-        # Regex-based detections
-        for kind, pattern in _SECRET_PATTERNS:
-            for match in pattern.finditer(content):
-                findings.append({
-                    "type": kind,
-                    "file": file_path,
-                    "match": match.group(0)[:8] + "…"
-                })
-
-        # Entropy-based heuristic on long tokens
-        for candidate in re.findall(r"[A-Za-z0-9/_+=-]{20,}", content):
-            if _looks_like_secret_candidate(candidate):
-                findings.append({
-                    "type": "high_entropy_token",
-                    "file": file_path,
-                    "match": candidate[:8] + "…"
-                })
+    # Reported as {"type", "file", "match"}, each path stored once.
+    findings = FindingStore(("match",))
+    for file_idx in sorted(per_file):
+        file_path = entries[file_idx].path
+        for kind, preview in per_file[file_idx]:
+            findings.add(kind, file_path, preview + "…")
 
     # Simple scoring: 2 points if any hard secret; 1 if only entropy; cap 5
-    hard_secret_types = {name for name, _ in _SECRET_PATTERNS}
-    has_hard = any(f["type"] in hard_secret_types for f in findings)
-    has_entropy_only = any(f["type"] == "high_entropy_token" for f in findings)
+    hard_secret_types = {name for name, _, _ in _SECRET_PATTERNS}
+    has_hard = any(t in hard_secret_types for t in findings.counts)
+    has_entropy_only = "high_entropy_token" in findings.counts
 
     score = 0
     if has_hard:
@@ -101,9 +392,17 @@ def run_secrets_scan(path: str) -> Dict:
     score = min(score, 5)
 
     print(f"🔎 Secrets findings: {len(findings)}")
-    return {
+    if truncated_files:
+        print(f"✂️  {len(truncated_files)} file(s) scanned only up to {max_file_bytes} bytes")
+    result = {
         "score": score,
         "issues": findings,
+        "truncated": truncated_files,
+        "files": len(entries),
+        "bytes": sum(e.size if max_file_bytes is None else min(e.size, max_file_bytes) for e in entries),
     }
+    if cache_stats is not None:
+        result["cache"] = cache_stats
+    return result
 
 
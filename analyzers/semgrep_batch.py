@@ -0,0 +1,153 @@
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from analyzers.scan_context import ScanContext
+from analyzers.static_analyzer import (
+    DEFAULT_TIMEOUT, RULEPACK_VERSION, SemgrepFailed, run_semgrep, select_targets, semgrep_error,
+)
+
+
+DEFAULT_BATCH_SIZE = 16
+# How long a partial batch waits for more targets before it runs anyway.
+DEFAULT_LINGER = 2.0
+# A batch run gets the full per-target timeout for its first target and
+# this share of it for each further one: startup and rule compilation are
+# paid once per run, not per target.
+BATCH_TIMEOUT_SHARE = 0.25
+
+# (root, relative targets, future for its result, time queued)
+_Pending = Tuple[str, List[str], Future, float]
+
+
+class SemgrepBatcher:
+    """Runs semgrep once per batch of targets instead of once per target.
+
+    semgrep pays several seconds of startup and rule compilation on every
+    run; with many small packages that dominates the scan. submit() queues
+    one target and returns a Future for its own result; a background thread
+    runs one semgrep over up to batch_size queued targets (or fewer, once
+    the oldest has waited linger seconds) and splits the findings back per
+    target. timeout is a per-target budget; a batch run's budget grows
+    with the number of targets in it (see BATCH_TIMEOUT_SHARE). A batch
+    that times out or fails is rerun one target at a time, each with its
+    own budget, so one pathological package only costs its own result and
+    the rest are not held up by repeated retries of the whole batch.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, timeout: int = DEFAULT_TIMEOUT,
+                 jobs: Optional[int] = None, max_file_bytes: Optional[int] = None, linger: float = DEFAULT_LINGER):
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.jobs = jobs
+        self.max_file_bytes = max_file_bytes
+        self.linger = linger
+        self.semgrep = shutil.which("semgrep")
+        self.runs = 0
+        self.failed_batches = 0
+        self._pending: List[_Pending] = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._dispatch, name="semgrep-batch", daemon=True)
+        self._thread.start()
+
+    def submit(self, root: str, targets: List[str]) -> Future:
+        """Queue one target: root is a real directory, targets the files in it to scan."""
+        future: Future = Future()
+        if self.semgrep is None:
+            future.set_result(semgrep_error("semgrep not found on PATH"))
+            return future
+        if not targets:
+            future.set_result({"score": 0, "issues": [], "rulepack": RULEPACK_VERSION})
+            return future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SemgrepBatcher is closed")
+            self._pending.append((root, targets, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def submit_context(self, context: ScanContext) -> Future:
+        """Queue a scan context's targets, extracting an archive only if it has any.
+
+        The context must stay open until the future is done."""
+        targets = select_targets(context)
+        if not targets or self.semgrep is None:
+            return self.submit("", targets)
+        return self.submit(context.materialize(), targets)
+
+    def close(self):
+        """Run whatever is still queued and stop the background thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _next_batch(self) -> Optional[List[_Pending]]:
+        with self._cond:
+            while True:
+                if self._pending:
+                    if len(self._pending) >= self.batch_size or self._closed:
+                        break
+                    wait = self._pending[0][3] + self.linger - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+            batch = self._pending[:self.batch_size]
+            self._pending = self._pending[self.batch_size:]
+            return batch
+
+    def _dispatch(self):
+        # One semgrep at a time: each already uses --jobs cores, and
+        # targets queued meanwhile make the next batch fuller.
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._run(batch)
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def budget(self, targets: int) -> float:
+        """Timeout in seconds for one semgrep run over this many targets."""
+        return self.timeout * (1 + BATCH_TIMEOUT_SHARE * (targets - 1))
+
+    def _run(self, batch: List[_Pending]):
+        start = time.perf_counter()
+        self.runs += 1
+        try:
+            results = run_semgrep([(root, targets) for root, targets, _, _ in batch], self.semgrep,
+                                  jobs=self.jobs, max_file_bytes=self.max_file_bytes,
+                                  timeout=self.budget(len(batch)))
+        except SemgrepFailed as e:
+            if len(batch) > 1:
+                # Usually one target is to blame: rerun each alone rather than
+                # bisecting, which re-waits a timeout on every level.
+                self.failed_batches += 1
+                for pending in batch:
+                    self._run([pending])
+                return
+            results = {os.path.abspath(batch[0][0]): semgrep_error(str(e))}
+        elapsed = round(time.perf_counter() - start, 3)
+        for root, _, future, _ in batch:
+            # The same root queued twice gets a result each.
+            result = dict(results[os.path.abspath(root)], elapsed=elapsed, batch=len(batch))
+            result["metrics"] = {"wall_seconds": elapsed, "batch": len(batch), "files": result.get("files"),
+                                 "subprocess_seconds": result.get("subprocess_seconds")}
+            future.set_result(result)
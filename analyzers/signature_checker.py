@@ -1,19 +1,22 @@
 import os
 import subprocess
+import time
 
 
 def verify_with_cosign(target):
     cosign_path = os.path.join(os.getcwd(), "tools", "cosign.exe")
+    start = time.perf_counter()
     try:
         result = subprocess.run(
             [cosign_path, "verify", target],
             capture_output=True,
             text=True
         )
+        elapsed = round(time.perf_counter() - start, 3)
         if "Verified OK" in result.stdout:
-            return {"verified": True, "details": result.stdout}
+            return {"verified": True, "details": result.stdout, "subprocess_seconds": elapsed}
         else:
-            return {"verified": False, "details": result.stdout + result.stderr}
+            return {"verified": False, "details": result.stdout + result.stderr, "subprocess_seconds": elapsed}
     except Exception as e:
         return {"verified": False, "error": str(e)}
     
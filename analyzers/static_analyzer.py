@@ -1,24 +1,194 @@
+import json
+import os
+import shutil
 import subprocess
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from analyzers.archive_fs import SKIP_DIRS
+from analyzers.file_classifier import TEXT
+from analyzers.findings import FindingStore
+from analyzers.scan_context import ScanContext
 
-def run_static_analysis(path):
-    print("📦 Running static code analysis...")
 
-    result = subprocess.run(
-        ["semgrep", "--config", "auto", path],
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='ignore'
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules")
+# Bump whenever a file in analyzers/rules changes; reported with every
+# result so a score can be traced back to the rules that produced it.
+RULEPACK_VERSION = "2026.10.1"
+
+# Files the rulepack has rules for.
+TARGET_SUFFIXES = (".js", ".cjs", ".mjs", ".jsx", ".ts", ".cts", ".mts", ".tsx")
+TARGET_NAMES = ("package.json",)
+# Past this many files on one command line, targets are passed as their
+# root directory instead, filtered with the same --include/--exclude globs.
+MAX_EXPLICIT_TARGETS = 2000
+DEFAULT_TIMEOUT = 300
+
+SEVERITY_POINTS = {"ERROR": 2, "WARNING": 1}
+MAX_SCORE = 5
+
+
+class SemgrepFailed(Exception):
+    """semgrep timed out or produced no usable JSON."""
+
+
+def _is_target(rel: str) -> bool:
+    name = rel.rsplit("/", 1)[-1]
+    return name in TARGET_NAMES or name.endswith(TARGET_SUFFIXES)
+
+
+def select_targets(context: ScanContext) -> List[str]:
+    # Text files from the shared walk: minified bundles and generated files
+    # are skipped like the secrets scan skips them.
+    return [e.rel for e in context.files if _is_target(e.rel) and context.classify(e) == TEXT]
+
+
+def _filter_args() -> List[str]:
+    args = []
+    for suffix in TARGET_SUFFIXES:
+        args += ["--include", f"*{suffix}"]
+    for name in TARGET_NAMES:
+        args += ["--include", name]
+    for skipped in sorted(SKIP_DIRS):
+        args += ["--exclude", skipped]
+    return args
+
+
+def _rule_name(check_id: str) -> str:
+    # semgrep prefixes rule ids with the config path: "analyzers.rules.eval-dynamic"
+    return check_id.rsplit(".", 1)[-1]
+
+
+def parse_results(output: Dict) -> List[Dict]:
+    """Structured issues from semgrep --json output."""
+    issues = []
+    for match in output.get("results", []):
+        extra = match.get("extra", {})
+        rule = _rule_name(match.get("check_id", ""))
+        issues.append({
+            "type": extra.get("metadata", {}).get("category", rule),
+            "rule": rule,
+            "severity": extra.get("severity", "WARNING"),
+            "file": match.get("path"),
+            "line": match.get("start", {}).get("line"),
+            "message": " ".join(extra.get("message", "").split()),
+        })
+    return issues
+
 
-    )
+def score_issues(issues: FindingStore) -> int:
+    # Each rule counts once however often it matches, so a bundle with a
+    # hundred exec() calls doesn't outweigh one exfiltration finding.
+    rules = {}
+    for rule, severity in zip(issues.column("rule"), issues.column("severity")):
+        rules[rule] = max(rules.get(rule, 0), SEVERITY_POINTS.get(severity, 1))
+    return min(sum(rules.values()), MAX_SCORE)
+
+
+def _new_store() -> FindingStore:
+    return FindingStore(("rule", "severity", "line", "message"), ints=("line",), tables=("rule", "severity"))
+
+
+def _owner(path: str, roots: Sequence[str]) -> Optional[str]:
+    # roots are sorted longest first, so a root nested in another wins.
+    for root in roots:
+        if path.startswith(root + os.sep) or path.startswith(root + "/"):
+            return root
+    return None
+
+
+def run_semgrep(items: Sequence[Tuple[str, List[str]]], semgrep: str, jobs: Optional[int] = None,
+                max_file_bytes: Optional[int] = None, timeout: float = DEFAULT_TIMEOUT) -> Dict[str, Dict]:
+    """One semgrep run over several targets; returns {root: result} for each (root, relative targets).
+
+    Every target is passed by absolute path, so each finding is assigned
+    back to the root it is under by path prefix and reported relative to
+    it. Raises SemgrepFailed when semgrep times out or its output isn't JSON.
+    """
+    roots = [os.path.abspath(root) for root, _ in items]
+    args = []
+    walk_roots = False
+    for root, (_, targets) in zip(roots, items):
+        if len(args) + len(targets) <= MAX_EXPLICIT_TARGETS:
+            args += [os.path.join(root, rel) for rel in targets]
+        else:
+            args.append(root)
+            walk_roots = True
+
+    # The bundled rulepack is local and pinned: no registry fetch, no
+    # metrics upload, no version check on every run.
+    command = [semgrep, "scan", "--config", RULES_DIR, "--json", "--metrics=off", "--disable-version-check",
+               "--jobs", str(jobs or os.cpu_count() or 1), "--timeout", "30"]
+    if max_file_bytes:
+        command += ["--max-target-bytes", str(max_file_bytes)]
+    if walk_roots:
+        command += _filter_args()
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(command + args, capture_output=True, text=True,
+                                encoding="utf-8", errors="replace", timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise SemgrepFailed(f"semgrep timed out after {timeout:g}s")
+    try:
+        output = json.loads(result.stdout)
+    except ValueError:
+        stderr = result.stderr.strip().splitlines()
+        raise SemgrepFailed(stderr[-1] if stderr else f"semgrep exited with {result.returncode}")
+
+    by_length = sorted(set(roots), key=len, reverse=True)
+    issues: Dict[str, FindingStore] = {root: _new_store() for root in roots}
+    for issue in parse_results(output):
+        root = _owner(os.path.abspath(issue["file"] or ""), by_length)
+        if root is not None:
+            rel = os.path.relpath(os.path.abspath(issue["file"]), root).replace(os.sep, "/")
+            issues[root].add(issue["type"], rel, issue["rule"], issue["severity"], issue["line"], issue["message"])
+    errors: Dict[str, List[str]] = {}
+    for error in output.get("errors", []):
+        if error.get("level") != "error":
+            continue
+        root = _owner(os.path.abspath(error.get("path") or ""), by_length)
+        # An error with no file (a rule problem) concerns every target.
+        for owner in [root] if root is not None else roots:
+            errors.setdefault(owner, []).append(error.get("message", ""))
+
+    # Targets batched together share one semgrep process and its time.
+    subprocess_seconds = round(time.perf_counter() - start, 3)
+    results = {}
+    for root, (_, targets) in zip(roots, items):
+        out = {"score": score_issues(issues[root]), "issues": issues[root], "rulepack": RULEPACK_VERSION,
+               "files": len(targets), "subprocess_seconds": subprocess_seconds}
+        if root in errors:
+            out["errors"] = errors[root]
+        results[root] = out
+    return results
+
+
+def semgrep_error(error: str) -> Dict:
+    return {"score": 0, "issues": [], "error": error, "rulepack": RULEPACK_VERSION}
+
+
+def run_static_analysis(path, context: Optional[ScanContext] = None, jobs: Optional[int] = None,
+                        max_file_bytes: Optional[int] = None, timeout: int = DEFAULT_TIMEOUT):
+    print("📦 Running static code analysis...")
 
-    findings = result.stdout.count("rule_id")  # count Semgrep matches
-    score = min(findings, 5)  # keep the score simple: max 5
+    # semgrep needs real files: an archive target is only extracted when
+    # semgrep is actually there to run.
+    semgrep = shutil.which("semgrep")
+    if semgrep is None:
+        print("⚠️  semgrep not found on PATH; static analysis skipped")
+        return semgrep_error("semgrep not found on PATH")
+    if context is None:
+        context = ScanContext(path)
+    targets = select_targets(context)
+    if not targets:
+        print("🔍 Issues found: 0 (no JavaScript/TypeScript files)")
+        return {"score": 0, "issues": _new_store(), "rulepack": RULEPACK_VERSION}
+    root = context.materialize()
 
-    print(f"🔍 Issues found: {findings}")
-    return {"score": score, 
-            "details": result.stdout,
-            "score": 0,
-            "issues": []
-            }
+    try:
+        result = run_semgrep([(root, targets)], semgrep, jobs=jobs, max_file_bytes=max_file_bytes,
+                             timeout=timeout)[os.path.abspath(root)]
+    except SemgrepFailed as e:
+        return semgrep_error(str(e))
+    print(f"🔍 Issues found: {len(result['issues'])}")
+    return result
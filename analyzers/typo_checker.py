@@ -1,59 +1,44 @@
-import json
-import os
-from typing import Dict, List, Tuple
-
-
-_POPULAR_PACKAGES = {
-    "react", "lodash", "axios", "express", "vue", "next", "typescript",
-    "webpack", "jest", "rxjs", "eslint", "prettier", "moment",
-}
-
-
-def _read_package_json(path: str) -> Dict:
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
-def _levenshtein(a: str, b: str) -> int:
-    if a == b:
-        return 0
-    if len(a) == 0:
-        return len(b)
-    if len(b) == 0:
-        return len(a)
-    prev = list(range(len(b) + 1))
-    for i, ca in enumerate(a, start=1):
-        curr = [i]
-        for j, cb in enumerate(b, start=1):
-            cost = 0 if ca == cb else 1
-            curr.append(min(
-                curr[-1] + 1,        # insertion
-                prev[j] + 1,          # deletion
-                prev[j - 1] + cost,   # substitution
-            ))
-        prev = curr
-    return prev[-1]
-
-
-def _closest_popular_name(name: str) -> Tuple[str, int]:
-    name = name.lower()
-    best_pkg = ""
-    best_dist = 999
-    for pkg in _POPULAR_PACKAGES:
-        d = _levenshtein(name, pkg)
-        if d < best_dist:
-            best_dist = d
-            best_pkg = pkg
-    return best_pkg, best_dist
-
-
-def run_typo_and_maintainer_check(path: str) -> Dict:
+from typing import Dict, List, Optional
+
+from analyzers.lockfile_parsers import find_lockfile, iter_lockfile, tree_path
+from analyzers.scan_context import ScanContext
+from analyzers.typo_index import default_index
+
+
+TYPOSQUAT_TYPES = {"typosquat_suspected", "separator_confusion", "scope_confusion"}
+DEPENDENCY_FIELDS = ("dependencies", "devDependencies")
+
+
+def _direct_dependencies(pkg: Dict) -> List[str]:
+    direct: List[str] = []
+    for field in DEPENDENCY_FIELDS:
+        deps = pkg.get(field)
+        if isinstance(deps, dict):
+            direct.extend(deps)
+    return direct
+
+
+def _dependency_paths(pkg: Dict, context: ScanContext) -> Dict[str, List[str]]:
+    # Every dependency name -> where it sits in the tree ("a > b"): direct
+    # ones from package.json, transitive ones from the lockfile.
+    paths: Dict[str, List[str]] = {}
+    for dep in _direct_dependencies(pkg):
+        paths.setdefault(dep, []).append(dep)
+    lockfile_name = find_lockfile(context)
+    if lockfile_name is not None:
+        try:
+            for dep, install_path, _ in iter_lockfile(context, lockfile_name):
+                paths.setdefault(dep, []).append(tree_path(install_path))
+        except ValueError:
+            # A broken lockfile is reported by the lockfile check.
+            pass
+    return {dep: list(dict.fromkeys(p)) for dep, p in paths.items() if isinstance(dep, str)}
+
+
+def run_typo_and_maintainer_check(path: str, context: Optional[ScanContext] = None) -> Dict:
     print("🔤 Checking for typosquatting and maintainer hygiene...")
-    pkg_json_path = os.path.join(path, "package.json")
-    pkg = _read_package_json(pkg_json_path)
+    context = context or ScanContext(path)
+    pkg = context.read_json("package.json")
     if not pkg:
         return {"score": 0, "issues": ["no_package_json"], "details": {}}
 
@@ -61,9 +46,18 @@ def run_typo_and_maintainer_check(path: str) -> Dict:
 
     name = str(pkg.get("name", "")).strip()
     if name:
-        close_to, dist = _closest_popular_name(name)
-        if 0 < dist <= 2:
-            issues.append({"type": "typosquat_suspected", "name": name, "close_to": close_to, "distance": dist})
+        finding = default_index().check(name)
+        if finding is not None:
+            issues.append(finding)
+
+    # Typosquats get in as dependencies: check the whole tree in one batch.
+    # Only the package's own name and its direct dependencies are scored;
+    # transitive suspects are reported (with their paths) for review, but a
+    # near-miss somewhere deep in a stock tree shouldn't raise the risk level.
+    dependency_paths = _dependency_paths(pkg, context)
+    direct = set(_direct_dependencies(pkg))
+    for dep, finding in default_index().check_many(dependency_paths).items():
+        issues.append(dict(finding, paths=dependency_paths[dep], direct=dep in direct))
 
     # Maintainer/repo hygiene signals
     if not pkg.get("repository"):
@@ -77,7 +71,7 @@ def run_typo_and_maintainer_check(path: str) -> Dict:
 
     # Simple scoring rules
     score = 0
-    if any(i.get("type") == "typosquat_suspected" for i in issues):
+    if any(i.get("type") in TYPOSQUAT_TYPES and i.get("direct", True) for i in issues):
         score += 2
     if any(i.get("type") in {"no_repository", "no_author", "no_maintainers"} for i in issues):
         score += 1
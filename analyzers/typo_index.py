@@ -0,0 +1,447 @@
+import bisect
+import functools
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import zlib
+from array import array
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from analyzers.result_cache import default_cache_dir
+
+try:
+    import numpy as np  # optional: one vectorized search for a whole batch
+except ImportError:
+    np = None
+
+
+DEFAULT_NAMES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "popular_npm.txt")
+# Bump when the index layout or matching rules change; old pickles are then ignored.
+INDEX_VERSION = 4
+MAX_DISTANCE = 2
+# An unknown name is only a suspected typo of a name in the top
+# 1/RANK_GAP of the list: near less popular names, it is more likely a
+# real package the list doesn't have than a squat.
+RANK_GAP = 4
+# SymSpell only indexes deletions of the first few characters: far fewer
+# keys, and candidates are verified against the full name anyway.
+PREFIX_LENGTH = 7
+# Short names are within a few edits of too many others: names up to
+# SHORT_NAME characters only match at distance 1, and names under
+# MIN_NAME characters (opn, qw) aren't matched by distance at all.
+SHORT_NAME = 7
+MIN_NAME = 4
+
+_SEPARATORS = re.compile(r"[-_.@/]")
+_PUNCTUATION = re.compile(r"[@/]")
+# Key-space marker for scoped names' bare (scope + base) prefixes.
+_BARE = "\0"
+
+_default_index: Optional["TypoIndex"] = None
+_default_lock = threading.Lock()
+
+
+def canonical_name(name: str) -> str:
+    # "@types/react", "types-react" and "types_react" all become "typesreact".
+    return _SEPARATORS.sub("", name.lower())
+
+
+def split_scope(name: str) -> Tuple[Optional[str], str]:
+    if name.startswith("@") and "/" in name:
+        scope, base = name[1:].split("/", 1)
+        return scope, base
+    return None, name
+
+
+def bounded_distance(a: str, b: str, max_distance: int) -> int:
+    """Edit distance, or max_distance + 1 as soon as it must exceed max_distance.
+
+    Optimal string alignment: Levenshtein plus swaps of adjacent letters,
+    so "raect" is one edit from "react". Only the diagonal band
+    |i - j| <= max_distance is computed, and a row whose cells all exceed
+    the bound ends the comparison early.
+    """
+    if a == b:
+        return 0
+    over = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return over
+    # A shared prefix or suffix never changes the distance.
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return len(b) if len(b) <= max_distance else over
+
+    before = None
+    prev = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - max_distance)
+        hi = min(len(b), i + max_distance)
+        curr = [over] * (len(b) + 1)
+        curr[0] = i if i <= max_distance else over
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            cb = b[j - 1]
+            value = min(prev[j - 1] + (ca != cb), prev[j] + 1, curr[j - 1] + 1)
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, before[j - 2] + 1)
+            curr[j] = value if value < over else over
+        if min(curr[lo - 1:hi + 1]) > max_distance:
+            return over
+        before, prev = prev, curr
+    return prev[len(b)]
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _deletes(word: str, depth: int) -> FrozenSet[str]:
+    # word plus every string reachable by deleting up to depth characters.
+    # Cached: a batch generates the same prefixes for its lookup pass.
+    found = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return frozenset(found)
+
+
+def _index_form(name: str) -> str:
+    # Scoped names are indexed scope-last ("@babel/core" -> "core@babel"):
+    # otherwise the prefix is mostly the scope, and every @types/ query
+    # would hit every popular @types/ name.
+    scope, base = split_scope(name)
+    return name if scope is None else f"{base}@{scope}"
+
+
+def _plain_parts(key: str) -> Optional[Tuple[Optional[str], str]]:
+    # (scope, base) of a well-formed name ("@scope/base" or "base"), None
+    # if key has "@" or "/" anywhere else.
+    scope, base = split_scope(key)
+    if scope is None:
+        return None if _PUNCTUATION.search(key) else (None, key)
+    if not scope or not base or _PUNCTUATION.search(scope + base):
+        return None
+    return scope, base
+
+
+def _scope_readings(key: str, max_distance: int) -> Dict[str, int]:
+    # {index form: edits left} for every way key could be a scoped name
+    # with its "@" or "/" deleted, substituted, moved or added. Each reading
+    # places the scope's "@" and "/" in key, pays for doing so, and leaves
+    # the remaining edits to the deletion lookup; any other "@" and "/" in
+    # key are dropped, since a scoped name has no further ones.
+    readings: Dict[str, int] = {}
+    ats = []
+    for a in range(min(max_distance + 1, len(key) + 1)):
+        # key[:a] deleted, then key[a] is (or is substituted for) the "@", or an "@" is inserted.
+        if a < len(key):
+            ats.append((a + (key[a] != "@"), key[a + 1:]))
+        ats.append((a + 1, key[a:]))
+    for cost, rest in ats:
+        for b in range(len(rest) + 1):
+            splits = [(cost + 1, rest[:b], rest[b:])]
+            if b < len(rest):
+                splits.append((cost + (rest[b] != "/"), rest[:b], rest[b + 1:]))
+            for spent, scope, base in splits:
+                if spent > max_distance or not scope or not base:
+                    continue
+                form = f"{_PUNCTUATION.sub('', base)}@{_PUNCTUATION.sub('', scope)}"
+                readings[form] = max(readings.get(form, -1), max_distance - spent)
+    return readings
+
+
+def _bare_variants(word: str, prefix_length: int, short: bool) -> Set[str]:
+    # Bare-prefix keys for word and for word less any one of its first
+    # prefix_length characters; short also adds each one cut by a character.
+    found = set()
+    for j in range(min(prefix_length, len(word)) + 1):
+        variant = (word[:j] + word[j + 1:])[:prefix_length]
+        found.add(_BARE + variant)
+        if short:
+            found.add(_BARE + variant[:prefix_length - 1])
+    return found
+
+
+@functools.lru_cache(maxsize=1 << 14)
+def _query_variants(key: str, max_distance: int, prefix_length: int) -> FrozenSet[str]:
+    """Deletion variants to look up so that every name within max_distance of key is a candidate.
+
+    A scoped name is indexed scope-last, so a key whose "@" or "/" doesn't
+    line up with the name's needs more than its own index form. For
+    well-formed keys and max_distance <= 2 that takes a few extra keys:
+
+    - an unscoped key is within 2 edits of "@scope/base" only if both
+      punctuation marks were deleted or replaced by a letter, so the
+      key, with its first character and/or one other dropped, is the
+      name's bare prefix ("babel-core" for "@babel/core");
+    - a scoped key is within 2 edits of an unscoped name only the same way
+      round: the name, less up to two letters, starts like scope + base;
+    - a scoped key whose "/" sits one place off is a swap (one edit) plus
+      at most one more; any other misplacement costs both edits, which
+      leaves the bare prefixes equal up to one dropped letter on each side.
+
+    Anything else (keys with stray "@" or "/", larger distances) tries
+    every placement of the scope's punctuation in key.
+    """
+    parts = _plain_parts(key)
+    if parts is None or max_distance > 2:
+        variants = set(_deletes(key[:prefix_length], max_distance))
+        variants |= _deletes(_index_form(key)[:prefix_length], max_distance)
+        for form, depth in _scope_readings(key, max_distance).items():
+            variants |= _deletes(form[:prefix_length], depth)
+        return frozenset(variants)
+    scope, base = parts
+    if scope is None:
+        variants = set(_deletes(key[:prefix_length], max_distance))
+        if max_distance == 2:
+            variants |= _bare_variants(key, prefix_length, False)
+            variants |= _bare_variants(key[1:], prefix_length, False)
+        return frozenset(variants)
+    variants = set(_deletes(f"{base}@{scope}"[:prefix_length], max_distance))
+    if max_distance >= 1:
+        # "/" swapped with the letter before or after it.
+        if len(scope) > 1:
+            variants |= _deletes(f"{scope[-1]}{base}@{scope[:-1]}"[:prefix_length], max_distance - 1)
+        if len(base) > 1:
+            variants |= _deletes(f"{base[1:]}@{scope}{base[0]}"[:prefix_length], max_distance - 1)
+    if max_distance == 2:
+        bare = scope + base
+        variants.update(bare[:prefix_length - cut] for cut in range(3))
+        variants |= _bare_variants(bare, prefix_length, True)
+    return frozenset(variants)
+
+
+def _variant_key(variant: str) -> int:
+    # Deletion variants are stored as 32-bit hashes: a collision only adds
+    # a candidate, and every candidate is verified by edit distance anyway.
+    return zlib.crc32(variant.encode("utf-8")) << 32
+
+
+def parse_names(lines: Iterable[str]) -> List[str]:
+    """Package names from a list file: one per line, most popular first, # comments.
+
+    Anything after the name on a line (e.g. a download count) is ignored.
+    """
+    names = []
+    for line in lines:
+        fields = line.split("#", 1)[0].split()
+        if fields:
+            names.append(fields[0].lower())
+    return list(dict.fromkeys(names))
+
+
+class TypoIndex:
+    """Typosquat lookups against a list of popular package names.
+
+    Edit-distance candidates come from a SymSpell deletion dictionary: every
+    popular name is indexed under the strings left after deleting up to
+    max_distance characters from its prefix, so a query only generates its
+    own deletions and verifies the few names they hit with a banded edit
+    distance. Scoped names are indexed scope-last, and also under their bare
+    (scope + base) prefix so that keys whose "@" or "/" is missing or out of
+    place still reach them (see _query_variants): lookup() returns exactly
+    what a linear scan would. Separator tricks (lo-dash, react_dom) and
+    scope confusion (types-react for @types/react) are caught by exact
+    lookups on the canonical, punctuation-free name. Edit-distance matches
+    are only reported against names in the top 1/RANK_GAP of the list.
+
+    Names are ranked by their position in the list; ties go to the more
+    popular name. The deletion dictionary is one sorted array of
+    (variant hash << 32 | rank) integers, searched with bisect, so a
+    pickled index of 100k names loads without rebuilding millions of
+    dict entries.
+    """
+
+    def __init__(self, names: Iterable[str], max_distance: int = MAX_DISTANCE, prefix_length: int = PREFIX_LENGTH):
+        self.version = INDEX_VERSION
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.names: List[str] = list(dict.fromkeys(n.lower() for n in names))
+        self.ranks: Dict[str, int] = {n: r for r, n in enumerate(self.names)}
+        self.canonical: Dict[str, List[int]] = {}
+        entries = []
+        for rank, name in enumerate(self.names):
+            variants = _deletes(_index_form(name)[:prefix_length], max_distance)
+            entries.extend(_variant_key(variant) | rank for variant in variants)
+            scope, base = split_scope(name)
+            if scope is not None:
+                variants = _deletes((scope + base)[:prefix_length], 1)
+                entries.extend(_variant_key(_BARE + variant) | rank for variant in variants)
+            self.canonical.setdefault(canonical_name(name), []).append(rank)
+        entries.sort()
+        self.deletes = array("Q", entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self.ranks
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _candidates(self, variant: str, memo: Optional[Dict[str, List[int]]]) -> List[int]:
+        if memo is not None and variant in memo:
+            return memo[variant]
+        hashed = _variant_key(variant)
+        deletes = self.deletes
+        lo = i = bisect.bisect_left(deletes, hashed)
+        while i < len(deletes) and deletes[i] >> 32 == hashed >> 32:
+            i += 1
+        ranks = [entry & 0xFFFFFFFF for entry in deletes[lo:i]]
+        if memo is not None:
+            memo[variant] = ranks
+        return ranks
+
+    def _prefetch(self, names: List[str]) -> Dict[str, List[int]]:
+        # Candidate ranks for every deletion variant the batch will query,
+        # found in one pass; variants hitting nothing map to [].
+        variants = set()
+        for name in names:
+            key = name.strip().lower()
+            variants |= _query_variants(key, self.max_distance, self.prefix_length)
+        memo: Dict[str, List[int]] = dict.fromkeys(variants, [])
+        if np is None or not variants:
+            for variant in variants:
+                memo[variant] = self._candidates(variant, None)
+            return memo
+        ordered = list(variants)
+        hashed = np.fromiter((_variant_key(v) for v in ordered), dtype=np.uint64, count=len(ordered))
+        deletes = np.frombuffer(self.deletes, dtype=np.uint64)
+        lo = np.searchsorted(deletes, hashed)
+        hi = np.searchsorted(deletes, hashed + np.uint64(1 << 32))
+        ranks = deletes & np.uint64(0xFFFFFFFF)
+        for i in np.nonzero(hi > lo)[0].tolist():
+            memo[ordered[i]] = ranks[lo[i]:hi[i]].tolist()
+        return memo
+
+    def lookup(self, name: str, max_distance: Optional[int] = None,
+               memo: Optional[Dict[str, List[int]]] = None) -> List[Tuple[str, int]]:
+        """Popular names within max_distance edits of name, closest (then most popular) first.
+
+        memo, shared across calls, caches deletion-variant lookups; names
+        in one lockfile share many (@types/, eslint-plugin-, ...).
+        """
+        key = name.lower()
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        if key in self.ranks:
+            return [(key, 0)]
+        names = self.names
+        seen: Set[int] = set()
+        matches = []
+        for variant in _query_variants(key, max_distance, self.prefix_length):
+            for rank in self._candidates(variant, memo):
+                if rank in seen:
+                    continue
+                seen.add(rank)
+                if abs(len(names[rank]) - len(key)) > max_distance:
+                    continue
+                dist = bounded_distance(key, names[rank], max_distance)
+                if dist <= max_distance:
+                    matches.append((dist, rank))
+        matches.sort()
+        return [(names[rank], dist) for dist, rank in matches]
+
+    def _top_ranked(self, rank: int) -> bool:
+        # Far above an unknown name, which ranks below the whole list.
+        return rank * RANK_GAP < len(self.names)
+
+    def _confused_with(self, key: str) -> Optional[Tuple[str, str]]:
+        # Same name once separators and scope punctuation are ignored.
+        for rank in self.canonical.get(canonical_name(key), ()):
+            target = self.names[rank]
+            if split_scope(target)[0] != split_scope(key)[0]:
+                return "scope_confusion", target
+            return "separator_confusion", target
+        # A popular name under some other scope (@verdaccio/config,
+        # @lumino/domutils) is not flagged: orgs routinely publish common
+        # words under their own scope, and nothing offline tells those from
+        # a squat.
+        return None
+
+    def check(self, name: str, memo: Optional[Dict[str, List[int]]] = None) -> Optional[Dict]:
+        """A typosquat finding for name, or None if it is popular itself or close to nothing.
+
+        Only edit-distance findings (typosquat_suspected) carry a distance.
+        """
+        key = name.strip().lower()
+        if not key or key in self.ranks:
+            return None
+        confused = self._confused_with(key)
+        if confused is not None:
+            ftype, target = confused
+            return {"type": ftype, "name": name, "close_to": target}
+        base = split_scope(key)[1]
+        if len(base) < MIN_NAME:
+            return None
+        max_distance = 1 if len(base) <= SHORT_NAME else self.max_distance
+        for target, dist in self.lookup(key, max_distance, memo):
+            if self._top_ranked(self.ranks[target]):
+                return {"type": "typosquat_suspected", "name": name, "close_to": target, "distance": dist}
+        return None
+
+    def check_many(self, names: Iterable[str]) -> Dict[str, Dict]:
+        """check() for a whole dependency tree; returns {name: finding} for suspicious names only.
+
+        Duplicates and popular names are dropped with set lookups before
+        any distance work, and deletion-variant lookups are shared
+        across the batch.
+        """
+        pending = [name for name in dict.fromkeys(names) if name.strip().lower() not in self.ranks]
+        memo = self._prefetch(pending)
+        findings = {}
+        for name in pending:
+            finding = self.check(name, memo)
+            if finding is not None:
+                findings[name] = finding
+        return findings
+
+
+def load_index(names_file: Optional[str] = None, cache_dir: Optional[str] = None) -> TypoIndex:
+    """Index for a name list, built once and then loaded from a pickle in the cache dir.
+
+    names_file defaults to $SCD_POPULAR_PACKAGES, then the bundled list.
+    The pickle is keyed by the list's content, so editing the list (or a
+    new INDEX_VERSION) rebuilds it on next use.
+    """
+    names_file = names_file or os.environ.get("SCD_POPULAR_PACKAGES") or DEFAULT_NAMES_FILE
+    with open(names_file, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(b"%d:" % INDEX_VERSION + raw).hexdigest()
+    index_dir = os.path.join(cache_dir or default_cache_dir(), "typo-index")
+    path = os.path.join(index_dir, digest[:32] + ".pickle")
+    try:
+        with open(path, "rb") as f:
+            index = pickle.load(f)
+        if isinstance(index, TypoIndex) and index.version == INDEX_VERSION:
+            return index
+    except (OSError, EOFError, AttributeError, pickle.UnpicklingError):
+        pass
+
+    index = TypoIndex(parse_names(raw.decode("utf-8", errors="ignore").splitlines()))
+    try:
+        os.makedirs(index_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=index_dir)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Read-only cache dir: the index still works, it is just rebuilt next run.
+        pass
+    return index
+
+
+def default_index() -> TypoIndex:
+    """The process-wide index, loaded on first use."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = load_index()
+        return _default_index
@@ -1,44 +1,228 @@
 import os
 import json
+import math
+import pstats
+import re
 from datetime import datetime
 
+from analyzers.findings import RISK_ICONS, RISK_LEVELS, risk_level, type_counts
 
-def write_report(static_result, metadata_result, total_score, package_path, sig_result=None, secrets_result=None, sbom_result=None, lockfile_result=None, typo_result=None, format: str = "md"):
+
+# Analyzers whose findings go into the JSON report's "findings" map.
+FINDING_SECTIONS = ("static", "heuristics", "metadata", "secrets", "sbom", "lockfile", "typo")
+# Findings listed one by one in the Markdown report, per section; the rest
+# are only counted, so the Markdown stays readable at 100k findings.
+MD_SAMPLES = 20
+
+# No indent: json's C encoder, and one finding per line.
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _report_paths(package_path):
+    report_dir = os.path.join(os.getcwd(), "reports")
+    os.makedirs(report_dir, exist_ok=True)
+    # Normalize package path for filename safety
+    safe_package_name = os.path.basename(os.path.normpath(package_path))
+    # Downloaded targets are labelled "npm:name@version"; ':' isn't allowed in Windows file names.
+    safe_package_name = re.sub(r'[<>:"|?*]', "_", safe_package_name)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(report_dir, f"{safe_package_name}_{timestamp}"), timestamp
+
+
+class ReportStream:
+    """Writes a target's JSON or NDJSON report while its analyzers are still running.
+
+    add(name, result) is called with each analyzer's result as it finishes
+    and writes its findings straight to disk, one compact line each, so a
+    large finding set is never serialized as a whole; finish() appends the
+    scores and summary. The JSON report is written to a .partial file and
+    renamed by finish(), so a failed scan never leaves a truncated .json
+    behind; NDJSON records already written stay readable.
+
+    NDJSON records: {"record": "target"} first, then {"record": "finding",
+    "analyzer", "finding"} lines and one {"record": "analyzer"} line per
+    analyzer as it completes, and {"record": "summary"} last.
     """
-    Writes a markdown report for the scan results.
-    static_result: dict from static analyzer
+
+    def __init__(self, package_path, format: str = "md"):
+        self.package_path = package_path
+        self.format = format
+        base, self.timestamp = _report_paths(package_path)
+        self.md_path = f"{base}.md"
+        self.json_path = f"{base}.json"
+        self.ndjson_path = f"{base}.ndjson"
+        self._added = set()
+        self._sections = 0
+        self._json = None
+        self._ndjson = None
+        if format in ("json", "both"):
+            self._json = open(self.json_path + ".partial", "w", encoding="utf-8")
+            self._json.write(f'{{\n  "target": {_encode(str(package_path))},\n  "findings": {{')
+        if format == "ndjson":
+            self._ndjson = open(self.ndjson_path, "w", encoding="utf-8")
+            self._ndjson.write(_encode({"record": "target", "target": str(package_path),
+                                        "started_at": self.timestamp}) + "\n")
+
+    def add(self, name: str, result):
+        """Write one analyzer's findings; later calls for the same analyzer are ignored."""
+        if name in self._added:
+            return
+        self._added.add(name)
+        issues = (result or {}).get("issues", []) if name in FINDING_SECTIONS else []
+        if self._json is not None and name in FINDING_SECTIONS:
+            self._json.write(f'{"," if self._sections else ""}\n    {_encode(name)}: [')
+            self._json.writelines(f'{"," if i else ""}\n      {_encode(issue)}' for i, issue in enumerate(issues))
+            self._json.write("\n    ]" if issues else "]")
+            self._sections += 1
+        if self._ndjson is not None and result is not None:
+            self._ndjson.writelines(_encode({"record": "finding", "analyzer": name, "finding": issue}) + "\n"
+                                    for issue in issues)
+            self._ndjson.write(_encode({"record": "analyzer", "analyzer": name, "score": result.get("score"),
+                                        "findings": len(issues), "elapsed": result.get("elapsed"),
+                                        "error": result.get("error"), "metrics": result.get("metrics")}) + "\n")
+
+    def finish(self, summary):
+        """Append the summary fields and close; returns the paths written."""
+        saved_paths = []
+        if self._json is not None:
+            for name in FINDING_SECTIONS:
+                self.add(name, None)
+            self._json.write("\n  }")
+            for key, value in summary.items():
+                encoded = json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+                self._json.write(f",\n  {_encode(key)}: {encoded}")
+            self._json.write("\n}\n")
+            self._json.close()
+            self._json = None
+            os.replace(self.json_path + ".partial", self.json_path)
+            saved_paths.append(self.json_path)
+        if self._ndjson is not None:
+            self._ndjson.write(_encode({"record": "summary", **summary}) + "\n")
+            self._ndjson.close()
+            self._ndjson = None
+            saved_paths.append(self.ndjson_path)
+        return saved_paths
+
+    def close(self):
+        """Discard an unfinished JSON report (no-op after finish())."""
+        if self._json is not None:
+            self._json.close()
+            self._json = None
+            os.remove(self.json_path + ".partial")
+        if self._ndjson is not None:
+            self._ndjson.close()
+            self._ndjson = None
+
+
+def _type_counts(issues):
+    return ", ".join(f"{k}: {v}" for k, v in type_counts(issues).items())
+
+
+def _describe_fields(f):
+    fields = ", ".join(f"{k} `{v}`" for k, v in f.items() if k != "type")
+    return f"{f.get('type')}: {fields}" if fields else str(f.get("type"))
+
+
+def _samples(report_lines, items, describe):
+    # A slice of a FindingStore only converts the rows shown.
+    for f in items[:MD_SAMPLES]:
+        report_lines.append(f"- {describe(f)}")
+    if len(items) > MD_SAMPLES:
+        report_lines.append(f"- ... {len(items) - MD_SAMPLES} more in the JSON report")
+
+
+def write_report(static_result, metadata_result, total_score, package_path, sig_result=None, secrets_result=None, sbom_result=None, lockfile_result=None, typo_result=None, download_stats=None, format: str = "md", heuristics_result=None, stream=None):
+    """
+    Writes a markdown report (and/or the JSON or NDJSON report) for the scan results.
+    static_result: dict from static analyzer, None when semgrep wasn't run (no --deep)
     metadata_result: dict from metadata checker
     total_score: int, combined score
     package_path: str, path or name of the scanned package
     sig_result: dict from signature_checker (optional)
+    heuristics_result: dict from js_heuristics (optional)
+    download_stats: dict of bytes downloaded/extracted, when the target was downloaded (optional)
+    stream: ReportStream the analyzers' findings were already streamed into (optional)
     """
-    
-    # Create reports folder if it doesn't exist
-    report_dir = os.path.join(os.getcwd(), "reports")
-    os.makedirs(report_dir, exist_ok=True)
-
-    # Normalize package path for filename safety
-    safe_package_name = os.path.basename(os.path.normpath(package_path))
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base_filename = f"{safe_package_name}_{timestamp}"
-    report_md_path = os.path.join(report_dir, f"{base_filename}.md")
-    report_json_path = os.path.join(report_dir, f"{base_filename}.json")
+    # Findings not streamed while the scan ran are written now.
+    stream = stream or ReportStream(package_path, format)
+    analyzer_results = {
+        "static": static_result,
+        "heuristics": heuristics_result,
+        "metadata": metadata_result,
+        "secrets": secrets_result,
+        "sbom": sbom_result,
+        "lockfile": lockfile_result,
+        "typo": typo_result,
+        "signature": sig_result,
+    }
+    for name, result in analyzer_results.items():
+        if result is not None:
+            stream.add(name, result)
+    timestamp = stream.timestamp
 
     report_lines = []
     report_lines.append(f"# 📦 Supply Chain Risk Report for `{package_path}`\n")
     
+    # Download Section
+    if download_stats:
+        report_lines.append("## 🌐 Download")
+        report_lines.append(f"**Source:** {download_stats.get('source', 'unknown')}")
+        report_lines.append(f"**Bytes Downloaded:** {download_stats.get('bytes_downloaded', 0)}")
+        if "cache" in download_stats:
+            report_lines.append(f"**Fetch Cache:** {download_stats['cache']}")
+        if "files_extracted" in download_stats:
+            report_lines.append(
+                f"**Bytes Extracted:** {download_stats.get('bytes_extracted', 0)} "
+                f"({download_stats.get('files_extracted', 0)} files)"
+            )
+        report_lines.append("")
+
+    # JavaScript Heuristics Section
+    report_lines.append("## ⚡ JavaScript Heuristics")
+    if heuristics_result is None:
+        report_lines.append("ℹ️ JavaScript heuristics not run.")
+    else:
+        report_lines.append(f"**Heuristics Score:** {heuristics_result.get('score', 0)}")
+        h_issues = heuristics_result.get("issues", [])
+        if h_issues:
+            report_lines.append(f"**Findings:** {_type_counts(h_issues)}")
+            _samples(report_lines, h_issues,
+                     lambda f: f"`{f.get('file')}:{f.get('line')}` {f.get('type')} x{f.get('count', 1)}: {f.get('detail')}")
+        else:
+            report_lines.append("**Findings:** None")
+        report_lines.append(f"**Scanned:** {heuristics_result.get('files', 0)} files, {heuristics_result.get('bytes', 0)} bytes")
+    report_lines.append("")
+
     # Static Analysis Section
     report_lines.append("## 🧮 Static Analysis")
-    report_lines.append(f"**Static Score:** {static_result.get('score', 0)}")
+    if static_result is None:
+        report_lines.append("ℹ️ semgrep not run (add --deep for the full rulepack).")
+        static_result = {}
+    else:
+        report_lines.append(f"**Static Score:** {static_result.get('score', 0)}")
     issues = static_result.get("issues", [])
-    report_lines.append(f"**Issues Found:** {', '.join(issues) if issues else 'None'}")
+    if static_result.get("error"):
+        report_lines.append(f"⚠️ Not run: {static_result['error']}")
+    elif issues:
+        rule_counts = {}
+        for issue in issues:
+            key = (issue.get("severity", "WARNING"), issue.get("rule", "unknown"))
+            rule_counts[key] = rule_counts.get(key, 0) + 1
+        summary = ", ".join(f"{rule} ({severity}): {n}" for (severity, rule), n in sorted(rule_counts.items()))
+        report_lines.append(f"**Issues Found:** {summary}")
+        _samples(report_lines, issues, lambda i: f"`{i.get('file')}:{i.get('line')}` {i.get('rule')}: {i.get('message')}")
+    elif "score" in static_result:
+        report_lines.append("**Issues Found:** None")
+    if static_result.get("rulepack"):
+        report_lines.append(f"**Rulepack:** {static_result['rulepack']}")
     report_lines.append("")
 
     # Metadata Analysis Section
     report_lines.append("## 📋 Metadata Analysis")
     report_lines.append(f"**Metadata Score:** {metadata_result.get('score', 0)}")
     meta_issues = metadata_result.get("issues", [])
-    report_lines.append(f"**Issues Found:** {', '.join(meta_issues) if meta_issues else 'None'}")
+    shown = ", ".join(meta_issues[:MD_SAMPLES]) + (f" (+{len(meta_issues) - MD_SAMPLES} more)" if len(meta_issues) > MD_SAMPLES else "")
+    report_lines.append(f"**Issues Found:** {shown if meta_issues else 'None'}")
     report_lines.append("")
 
     # Secrets Scan Section (Addon)
@@ -50,14 +234,16 @@ def write_report(static_result, metadata_result, total_score, package_path, sig_
         secrets_issues = secrets_result.get("issues", [])
         if secrets_issues:
             # Show a compact list of types and counts
-            type_counts = {}
-            for f in secrets_issues:
-                t = f.get("type", "unknown")
-                type_counts[t] = type_counts.get(t, 0) + 1
-            summary = ", ".join(f"{k}: {v}" for k, v in type_counts.items())
-            report_lines.append(f"**Findings:** {summary}")
+            report_lines.append(f"**Findings:** {_type_counts(secrets_issues)}")
+            _samples(report_lines, secrets_issues, lambda f: f"`{f.get('file')}` {f.get('type')}: `{f.get('match')}`")
         else:
             report_lines.append("**Findings:** None")
+        secrets_cache = secrets_result.get("cache")
+        if secrets_cache:
+            report_lines.append(f"**Cache:** {secrets_cache.get('hits', 0)} hits / {secrets_cache.get('misses', 0)} misses")
+        truncated = secrets_result.get("truncated", [])
+        if truncated:
+            report_lines.append(f"**Truncated Files:** {len(truncated)} (scanned up to the per-file byte budget)")
     report_lines.append("")
 
     # SBOM & License Section (Addon)
@@ -81,12 +267,8 @@ def write_report(static_result, metadata_result, total_score, package_path, sig_
         lf_issues = lockfile_result.get("issues", [])
         if lf_issues:
             # Summarize by type counts
-            type_counts = {}
-            for f in lf_issues:
-                t = f.get("type", "unknown")
-                type_counts[t] = type_counts.get(t, 0) + 1
-            summary = ", ".join(f"{k}: {v}" for k, v in type_counts.items())
-            report_lines.append(f"**Findings:** {summary}")
+            report_lines.append(f"**Findings:** {_type_counts(lf_issues)}")
+            _samples(report_lines, lf_issues, _describe_fields)
         else:
             report_lines.append("**Findings:** None")
     report_lines.append("")
@@ -99,12 +281,20 @@ def write_report(static_result, metadata_result, total_score, package_path, sig_
         report_lines.append(f"**Typo/Maintainer Score:** {typo_result.get('score', 0)}")
         t_issues = typo_result.get("issues", [])
         if t_issues:
-            type_counts = {}
-            for f in t_issues:
-                t = f.get("type", "unknown")
-                type_counts[t] = type_counts.get(t, 0) + 1
-            summary = ", ".join(f"{k}: {v}" for k, v in type_counts.items())
-            report_lines.append(f"**Findings:** {summary}")
+            report_lines.append(f"**Findings:** {_type_counts(t_issues)}")
+            suspects = [f for f in t_issues if isinstance(f, dict) and f.get("close_to")]
+
+            def describe(f):
+                line = f"`{f.get('name')}` looks like `{f['close_to']}` ({f['type']}"
+                line += f", distance {f['distance']})" if f.get("distance") is not None else ")"
+                if f.get("direct") is False:
+                    line += " [transitive, not scored]"
+                if f.get("paths"):
+                    line += f" via {f['paths'][0]}"
+                    if len(f["paths"]) > 1:
+                        line += f" (+{len(f['paths']) - 1} more)"
+                return line
+            _samples(report_lines, suspects, describe)
         else:
             report_lines.append("**Findings:** None")
     report_lines.append("")
@@ -121,58 +311,231 @@ def write_report(static_result, metadata_result, total_score, package_path, sig_
         report_lines.append(f"ℹ️ Signature check could not be completed. Details: {sig_result}")
     report_lines.append("")
 
+    # Analyzer Timings & Failures
+    analyzer_results["static"] = static_result
+    timings = {k: r["elapsed"] for k, r in analyzer_results.items() if r and "elapsed" in r}
+    errors = {k: r["error"] for k, r in analyzer_results.items() if r and r.get("error")}
+    cache_stats = {k: r["cache"] for k, r in analyzer_results.items() if r and r.get("cache")}
+    metrics = {k: r["metrics"] for k, r in analyzer_results.items() if r and r.get("metrics")}
+    if timings or errors:
+        report_lines.append("## ⏱️ Analyzer Timings")
+        for name, elapsed in timings.items():
+            status = f" ❌ failed: {errors[name]}" if name in errors else ""
+            cpu = metrics.get(name, {}).get("cpu_seconds")
+            cpu = f" (CPU {cpu}s)" if cpu is not None else ""
+            report_lines.append(f"- **{name}:** {elapsed}s{cpu}{status}")
+        report_lines.append("")
+
     # Final Score & Risk
     report_lines.append("## 📊 Final Risk Assessment")
     report_lines.append(f"**Final Risk Score:** {total_score}")
-    if total_score >= 7:
-        risk_level = "🚨 HIGH"
-    elif total_score >= 4:
-        risk_level = "⚠️ MEDIUM"
-    else:
-        risk_level = "✅ LOW"
-    report_lines.append(f"**RISK LEVEL:** {risk_level}")
+    risk = risk_level(total_score)
+    report_lines.append(f"**RISK LEVEL:** {RISK_ICONS[risk]} {risk}")
     report_lines.append("")
 
     saved_paths = []
 
     # Save markdown if requested
     if format in ("md", "both"):
-        with open(report_md_path, "w", encoding="utf-8") as f:
+        with open(stream.md_path, "w", encoding="utf-8") as f:
             f.write("\n".join(report_lines))
-        saved_paths.append(report_md_path)
+        saved_paths.append(stream.md_path)
 
-    # Save JSON if requested
-    if format in ("json", "both"):
-        json_payload = {
-            "target": package_path,
-            "scores": {
-                "static": static_result.get("score", 0),
-                "metadata": metadata_result.get("score", 0),
-                "total": total_score,
-            },
-            "findings": {
-                "static": static_result.get("issues", []),
-                "metadata": metadata_result.get("issues", []),
-                "secrets": (secrets_result.get("issues", []) if secrets_result else []),
-                "sbom": (sbom_result.get("issues", []) if sbom_result else []),
-                "lockfile": (lockfile_result.get("issues", []) if lockfile_result else []),
-                "typo": (typo_result.get("issues", []) if typo_result else []),
-            },
-            "sbom": {
-                "license": (sbom_result.get("license") if sbom_result else None),
-                "components_count": (len(sbom_result.get("components", [])) if sbom_result else 0),
-                "components": (sbom_result.get("components", []) if sbom_result else []),
-            },
-            "signature": sig_result if sig_result is not None else {"verified": None},
-            "risk_level": ("HIGH" if total_score >= 7 else ("MEDIUM" if total_score >= 4 else "LOW")),
-            "generated_at": timestamp,
-        }
-        with open(report_json_path, "w", encoding="utf-8") as jf:
-            json.dump(json_payload, jf, ensure_ascii=False, indent=2)
-        saved_paths.append(report_json_path)
+    # JSON/NDJSON: the findings are already on disk, only the summary is left
+    saved_paths += stream.finish({
+        "scores": {
+            "static": static_result.get("score", 0),
+            "heuristics": (heuristics_result.get("score", 0) if heuristics_result else 0),
+            "metadata": metadata_result.get("score", 0),
+            "total": total_score,
+        },
+        "sbom": {
+            "license": (sbom_result.get("license") if sbom_result else None),
+            "components_count": (len(sbom_result.get("components", [])) if sbom_result else 0),
+            "components": (sbom_result.get("components", []) if sbom_result else []),
+        },
+        "signature": sig_result if sig_result is not None else {"verified": None},
+        "download": download_stats,
+        "timings": timings,
+        "errors": errors,
+        "cache": cache_stats,
+        "metrics": metrics,
+        "risk_level": risk_level(total_score),
+        "generated_at": timestamp,
+    })
 
     for p in saved_paths:
         print(f"📝 Report saved to: {p}")
 
     # Return first path for convenience
     return saved_paths[0] if saved_paths else None
+
+
+def write_stored_report(package_path, stored, download_stats=None, format: str = "md"):
+    """Report for a target whose stored result was reused instead of rescanning it.
+
+    stored is a ScanStore summary (scores, total, risk, finding counts,
+    issue types, scanned_at). The findings themselves aren't stored, so the
+    report carries the scores, risk and issue types of the original scan,
+    and says when that was. Same JSON top-level keys as write_report's for
+    scores and risk_level, plus "stored_result" and "scanned_at".
+    Returns the paths written.
+    """
+    base, timestamp = _report_paths(package_path)
+    scanned_at = datetime.fromtimestamp(stored["scanned_at"]).isoformat(timespec="seconds")
+    scores = dict(stored.get("scores", {}), total=stored["total"])
+    summary = {
+        "target": str(package_path),
+        "stored_result": True,
+        "scanned_at": scanned_at,
+        "scores": scores,
+        "finding_counts": stored.get("findings", {}),
+        "issue_types": stored.get("issue_types", []),
+        "download": download_stats,
+        "risk_level": risk_level(stored["total"]),
+        "generated_at": timestamp,
+    }
+    saved_paths = []
+    if format in ("md", "both"):
+        lines = [f"# 📦 Supply Chain Risk Report for `{package_path}`\n",
+                 f"♻️ **Stored result** from the scan at {scanned_at} (same bytes, same analyzers); "
+                 "findings are in that scan's report. Run with `--rescan` to scan again.\n",
+                 "## 🧮 Scores"]
+        lines += [f"- {name}: {score} ({stored.get('findings', {}).get(name, 0)} findings)"
+                  for name, score in stored.get("scores", {}).items()]
+        lines.append(f"\n**TOTAL RISK SCORE:** {stored['total']}")
+        if summary["issue_types"]:
+            lines.append("\n## Issue types")
+            lines += [f"- {t}" for t in summary["issue_types"]]
+        lines.append(f"\n**RISK LEVEL:** {RISK_ICONS[summary['risk_level']]} {summary['risk_level']}\n")
+        with open(f"{base}.md", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        saved_paths.append(f"{base}.md")
+    if format in ("json", "both"):
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        saved_paths.append(f"{base}.json")
+    if format == "ndjson":
+        with open(f"{base}.ndjson", "w", encoding="utf-8") as f:
+            f.write(_encode({"record": "target", "target": str(package_path), "started_at": timestamp,
+                             "stored_result": True, "scanned_at": scanned_at}) + "\n")
+            f.write(_encode({"record": "summary", **summary}) + "\n")
+        saved_paths.append(f"{base}.ndjson")
+    return saved_paths
+
+
+def write_profile(profiler, package_path, top: int = 30):
+    """Save a cProfile run next to the reports and print its hottest functions.
+
+    The .prof file loads with pstats (python -m pstats) or snakeviz.
+    """
+    base, _ = _report_paths(package_path)
+    path = f"{base}.prof"
+    profiler.dump_stats(path)
+    # Own time, not cumulative: hot loops show up at the top.
+    pstats.Stats(profiler).sort_stats("tottime").print_stats(top)
+    print(f"📝 Profile saved to: {path}")
+    return path
+
+
+def _percentile(values, pct: float):
+    # Nearest-rank percentile; None for an empty list.
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(math.ceil(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[rank]
+
+
+def write_batch_report(records, wall_seconds: float, format: str = "md", title: str = None, name: str = "batch"):
+    """
+    Writes the aggregated report for a batch run (or a --deps dependency scan).
+    records: one dict per target (target, total, risk, scores, errors, latency, ...;
+             dependency rows also carry the lockfile paths they are installed at)
+    wall_seconds: elapsed time of the whole batch
+    Per-target reports are written separately by write_report.
+    """
+    report_dir = os.path.join(os.getcwd(), "reports")
+    os.makedirs(report_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_name = re.sub(r'[<>:"|?*]', "_", os.path.basename(os.path.normpath(name)))
+    base_filename = f"{safe_name}_{timestamp}"
+    title = title or f"Batch Supply Chain Risk Report ({len(records)} targets)"
+    with_paths = any("paths" in r for r in records)
+
+    scanned = [r for r in records if r.get("total") is not None]
+    failed = [r for r in records if r.get("total") is None]
+    latencies = [r["latency"] for r in records if r.get("latency") is not None]
+    summary = {
+        "targets": len(records),
+        "scanned": len(scanned),
+        "failed": len(failed),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_minute": round(len(records) / wall_seconds * 60, 2) if wall_seconds > 0 else None,
+        "latency_seconds": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+        "bytes_downloaded": sum((r.get("download") or {}).get("bytes_downloaded", 0) for r in records),
+        "risk": {level: sum(1 for r in scanned if risk_level(r["total"]) == level) for level, _ in RISK_LEVELS},
+    }
+    ranked = sorted(records, key=lambda r: (r.get("total") is None, -(r.get("total") or 0), r["target"]))
+
+    saved_paths = []
+    if format in ("md", "both"):
+        lines = [f"# 📦 {title}\n"]
+        lines.append("## 📈 Summary")
+        lines.append(f"**Scanned:** {summary['scanned']}  **Failed:** {summary['failed']}")
+        lines.append(f"**Risk:** 🚨 {summary['risk']['HIGH']} high, ⚠️ {summary['risk']['MEDIUM']} medium, "
+                     f"✅ {summary['risk']['LOW']} low")
+        lines.append(f"**Wall Time:** {summary['wall_seconds']}s  "
+                     f"**Throughput:** {summary['throughput_per_minute']} targets/min")
+        lat = summary["latency_seconds"]
+        lines.append(f"**Latency (s):** p50 {lat['p50']}, p95 {lat['p95']}, p99 {lat['p99']}, max {lat['max']}")
+        lines.append(f"**Bytes Downloaded:** {summary['bytes_downloaded']}")
+        lines.append("")
+        lines.append("## 🎯 Targets")
+        if with_paths:
+            lines.append("| Package | Score | Risk | Findings | Installed At | Notes |")
+            lines.append("|---|---|---|---|---|---|")
+        else:
+            lines.append("| Target | Score | Risk | Latency (s) | Notes |")
+            lines.append("|---|---|---|---|---|")
+        for r in ranked:
+            notes = (r.get("error") or ", ".join(f"{k} failed" for k in (r.get("errors") or {}))
+                 or ("stored result" if r.get("stored") else ""))
+            score = r["total"] if r.get("total") is not None else "—"
+            if with_paths:
+                paths = r.get("paths") or []
+                shown = ", ".join(f"`{p}`" for p in paths[:3]) + (f" +{len(paths) - 3} more" if len(paths) > 3 else "")
+                types = ", ".join(r.get("issue_types") or [])
+                lines.append(f"| `{r['target']}` | {score} | {r.get('risk') or 'ERROR'} | {types} | {shown} | {notes} |")
+            else:
+                lines.append(f"| `{r['target']}` | {score} | {r.get('risk') or 'ERROR'} | {r.get('latency')} | {notes} |")
+        lines.append("")
+        lines.append("---")
+        lines.append(f"*Generated by Supply Chain Detector at {timestamp}*")
+        md_path = os.path.join(report_dir, f"{base_filename}.md")
+        with open(md_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        saved_paths.append(md_path)
+
+    if format in ("json", "both"):
+        json_path = os.path.join(report_dir, f"{base_filename}.json")
+        with open(json_path, "w", encoding="utf-8") as jf:
+            json.dump({"summary": summary, "targets": ranked, "generated_at": timestamp}, jf,
+                      ensure_ascii=False, indent=2)
+        saved_paths.append(json_path)
+
+    if format == "ndjson":
+        ndjson_path = os.path.join(report_dir, f"{base_filename}.ndjson")
+        with open(ndjson_path, "w", encoding="utf-8") as nf:
+            nf.write(_encode({"record": "summary", **summary, "generated_at": timestamp}) + "\n")
+            nf.writelines(_encode({"record": "target", **r}) + "\n" for r in ranked)
+        saved_paths.append(ndjson_path)
+
+    for p in saved_paths:
+        print(f"📝 {'Dependency' if with_paths else 'Batch'} report saved to: {p}")
+    return summary
@@ -0,0 +1,311 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from analyzers.downloader import download_npm_tarball, expected_digest, integrity_string, split_npm_spec
+from analyzers.fetch_cache import FetchCache, shared_session
+from analyzers.github_downloader import download_github_zipball
+from analyzers.lockfile_checker import collect_locked_packages
+from analyzers.lockfile_parsers import find_lockfile, iter_lockfile
+from analyzers.result_cache import ResultCache
+from analyzers.scan_context import ScanContext
+from analyzers.scan_store import Identity, ScanStore, analyzer_version, scan_identity
+from analyzers.semgrep_batch import DEFAULT_BATCH_SIZE, SemgrepBatcher
+from analyzers.static_analyzer import DEFAULT_TIMEOUT as SEMGREP_TIMEOUT
+from analyzers.write_report import ReportStream, write_batch_report, write_stored_report
+from main import open_target, run_scan, summarize_outcome, write_outcome_report
+
+
+DEFAULT_CONCURRENCY = 8
+# With many targets, only print progress for these plus anything risky or failed.
+_PROGRESS_EVERY = 50
+# Finished targets' summaries are written to the results store this many at a time.
+_STORE_BATCH = 50
+
+# Per-process result cache, opened once per scan worker.
+_worker_cache: Optional[ResultCache] = None
+
+# A fetch job returns (report label, local path to scan, download stats).
+FetchJob = Callable[[], Tuple[str, str, Optional[Dict]]]
+
+
+def load_targets(path: str) -> List[str]:
+    """One target per line (npm:name@version, github:owner/repo, or a local path); # starts a comment."""
+    targets = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                targets.append(line)
+    # Same target twice would only be scanned twice.
+    return list(dict.fromkeys(targets))
+
+
+def _fetch_target(target: str, fetch_cache: FetchCache, registry: Optional[str]) -> Tuple[str, str, Optional[Dict]]:
+    if target.startswith("github:"):
+        stats: Dict = {}
+        path = download_github_zipball(target.split(":", 1)[1], stats=stats, cache=fetch_cache)
+        return stats.get("source", target), path, stats
+    if target.startswith("npm:") or not os.path.exists(target):
+        stats = {}
+        name, version = split_npm_spec(target.split(":", 1)[1] if target.startswith("npm:") else target)
+        path = download_npm_tarball(name, version, stats=stats, registry=registry, cache=fetch_cache)
+        return stats.get("source", target), path, stats
+    return target, target, None
+
+
+def _fetch_locked(package: Dict, fetch_cache: FetchCache) -> Tuple[str, str, Optional[Dict]]:
+    # The lockfile already names the tarball and its integrity: no packument needed.
+    expected = expected_digest({"integrity": package["integrity"]})
+    if expected is None:
+        raise ValueError(f"unusable integrity value: {package['integrity']}")
+    path, downloaded = fetch_cache.fetch_blob(shared_session("npm"), package["resolved"], *expected)
+    label = f"{package['name']}@{package['version']}"
+    return label, path, {"source": f"npm:{label}", "bytes_downloaded": downloaded,
+                         "cache": "hit" if downloaded == 0 else "miss", "integrity": integrity_string(*expected)}
+
+
+def _locked_identity(package: Dict) -> Optional[Identity]:
+    # Known from the lockfile alone, so a stored result saves the download too.
+    expected = expected_digest({"integrity": package["integrity"]})
+    if expected is None:
+        return None
+    return "npm", package["name"], package["version"], integrity_string(*expected)
+
+
+def _quiet_worker():
+    # Hundreds of targets' analyzer chatter would bury the progress lines.
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")
+
+
+def _scan_worker(label: str, path: str, download_stats: Optional[Dict], options: Dict,
+                 static_result: Optional[Dict] = None) -> Dict:
+    """Scan one fetched target in a worker process.
+
+    Writes the target's own report unless options["write_reports"] is
+    off, and returns only a summary: findings stay out of the parent.
+    static_result is the target's share of a batched semgrep run.
+    """
+    global _worker_cache
+    use_cache = options.get("use_cache", True)
+    if use_cache and _worker_cache is None:
+        _worker_cache = ResultCache()
+    start = time.perf_counter()
+    stream = ReportStream(label, options.get("report_format", "md")) if options.get("write_reports", True) else None
+    try:
+        with open_target(path) as context:
+            outcome = run_scan(label, context, max_file_bytes=options.get("max_file_bytes"),
+                               cache=_worker_cache if use_cache else None, threads_only=True,
+                               as_dependency=options.get("as_dependency", False), deep=options.get("deep", False),
+                               static_result=static_result, on_result=stream.add if stream else None)
+            if stream is not None:
+                write_outcome_report(label, outcome, download_stats, options.get("report_format", "md"), stream=stream)
+    finally:
+        if stream is not None:
+            stream.close()
+    return dict(summarize_outcome(label, outcome), scan_seconds=round(time.perf_counter() - start, 3))
+
+
+async def _batched_static(batcher: SemgrepBatcher, path: str) -> Dict:
+    # Awaits the future instead of blocking a thread on it: a whole batch of
+    # targets waiting for semgrep must not starve the downloads of threads.
+    context = await asyncio.to_thread(open_target, path)
+    try:
+        future = await asyncio.to_thread(batcher.submit_context, context)
+        return await asyncio.wrap_future(future)
+    finally:
+        context.close()
+
+
+async def _run_pipeline(jobs: List[Tuple[str, FetchJob, Dict]], concurrency: int, scan_workers: int,
+                        options: Dict, batcher: Optional[SemgrepBatcher] = None,
+                        store: Optional[ScanStore] = None) -> List[Dict]:
+    # Downloads: up to `concurrency` at once on worker threads, sharing the
+    # pooled keep-alive sessions (one TLS handshake per host, not per target).
+    # Scans: a process pool, so CPU-bound analyzers of different targets
+    # really run in parallel. A target's scan starts as soon as its own
+    # download finishes (and, with a batcher, its semgrep batch).
+    # With a store, a target whose fresh result is stored isn't scanned, and
+    # new results are written in bulk rather than one transaction each.
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    done = 0
+    unsaved: List[Tuple[Identity, Dict]] = []
+
+    async def save(flush: bool = False):
+        if unsaved and (flush or len(unsaved) >= _STORE_BATCH):
+            rows = unsaved[:]
+            del unsaved[:]
+            await asyncio.to_thread(store.put_many, rows)
+
+    with ProcessPoolExecutor(max_workers=scan_workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_quiet_worker) as pool:
+
+        async def one(target: str, fetch: FetchJob, record: Dict) -> Dict:
+            nonlocal done
+            start = time.perf_counter()
+            try:
+                async with semaphore:
+                    label, path, stats = await asyncio.to_thread(fetch)
+                record["download"] = stats
+                record["fetch_seconds"] = round(time.perf_counter() - start, 3)
+                identity = await asyncio.to_thread(scan_identity, label, path, stats) if store is not None else None
+                stored = None
+                if identity is not None and not options.get("rescan"):
+                    stored = await asyncio.to_thread(store.get, identity)
+                if stored is not None:
+                    record.update(stored, stored=True)
+                    if options.get("write_reports", True):
+                        await asyncio.to_thread(write_stored_report, label, stored, stats,
+                                                options.get("report_format", "md"))
+                else:
+                    static = await _batched_static(batcher, path) if batcher is not None else None
+                    summary = await loop.run_in_executor(pool, _scan_worker, label, path, stats, options, static)
+                    record.update(summary)
+                    # A result with a failed analyzer is not a vetted result.
+                    if identity is not None and not summary["errors"]:
+                        unsaved.append((identity, summary))
+                        await save()
+            except Exception as e:
+                record.update({"total": None, "error": f"{type(e).__name__}: {e}"})
+            record["latency"] = round(time.perf_counter() - start, 3)
+            done += 1
+            if len(jobs) <= _PROGRESS_EVERY or done % _PROGRESS_EVERY == 0 or record.get("risk") != "LOW":
+                outcome = f"score {record['total']}" if record.get("total") is not None else f"❌ {record['error']}"
+                if record.get("stored"):
+                    outcome += " (stored result)"
+                print(f"[{done}/{len(jobs)}] {target}: {outcome} ({record['latency']}s)")
+            return record
+
+        records = await asyncio.gather(*(one(target, fetch, dict(record, target=target))
+                                         for target, fetch, record in jobs))
+        await save(flush=True)
+        return records
+
+
+def _finish(records: List[Dict], wall: float, report_format: str, fail_on: Optional[int], **report_kwargs):
+    summary = write_batch_report(records, wall, format=report_format, **report_kwargs)
+    lat = summary["latency_seconds"]
+    print(f"⏱️  {len(records)} targets in {wall:.1f}s ({summary['throughput_per_minute']}/min); "
+          f"latency p50 {lat['p50']}s, p95 {lat['p95']}s, p99 {lat['p99']}s")
+    if summary["failed"]:
+        print(f"❌ {summary['failed']} target(s) could not be scanned")
+
+    if fail_on is not None:
+        over = [r["target"] for r in records if r.get("total") is not None and r["total"] >= fail_on]
+        if over:
+            print(f"❌ Exiting with failure: {len(over)} target(s) scored >= fail-on {fail_on}")
+            sys.exit(1)
+
+
+def run_batch(targets_file: str, concurrency: Optional[int] = None, scan_workers: Optional[int] = None,
+              report_format: str = "md", max_file_bytes: Optional[int] = None, use_cache: bool = True,
+              offline: bool = False, registry: Optional[str] = None, fail_on: Optional[int] = None,
+              deep: bool = False, semgrep_batch: Optional[int] = None, semgrep_timeout: Optional[int] = None,
+              use_store: bool = True, rescan: bool = False):
+    """Scan every target listed in targets_file in one process tree.
+
+    Writes one report per target plus an aggregated batch report with
+    throughput and p50/p95/p99 latency (download + scan, per target).
+    With deep, semgrep runs once per semgrep_batch targets rather than
+    once per target; semgrep_timeout is the budget per target, and a run
+    over several targets gets a proportionally larger one. Targets
+    with a fresh result in the results store are not scanned again unless
+    rescan is set.
+    """
+    targets = load_targets(targets_file)
+    if not targets:
+        print(f"❌ No targets in {targets_file}")
+        sys.exit(2)
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    scan_workers = scan_workers or os.cpu_count() or 1
+    print(f"📦 Batch: {len(targets)} targets, {concurrency} concurrent downloads, {scan_workers} scan workers")
+
+    fetch_cache = FetchCache(offline=offline)
+    jobs = [(t, (lambda t=t: _fetch_target(t, fetch_cache, registry)), {}) for t in targets]
+    options = {"report_format": report_format, "max_file_bytes": max_file_bytes, "use_cache": use_cache, "deep": deep,
+               "rescan": rescan}
+    store = ScanStore(analyzer_version(deep)) if use_store else None
+    batcher = None
+    if deep:
+        batcher = SemgrepBatcher(batch_size=semgrep_batch or DEFAULT_BATCH_SIZE,
+                                 timeout=semgrep_timeout or SEMGREP_TIMEOUT, max_file_bytes=max_file_bytes)
+        print(f"🔬 semgrep: up to {batcher.batch_size} targets per run, {batcher.timeout}s timeout per target "
+              f"({batcher.budget(batcher.batch_size):.0f}s for a full batch)")
+    start = time.perf_counter()
+    try:
+        records = asyncio.run(_run_pipeline(jobs, concurrency, scan_workers, options, batcher, store))
+    finally:
+        if batcher is not None:
+            batcher.close()
+        if store is not None:
+            store.close()
+    if batcher is not None:
+        print(f"🔬 semgrep: {batcher.runs} runs for {len(targets)} targets ({batcher.failed_batches} failed batches rerun per target)")
+    _finish(records, time.perf_counter() - start, report_format, fail_on)
+    return records
+
+
+def scan_dependencies(package_path, context: ScanContext, concurrency: Optional[int] = None,
+                      scan_workers: Optional[int] = None, report_format: str = "md",
+                      max_file_bytes: Optional[int] = None, use_cache: bool = True, offline: bool = False,
+                      fail_on: Optional[int] = None, use_store: bool = True, rescan: bool = False) -> List[Dict]:
+    """Fetch and scan every registry package the target's lockfile pins.
+
+    Packages are deduplicated by integrity, so a version installed in many
+    places (or across workspaces) is fetched and scanned once; tarballs
+    come from the fetch cache by integrity, so a rerun downloads nothing.
+    Dependencies get the per-package analyzers (never semgrep) in a process
+    pool and one row each in a per-dependency risk table; no per-dependency
+    report files are written. Dependencies with a fresh result in the
+    results store are neither fetched nor scanned unless rescan is set.
+    """
+    lockfile_name = find_lockfile(context)
+    if lockfile_name is None:
+        print("⚠️  --deps: no lockfile to read dependencies from")
+        return []
+    try:
+        packages = collect_locked_packages(iter_lockfile(context, lockfile_name))
+    except ValueError as e:
+        print(f"❌ --deps: could not read {lockfile_name}: {e}")
+        return []
+    if not packages:
+        print(f"⚠️  --deps: {lockfile_name} pins no registry tarballs")
+        return []
+    concurrency = concurrency or DEFAULT_CONCURRENCY * 2
+    scan_workers = scan_workers or os.cpu_count() or 1
+    installs = sum(len(p["paths"]) for p in packages)
+    print(f"🧬 Scanning {len(packages)} unique dependencies ({installs} installs in {lockfile_name}), "
+          f"{concurrency} concurrent downloads, {scan_workers} scan workers")
+
+    store = ScanStore(analyzer_version(as_dependency=True)) if use_store else None
+    stored_records = []
+    if store is not None and not rescan:
+        identities = {id(p): _locked_identity(p) for p in packages}
+        fresh = store.get_many(i for i in identities.values() if i is not None)
+        for p in packages:
+            if identities[id(p)] in fresh:
+                stored_records.append(dict(fresh[identities[id(p)]], target=f"{p['name']}@{p['version']}",
+                                           paths=p["paths"], stored=True))
+        if stored_records:
+            print(f"♻️  {len(stored_records)} dependencies already scanned with the same analyzers (--rescan to redo)")
+            packages = [p for p in packages if identities[id(p)] not in fresh]
+
+    fetch_cache = FetchCache(offline=offline)
+    jobs = [(f"{p['name']}@{p['version']}", (lambda p=p: _fetch_locked(p, fetch_cache)), {"paths": p["paths"]})
+            for p in packages]
+    options = {"max_file_bytes": max_file_bytes, "use_cache": use_cache, "as_dependency": True, "write_reports": False,
+               "rescan": rescan}
+    start = time.perf_counter()
+    try:
+        records = asyncio.run(_run_pipeline(jobs, concurrency, scan_workers, options, store=store))
+    finally:
+        if store is not None:
+            store.close()
+    _finish(records + stored_records, time.perf_counter() - start, report_format, fail_on,
+            title=f"Dependency Risk Report for `{package_path}`", name=f"{package_path}_deps")
+    return records
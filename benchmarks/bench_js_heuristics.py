@@ -0,0 +1,67 @@
+"""Benchmark the JavaScript heuristics against just reading the same bytes.
+
+Usage: python benchmarks/bench_js_heuristics.py [megabytes]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzers.js_heuristics import scan_source  # noqa: E402
+
+
+# Benign code that is dense in the rules' keywords (a worst case: most
+# real files contain none and are never tokenized): static requires,
+# regexes with quotes in them, keywords inside comments and strings,
+# method calls named like the sinks.
+_LINES = [
+    'var {0} = require("./lib/{0}");',
+    'function {0}(a, b) {{ return a.exec(b) || "{0}\\n"; }}',
+    'const re{0} = /["\']{0}/g, n = x / 2 / y;',
+    '// eval({0}) is only mentioned in this comment',
+    'exports.{0} = function () {{ return this.{0}.call(this, "fromCharCode(1)"); }};',
+    'if (typeof {0} === "undefined") {{ {0} = {{}}; }}',
+]
+
+
+def _bundle(num_bytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < num_bytes:
+        name = "m" + "".join(rng.choice("abcdefghij") for _ in range(6))
+        line = rng.choice(_LINES).format(name)
+        parts.append(line)
+        size += len(line) + 1
+    return "\n".join(parts)
+
+
+def main(megabytes: int = 20):
+    text = _bundle(megabytes * 1024 * 1024)
+    data = text.encode("utf-8")
+    minified = text.replace("\n", "")
+
+    start = time.perf_counter()
+    data.decode("utf-8")
+    decode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = scan_source(text)
+    scan = time.perf_counter() - start
+    assert not found, f"false positives on benign code: {found}"
+
+    start = time.perf_counter()
+    scan_source(minified)
+    scan_min = time.perf_counter() - start
+
+    mb = len(data) / 1e6
+    print(f"Bundle: {mb:.1f} MB")
+    print(f"decode only: {mb / decode:.0f} MB/s")
+    print(f"heuristics:  {mb / scan:.0f} MB/s")
+    print(f"minified:    {mb / scan_min:.0f} MB/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
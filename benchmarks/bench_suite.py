@@ -0,0 +1,259 @@
+"""Time each analyzer and the whole CLI on synthetic targets of several sizes.
+
+Every case is timed a few times and the fastest run kept. Results go to
+benchmarks/results/bench_<time>.json and are compared against
+benchmarks/baseline.json: a case more than --tolerance slower than its
+baseline (and slower by at least MIN_DELTA seconds, so millisecond noise
+doesn't count) is a regression, and the run exits 1. Baselines are only
+meaningful on the machine that recorded them; re-record with
+--update-baseline after an intended change or on new hardware.
+
+The real dependency trees under benchmarks/data/real-trees (a published
+project's package.json and gzipped package-lock.json each) are timed too,
+and double as a false-positive check: every package in them is a real
+one, so any typosquat finding there fails the run.
+
+Usage: python benchmarks/bench_suite.py [--sizes=small,medium] [--repeat=3]
+           [--tolerance=0.25] [--update-baseline] [--no-cli]
+"""
+import contextlib
+import gzip
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from analyzers.js_heuristics import run_js_heuristics  # noqa: E402
+from analyzers.lockfile_checker import _check_lockfile, run_lockfile_and_scripts_check  # noqa: E402
+from analyzers.sbom import generate_sbom  # noqa: E402
+from analyzers.scan_context import ScanContext  # noqa: E402
+from analyzers.secrets_scanner import run_secrets_scan  # noqa: E402
+from analyzers.typo_checker import TYPOSQUAT_TYPES, run_typo_and_maintainer_check  # noqa: E402
+from analyzers.typo_index import default_index  # noqa: E402
+from analyzers.write_report import write_report  # noqa: E402
+from benchmarks.synthetic import dependency_names, make_lockfile, make_package  # noqa: E402
+
+
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+REAL_TREES = os.path.join(BENCH_DIR, "data", "real-trees")
+MIN_DELTA = 0.01
+
+# make_package() arguments per size.
+SIZES = {
+    "small": dict(files=50, bundles=1, bundle_bytes=256 * 1024, lock_packages=200, direct_deps=50),
+    "medium": dict(files=500, bundles=4, bundle_bytes=1024 * 1024, lock_packages=2000, direct_deps=500),
+    "large": dict(files=2000, bundles=8, bundle_bytes=2 * 1024 * 1024, lock_packages=10000, direct_deps=2000),
+}
+DEFAULT_SIZES = ("small", "medium")
+
+
+def _best(fn, repeat: int):
+    # Fastest of repeat runs (analyzer output silenced); returns (seconds, last result).
+    best, result = None, None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 4), result
+
+
+def _analyzer_cases(root: str, params: dict, repeat: int, cli: bool):
+    """{case: seconds} for one synthetic target."""
+    times = {}
+
+    def context():
+        # A fresh context per run: walking the tree is part of each analyzer's cost.
+        return ScanContext(root)
+
+    times["secrets"], secrets = _best(lambda: run_secrets_scan(root, context=context()), repeat)
+    times["heuristics"], heuristics = _best(lambda: run_js_heuristics(root, context=context()), repeat)
+    times["lockfile"], lockfile = _best(lambda: run_lockfile_and_scripts_check(root, context=context()), repeat)
+    times["typo"], typo = _best(lambda: run_typo_and_maintainer_check(root, context=context()), repeat)
+    times["sbom"], sbom = _best(lambda: generate_sbom(root, context=context()), repeat)
+
+    # Per lockfile format: _check_lockfile on an already parsed lock, and
+    # the streamed check the CLI runs on the file.
+    names = dependency_names(params["lock_packages"])
+    lock_dir = tempfile.mkdtemp(prefix="scd-bench-lock-")
+    try:
+        shutil.copy(os.path.join(root, "package.json"), lock_dir)
+        for version in (1, 2, 3):
+            lock = make_lockfile(names, version)
+            times[f"check_lockfile_v{version}"], _ = _best(lambda: _check_lockfile(lock), repeat)
+            with open(os.path.join(lock_dir, "package-lock.json"), "w", encoding="utf-8") as f:
+                json.dump(lock, f, indent=2)
+            times[f"lockfile_stream_v{version}"], _ = _best(
+                lambda: run_lockfile_and_scripts_check(lock_dir, context=ScanContext(lock_dir)), repeat)
+    finally:
+        shutil.rmtree(lock_dir, ignore_errors=True)
+    times["typo_check_many"], _ = _best(lambda: default_index().check_many(names), repeat)
+
+    # write_report and the CLI write to ./reports: run them in a scratch directory.
+    scratch = tempfile.mkdtemp(prefix="scd-bench-")
+    cwd = os.getcwd()
+    try:
+        os.chdir(scratch)
+        metadata = {"score": 0, "issues": []}
+        times["write_report_json"], _ = _best(lambda: write_report(
+            None, metadata, 0, root, secrets_result=secrets, sbom_result=sbom, lockfile_result=lockfile,
+            typo_result=typo, format="json", heuristics_result=heuristics), repeat)
+        times["write_report_md"], _ = _best(lambda: write_report(
+            None, metadata, 0, root, secrets_result=secrets, sbom_result=sbom, lockfile_result=lockfile,
+            typo_result=typo, format="md", heuristics_result=heuristics), repeat)
+        if cli:
+            command = [sys.executable, os.path.join(ROOT, "main.py"), root, "--format=json", "--no-cache", "--no-store"]
+            times["cli"], _ = _best(lambda: subprocess.run(command, stdout=subprocess.DEVNULL, check=True), repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+    return times
+
+
+def _real_tree_cases(tree: str, repeat: int):
+    """({case: seconds}, typosquat findings) for one tree under REAL_TREES."""
+    root = tempfile.mkdtemp(prefix="scd-bench-real-")
+    try:
+        shutil.copy(os.path.join(REAL_TREES, tree, "package.json"), root)
+        with gzip.open(os.path.join(REAL_TREES, tree, "package-lock.json.gz")) as src, \
+                open(os.path.join(root, "package-lock.json"), "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        times = {}
+        times["lockfile"], _ = _best(lambda: run_lockfile_and_scripts_check(root, context=ScanContext(root)), repeat)
+        times["typo"], typo = _best(lambda: run_typo_and_maintainer_check(root, context=ScanContext(root)), repeat)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    findings = [i for i in typo.get("issues", []) if isinstance(i, dict) and i.get("type") in TYPOSQUAT_TYPES]
+    return times, findings
+
+
+def run_real_trees(repeat: int = 3):
+    """({"real/tree/case": seconds}, [(tree, finding)]) over every tree under REAL_TREES."""
+    default_index()
+    results, false_positives = {}, []
+    trees = sorted(os.listdir(REAL_TREES)) if os.path.isdir(REAL_TREES) else []
+    for tree in trees:
+        times, findings = _real_tree_cases(tree, repeat)
+        print(f"📦 real/{tree}: {len(findings)} typosquat finding(s)")
+        for case, seconds in times.items():
+            results[f"real/{tree}/{case}"] = seconds
+            print(f"  {case:<20} {seconds:>8.4f}s")
+        false_positives += [(tree, f) for f in findings]
+    return results, false_positives
+
+
+def run_suite(sizes, repeat: int = 3, cli: bool = True) -> dict:
+    """{"size/case": seconds} over the given sizes."""
+    # The typo index is built (or loaded) once per process; keep that out of the timings.
+    default_index()
+    results = {}
+    for size in sizes:
+        params = SIZES[size]
+        root = tempfile.mkdtemp(prefix=f"scd-bench-{size}-")
+        try:
+            start = time.perf_counter()
+            info = make_package(root, **params)
+            print(f"📦 {size}: {info} (generated in {time.perf_counter() - start:.1f}s)")
+            for case, seconds in _analyzer_cases(root, params, repeat, cli).items():
+                results[f"{size}/{case}"] = seconds
+                print(f"  {case:<20} {seconds:>8.4f}s")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def _machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """(case, baseline seconds, current seconds) for every regressed case."""
+    regressions = []
+    for case, seconds in results.items():
+        before = baseline.get(case)
+        if before is None:
+            continue
+        if seconds > before * (1 + tolerance) and seconds - before >= MIN_DELTA:
+            regressions.append((case, before, seconds))
+    return regressions
+
+
+def _report_false_positives(false_positives) -> int:
+    if not false_positives:
+        return 0
+    print(f"❌ {len(false_positives)} typosquat finding(s) in real dependency trees:")
+    for tree, finding in false_positives:
+        print(f"  {tree}: {finding.get('name')} ~ {finding.get('close_to')} ({finding.get('type')})")
+    return 1
+
+
+def main(argv) -> int:
+    sizes, repeat, tolerance, update, cli = list(DEFAULT_SIZES), 3, 0.25, False, True
+    for arg in argv[1:]:
+        if arg.startswith("--sizes="):
+            sizes = [s for s in arg.split("=", 1)[1].split(",") if s]
+        elif arg.startswith("--repeat="):
+            repeat = max(1, int(arg.split("=", 1)[1]))
+        elif arg.startswith("--tolerance="):
+            tolerance = float(arg.split("=", 1)[1])
+        elif arg == "--update-baseline":
+            update = True
+        elif arg == "--no-cli":
+            cli = False
+        else:
+            print(__doc__)
+            return 2
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        print(f"❌ Unknown sizes {unknown}; choose from {sorted(SIZES)}")
+        return 2
+
+    results = run_suite(sizes, repeat, cli)
+    real, false_positives = run_real_trees(repeat)
+    results.update(real)
+    record = {"recorded_at": datetime.now().isoformat(timespec="seconds"), "machine": _machine(),
+              "repeat": repeat, "results": results}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    print(f"📝 Results saved to: {path}")
+
+    if update or not os.path.exists(BASELINE):
+        if os.path.exists(BASELINE):
+            # Keep baseline cases for sizes this run didn't cover.
+            with open(BASELINE, encoding="utf-8") as f:
+                record["results"] = dict(json.load(f).get("results", {}), **results)
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+        print(f"📌 Baseline saved to: {BASELINE}")
+        return _report_false_positives(false_positives)
+
+    with open(BASELINE, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != record["machine"]:
+        print(f"⚠️  Baseline was recorded on {baseline.get('machine')}; timings may not be comparable")
+    regressions = compare(results, baseline.get("results", {}), tolerance)
+    if regressions:
+        print(f"❌ {len(regressions)} case(s) regressed by more than {tolerance:.0%}:")
+        for case, before, seconds in regressions:
+            print(f"  {case:<28} {before:.4f}s -> {seconds:.4f}s ({seconds / before - 1:+.0%})")
+        return max(1, _report_false_positives(false_positives))
+    print(f"✅ No case regressed by more than {tolerance:.0%} against the baseline")
+    return _report_false_positives(false_positives)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
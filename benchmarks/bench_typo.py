@@ -0,0 +1,89 @@
+"""Benchmark indexed typosquat lookups against a linear edit-distance scan.
+
+A fifth of the names are scoped, and the typos also insert or substitute
+"@", "/" and "-", so misplaced scope punctuation is checked too.
+
+Usage: python benchmarks/bench_typo.py [num_names] [num_queries]
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzers.typo_index import MAX_DISTANCE, TypoIndex, bounded_distance  # noqa: E402
+
+
+_ALPHABET = string.ascii_lowercase + "-"
+
+
+def _synthetic_names(num_names: int, seed: int = 0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < num_names:
+        name = "".join(rng.choice(_ALPHABET) for _ in range(rng.randint(4, 16))).strip("-")
+        if len(name) >= 4:
+            names.add(name)
+    return sorted(names)
+
+
+def _scoped_names(num_names: int, seed: int = 2):
+    scopes = _synthetic_names(max(num_names // 50, 1), seed=seed)
+    rng = random.Random(seed)
+    return sorted({f"@{rng.choice(scopes)}/{name}" for name in _synthetic_names(num_names, seed=seed + 1)})
+
+
+def _typos(names, num_queries: int, seed: int = 1, alphabet: str = string.ascii_lowercase):
+    # One or two random edits of a real name, as a typosquatter would pick.
+    rng = random.Random(seed)
+    queries = []
+    for name in rng.sample(names, num_queries):
+        chars = list(name)
+        for _ in range(rng.randint(1, 2)):
+            i = rng.randrange(len(chars))
+            op = rng.random()
+            if op < 0.25:
+                del chars[i]
+            elif op < 0.5:
+                chars.insert(i, rng.choice(alphabet))
+            elif op < 0.75 and i + 1 < len(chars):
+                chars[i], chars[i + 1] = chars[i + 1], chars[i]
+            else:
+                chars[i] = rng.choice(alphabet)
+        queries.append("".join(chars))
+    return queries
+
+
+def _linear(names, query: str):
+    matches = sorted((bounded_distance(query, n, MAX_DISTANCE), rank) for rank, n in enumerate(names))
+    return [(names[rank], d) for d, rank in matches if d <= MAX_DISTANCE]
+
+
+def main(num_names: int = 100_000, num_queries: int = 200):
+    names = _synthetic_names(num_names - num_names // 5) + _scoped_names(num_names // 5)
+    known = set(names)
+    queries = [q for q in _typos(names, num_queries, alphabet=string.ascii_lowercase + "-@/") if q not in known]
+
+    start = time.perf_counter()
+    index = TypoIndex(names)
+    build = time.perf_counter() - start
+    print(f"Names: {len(names)}, queries: {len(queries)}, index built in {build:.2f}s")
+
+    start = time.perf_counter()
+    baseline = [_linear(names, q) for q in queries]
+    linear = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [index.lookup(q) for q in queries]
+    lookup = time.perf_counter() - start
+
+    assert indexed == baseline, "indexed lookups diverged from the linear scan"
+    print(f"linear:  {linear / len(queries) * 1e3:.2f} ms/query")
+    print(f"indexed: {lookup / len(queries) * 1e6:.0f} us/query  ({linear / lookup:.0f}x, identical)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,166 @@
+"""Generate synthetic npm packages to benchmark the analyzers on.
+
+A target has source files with a controlled density of planted secrets,
+minified bundles, a package-lock.json (v1, v2 or v3) pinning M packages
+and a package.json with a large dependency map. Dependency names are a
+mix of popular names, typos of them and random names, so the typosquat
+check has real work to do. Everything is seeded: the same arguments
+always produce the same bytes.
+
+Usage: python benchmarks/synthetic.py OUT_DIR [files] [lock_packages] [lock_version]
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import string
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzers.typo_index import DEFAULT_NAMES_FILE, parse_names  # noqa: E402
+from benchmarks.bench_js_heuristics import _LINES, _bundle  # noqa: E402
+from benchmarks.bench_typo import _synthetic_names, _typos  # noqa: E402
+
+
+# Each matches one of the secrets scanner's patterns.
+_SECRETS = [
+    lambda rng: 'const awsKey = "AKIA{}";'.format(_random(rng, string.ascii_uppercase + string.digits, 16)),
+    lambda rng: 'const token = "ghp_{}";'.format(_random(rng, string.ascii_letters + string.digits, 36)),
+    lambda rng: 'headers.Authorization = "npm_{}";'.format(_random(rng, string.ascii_letters + string.digits, 36)),
+    lambda rng: 'stripe("sk_live_{}");'.format(_random(rng, string.ascii_letters + string.digits, 32)),
+    lambda rng: 'var blob = "{}";'.format(_random(rng, string.ascii_letters + string.digits + "+/", 48)),
+]
+
+
+def _random(rng: random.Random, alphabet: str, length: int) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def _integrity(name: str, version: str) -> str:
+    digest = hashlib.sha512(f"{name}@{version}".encode("utf-8")).digest()
+    return "sha512-" + base64.b64encode(digest).decode("ascii")
+
+
+def dependency_names(count: int, typo_rate: float = 0.02, seed: int = 0):
+    """count distinct names: popular ones first, typos of them at typo_rate, then random ones."""
+    with open(DEFAULT_NAMES_FILE, encoding="utf-8") as f:
+        popular = parse_names(f)
+    rng = random.Random(seed)
+    num_typos = min(int(count * typo_rate), len(popular))
+    names = list(dict.fromkeys(_typos(popular, num_typos, seed=seed + 1)))
+    names += [n for n in popular[:count // 2] if n not in names]
+    if len(names) < count:
+        names += [n for n in _synthetic_names(count, seed=seed + 2) if n not in names]
+    rng.shuffle(names)
+    return names[:count]
+
+
+def write_sources(root: str, num_files: int, lines_per_file: int = 200, secret_density: float = 0.001,
+                  seed: int = 0) -> int:
+    """num_files .js files under root/src; each line is a planted secret with
+    probability secret_density. Returns the number of secrets planted."""
+    rng = random.Random(seed)
+    planted = 0
+    for i in range(num_files):
+        path = os.path.join(root, "src", f"dir{i % 20}", f"module{i}.js")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lines = []
+        for _ in range(lines_per_file):
+            if rng.random() < secret_density:
+                lines.append(rng.choice(_SECRETS)(rng))
+                planted += 1
+            else:
+                lines.append(rng.choice(_LINES).format("m" + _random(rng, "abcdefghij", 6)))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    return planted
+
+
+def write_bundles(root: str, num_bundles: int, bundle_bytes: int, seed: int = 0):
+    """Minified bundles (one long line each) under root/dist."""
+    os.makedirs(os.path.join(root, "dist"), exist_ok=True)
+    for i in range(num_bundles):
+        text = _bundle(bundle_bytes, seed=seed + i).replace("\n", "")
+        with open(os.path.join(root, "dist", f"bundle{i}.min.js"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def _lock_entries(names, seed: int = 0):
+    # (install path, name, meta): about one package in ten is nested under
+    # another; a few are git dependencies or lack integrity.
+    rng = random.Random(seed)
+    entries = []
+    for i, name in enumerate(names):
+        version = f"{rng.randint(0, 9)}.{rng.randint(0, 20)}.{rng.randint(0, 30)}"
+        meta = {"version": version,
+                "resolved": f"https://registry.npmjs.org/{name}/-/{name.rsplit('/', 1)[-1]}-{version}.tgz",
+                "integrity": _integrity(name, version)}
+        roll = rng.random()
+        if roll < 0.005:
+            meta["resolved"] = f"git+https://github.com/example/{name.rsplit('/', 1)[-1]}.git"
+        elif roll < 0.01:
+            del meta["integrity"]
+        path = f"node_modules/{name}"
+        if i > 10 and rng.random() < 0.1:
+            path = f"{entries[rng.randrange(i)][0]}/{path}"
+        entries.append((path, name, meta))
+    return entries
+
+
+def make_lockfile(names, version: int = 3, seed: int = 0) -> dict:
+    """A package-lock.json dict in lockfileVersion 1, 2 or 3 pinning every name."""
+    entries = _lock_entries(names, seed)
+    lock = {"name": "synthetic-app", "version": "1.0.0", "lockfileVersion": version, "requires": True}
+    if version >= 2:
+        packages = {"": {"name": "synthetic-app", "version": "1.0.0"}}
+        packages.update((path, meta) for path, _, meta in entries)
+        lock["packages"] = packages
+    if version <= 2:
+        # v1 nests dependencies inside dependencies; v2 keeps that tree for old npm.
+        tree = {}
+        nodes = {}
+        for path, name, meta in entries:
+            node = dict(meta)
+            parent = path.rpartition("/node_modules/")[0]
+            siblings = nodes[parent].setdefault("dependencies", {}) if parent else tree
+            siblings[name] = nodes[path] = node
+        lock["dependencies"] = tree
+    return lock
+
+
+def make_package_json(names, license: str = "MIT") -> dict:
+    """A package.json depending on every name (a quarter of them as devDependencies)."""
+    split = len(names) * 3 // 4
+    return {
+        "name": "synthetic-app", "version": "1.0.0", "license": license,
+        "repository": "https://github.com/example/synthetic-app", "author": "bench",
+        "scripts": {"build": "node build.js", "test": "node test.js"},
+        "dependencies": {n: "^1.0.0" for n in names[:split]},
+        "devDependencies": {n: "^1.0.0" for n in names[split:]},
+    }
+
+
+def make_package(root: str, files: int = 100, lines_per_file: int = 200, secret_density: float = 0.001,
+                 bundles: int = 2, bundle_bytes: int = 256 * 1024, lock_packages: int = 500,
+                 lock_version: int = 3, direct_deps: int = 100, seed: int = 0) -> dict:
+    """Write a whole synthetic package under root; returns what went into it."""
+    os.makedirs(root, exist_ok=True)
+    names = dependency_names(max(lock_packages, direct_deps), seed=seed)
+    planted = write_sources(root, files, lines_per_file, secret_density, seed)
+    write_bundles(root, bundles, bundle_bytes, seed)
+    with open(os.path.join(root, "package.json"), "w", encoding="utf-8") as f:
+        json.dump(make_package_json(names[:direct_deps]), f, indent=2)
+    with open(os.path.join(root, "package-lock.json"), "w", encoding="utf-8") as f:
+        json.dump(make_lockfile(names[:lock_packages], lock_version, seed), f, indent=2)
+    return {"files": files, "secrets_planted": planted, "bundles": bundles, "bundle_bytes": bundle_bytes,
+            "lock_packages": lock_packages, "lock_version": lock_version, "direct_deps": direct_deps}
+
+
+if __name__ == "__main__":
+    out = sys.argv[1] if len(sys.argv) > 1 else "synthetic-package"
+    info = make_package(out, files=int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+                        lock_packages=int(sys.argv[3]) if len(sys.argv) > 3 else 500,
+                        lock_version=int(sys.argv[4]) if len(sys.argv) > 4 else 3)
+    print(f"Wrote {out}: {info}")
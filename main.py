@@ -1,12 +1,25 @@
+import cProfile
+import os
+import shutil
 import sys
-from typing import Optional
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
 
-from analyzers.downloader import download_and_extract_npm
-from analyzers.github_downloader import download_and_extract_github
+from analyzers.archive_fs import is_archive_file
+from analyzers.downloader import download_and_extract_npm, download_npm_tarball, split_npm_spec
+from analyzers.executor import PROCESS, THREAD, run_analyzers
+from analyzers.js_heuristics import run_js_heuristics
+from analyzers.fetch_cache import FetchCache, OfflineCacheMiss
+from analyzers.github_downloader import download_and_extract_github, download_github_zipball
 from analyzers.metadata_checker import run_metadata_check
+from analyzers.findings import RISK_ICONS, issue_types, risk_level
+from analyzers.result_cache import ResultCache
+from analyzers.scan_context import ScanContext
+from analyzers.scan_store import ScanStore, analyzer_version, scan_identity
 from analyzers.signature_checker import verify_with_cosign
 from analyzers.static_analyzer import run_static_analysis
-from analyzers.write_report import write_report
+from analyzers.write_report import ReportStream, write_profile, write_report, write_stored_report
 from analyzers.secrets_scanner import run_secrets_scan
 from analyzers.sbom import generate_sbom
 from analyzers.lockfile_checker import run_lockfile_and_scripts_check
@@ -16,8 +29,26 @@ from analyzers.typo_checker import run_typo_and_maintainer_check
 def parse_args(argv):
     target: Optional[str] = None
     download = False
-    report_format = "md"  # md | json | both
+    extract = False
+    report_format = "md"  # md | json | ndjson | both
     fail_on: Optional[int] = None
+    max_file_bytes: Optional[int] = None
+    workers: Optional[int] = None
+    use_cache = True
+    offline = False
+    registry: Optional[str] = None
+    batch: Optional[str] = None
+    concurrency: Optional[int] = None
+    deps = False
+    deep = False
+    semgrep_batch: Optional[int] = None
+    semgrep_timeout: Optional[int] = None
+    use_store = True
+    rescan = False
+    history = False
+    min_score: Optional[int] = None
+    since_days: Optional[float] = None
+    profile = False
 
     i = 1
     while i < len(argv):
@@ -30,6 +61,90 @@ def parse_args(argv):
             download = True
             i += 1
             continue
+        if arg == "--extract":
+            extract = True
+            i += 1
+            continue
+        if arg == "--deps":
+            deps = True
+            i += 1
+            continue
+        if arg == "--deep":
+            deep = True
+            i += 1
+            continue
+        if arg == "--offline":
+            offline = True
+            i += 1
+            continue
+        if arg.startswith("--batch="):
+            batch = arg.split("=", 1)[1]
+            i += 1
+            continue
+        if arg.startswith("--concurrency="):
+            try:
+                concurrency = int(arg.split("=", 1)[1])
+            except ValueError:
+                print("❌ --concurrency must be an integer (e.g., --concurrency=16)")
+                sys.exit(2)
+            i += 1
+            continue
+        if arg.startswith("--semgrep-batch="):
+            try:
+                semgrep_batch = int(arg.split("=", 1)[1])
+            except ValueError:
+                print("❌ --semgrep-batch must be an integer (e.g., --semgrep-batch=16)")
+                sys.exit(2)
+            i += 1
+            continue
+        if arg.startswith("--semgrep-timeout="):
+            try:
+                semgrep_timeout = int(arg.split("=", 1)[1])
+            except ValueError:
+                print("❌ --semgrep-timeout must be an integer number of seconds (e.g., --semgrep-timeout=600)")
+                sys.exit(2)
+            i += 1
+            continue
+        if arg.startswith("--registry="):
+            registry = arg.split("=", 1)[1]
+            i += 1
+            continue
+        if arg == "--no-cache":
+            use_cache = False
+            i += 1
+            continue
+        if arg == "--no-store":
+            use_store = False
+            i += 1
+            continue
+        if arg == "--rescan":
+            rescan = True
+            i += 1
+            continue
+        if arg == "--profile":
+            profile = True
+            i += 1
+            continue
+        if arg == "--history":
+            history = True
+            i += 1
+            continue
+        if arg.startswith("--min-score="):
+            try:
+                min_score = int(arg.split("=", 1)[1])
+            except ValueError:
+                print("❌ --min-score must be an integer score (e.g., --min-score=4)")
+                sys.exit(2)
+            i += 1
+            continue
+        if arg.startswith("--since="):
+            try:
+                since_days = float(arg.split("=", 1)[1])
+            except ValueError:
+                print("❌ --since must be a number of days (e.g., --since=7)")
+                sys.exit(2)
+            i += 1
+            continue
         if arg.startswith("--format="):
             report_format = arg.split("=", 1)[1]
             i += 1
@@ -42,94 +157,322 @@ def parse_args(argv):
                 sys.exit(2)
             i += 1
             continue
+        if arg.startswith("--max-file-bytes="):
+            try:
+                max_file_bytes = int(arg.split("=", 1)[1])
+            except ValueError:
+                print("❌ --max-file-bytes must be an integer (e.g., --max-file-bytes=10485760)")
+                sys.exit(2)
+            i += 1
+            continue
+        if arg.startswith("--workers="):
+            try:
+                workers = int(arg.split("=", 1)[1])
+            except ValueError:
+                print("❌ --workers must be an integer (e.g., --workers=8)")
+                sys.exit(2)
+            i += 1
+            continue
         # skip unknown flags gracefully
         i += 1
 
-    return target, download, report_format, fail_on
+    return (target, download, extract, report_format, fail_on, max_file_bytes, workers, use_cache, offline, registry,
+            batch, concurrency, deps, deep, semgrep_batch, semgrep_timeout, use_store, rescan, history, min_score,
+            since_days, profile)
 
 
-def main(package_path, report_format: str = "md", fail_on: Optional[int] = None):
+# Analyzers whose score counts towards the total (the signature check is informational).
+SCORED_ANALYZERS = ("static", "heuristics", "metadata", "secrets", "sbom", "lockfile", "typo")
+
+
+def summarize_outcome(label, outcome: Dict) -> Dict:
+    """Scores, finding counts and issue types of one scan: what batch reports and the results store keep."""
+    results = outcome["results"]
+    scored = [name for name in SCORED_ANALYZERS if name in results]
+    return {
+        "label": str(label),
+        "total": outcome["total"],
+        "risk": risk_level(outcome["total"]),
+        "scores": {name: results[name]["score"] for name in scored},
+        "findings": {name: len(results[name].get("issues", [])) for name in scored},
+        "issue_types": sorted(set().union(*(issue_types(results[name].get("issues", [])) for name in scored))),
+        "errors": {name: r["error"] for name, r in results.items() if r and r.get("error")},
+    }
+
+
+def open_target(package_path) -> ScanContext:
+    """ScanContext for a local directory, or a .tgz/.zip file scanned in place.
+
+    Raises ValueError for any other file.
+    """
+    if not os.path.isfile(package_path):
+        return ScanContext(package_path)
+    # Cached downloads have no extension; the format is sniffed.
+    if not is_archive_file(package_path):
+        raise ValueError(f"{package_path} is not a directory or a .tgz/.zip archive")
+    return ScanContext.from_archive(package_path)
+
+
+def main(package_path, report_format: str = "md", fail_on: Optional[int] = None, max_file_bytes: Optional[int] = None,
+         workers: Optional[int] = None, use_cache: bool = True, download_stats: Optional[Dict] = None,
+         context: Optional[ScanContext] = None, deps: bool = False, concurrency: Optional[int] = None,
+         offline: bool = False, deep: bool = False, use_store: bool = True, rescan: bool = False,
+         profile: bool = False):
     print("🤖 Scanning:", package_path)
 
-    static_result = run_static_analysis(package_path)
-    metadata_result = run_metadata_check(package_path)
-    secrets_result = run_secrets_scan(package_path)
-    sbom_result = generate_sbom(package_path)
-    lockfile_result = run_lockfile_and_scripts_check(package_path)
-    typo_result = run_typo_and_maintainer_check(package_path)
-    sig_result = None
-    if str(package_path).startswith("github:") or str(package_path).startswith("docker:"):
-        sig_result = verify_with_cosign(package_path)
+    owns_context = context is None
+    try:
+        context = context or open_target(package_path)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    # A download or archive scanned before with the same analyzers isn't
+    # scanned again while its stored result is fresh (--rescan to force).
+    store = ScanStore(analyzer_version(deep)) if use_store else None
+    identity = scan_identity(package_path, package_path, download_stats) if store is not None else None
+    stored = store.get(identity) if identity is not None and not rescan else None
+
+    # Per-file results are cached by content hash across runs (--no-cache to skip).
+    cache = ResultCache() if use_cache else None
+    stream = None
+    try:
+        if stored is not None:
+            scanned = datetime.fromtimestamp(stored["scanned_at"]).strftime("%Y-%m-%d %H:%M")
+            print(f"♻️  Already scanned at {scanned} with the same analyzers: score {stored['total']} "
+                  f"({risk_level(stored['total'])}); --rescan to scan again")
+            for p in write_stored_report(package_path, stored, download_stats, report_format):
+                print(f"📝 Report saved to: {p} (stored result)")
+            total = stored["total"]
+        else:
+            # JSON/NDJSON findings are written as each analyzer finishes.
+            stream = ReportStream(package_path, report_format)
+            # --profile: analyzers run one by one in this thread, so cProfile sees all of them.
+            profiler = cProfile.Profile() if profile else None
+            if profiler is not None:
+                profiler.enable()
+            outcome = run_scan(package_path, context, max_file_bytes=max_file_bytes, workers=workers, cache=cache,
+                               deep=deep, on_result=stream.add, inline=profile)
+            write_outcome_report(package_path, outcome, download_stats, report_format, stream=stream)
+            if profiler is not None:
+                profiler.disable()
+                write_profile(profiler, package_path)
+            total = outcome["total"]
+            summary = summarize_outcome(package_path, outcome)
+            # A result with a failed analyzer is not a vetted result.
+            if identity is not None and not summary["errors"]:
+                store.put_many([(identity, summary)])
+        if deps:
+            # Every package the lockfile pins, fetched and scanned too (--deps).
+            from batch import scan_dependencies
+            scan_dependencies(package_path, context, concurrency=concurrency, scan_workers=workers,
+                              report_format=report_format, max_file_bytes=max_file_bytes, use_cache=use_cache,
+                              offline=offline, fail_on=fail_on, use_store=use_store, rescan=rescan)
+    finally:
+        if stream is not None:
+            stream.close()
+        if owns_context:
+            context.close()
+        if cache is not None:
+            cache.close()
+        if store is not None:
+            store.close()
+
+    if fail_on is not None and total >= fail_on:
+        print(f"❌ Exiting with failure because total score {total} >= fail-on {fail_on}")
+        sys.exit(1)
+
+
+def run_scan(package_path, context: ScanContext, max_file_bytes: Optional[int] = None, workers: Optional[int] = None,
+             cache: Optional[ResultCache] = None, threads_only: bool = False, as_dependency: bool = False,
+             deep: bool = False, static_result: Optional[Dict] = None,
+             on_result: Optional[Callable[[str, Optional[Dict]], None]] = None, inline: bool = False) -> Dict:
+    """Run every analyzer over one target; returns {"results": {name: result}, "total": score}.
+
+    threads_only keeps every analyzer in this process (for callers that are
+    themselves a worker process, like batch mode). as_dependency scans a
+    published dependency: no lockfile expected. JavaScript is triaged by
+    the built-in heuristics; deep adds the semgrep pass on top, unless the
+    caller already has its static_result (batch mode runs semgrep for many
+    targets at once). on_result is called with each analyzer's result as it
+    finishes; inline runs the analyzers one by one in this thread (see
+    run_analyzers).
+    """
+    # One walk of the target and one parse per manifest, shared by every
+    # analyzer. Walk up front so process-pool analyzers receive it too.
+    context.files
+    shared = {"context": context}
+
+    # With --workers the secrets scan runs its own process pool, so it only
+    # needs a thread here. Archives stay in this process: a copy sent to a
+    # worker process would have to inflate the archive again.
+    secrets_kind = THREAD if (workers and workers > 1) or context.is_archive or threads_only else PROCESS
+    lockfile_kind = THREAD if context.is_archive or threads_only else PROCESS
+    heuristics_kind = THREAD if context.is_archive or threads_only else PROCESS
+    secrets_kwargs = dict(shared, max_file_bytes=max_file_bytes, workers=workers, cache=cache)
+    lockfile_kwargs = dict(shared, require_lockfile=not as_dependency)
+    static_kwargs = dict(shared, jobs=workers, max_file_bytes=max_file_bytes)
+    heuristics_kwargs = dict(shared, max_file_bytes=max_file_bytes)
+
+    # The analyzers are independent of each other: run them concurrently so
+    # the scan takes as long as the slowest one instead of the sum.
+    jobs = [
+        ("metadata", run_metadata_check, (package_path,), THREAD, shared),
+        ("secrets", run_secrets_scan, (package_path,), secrets_kind, secrets_kwargs),
+        ("sbom", generate_sbom, (package_path,), THREAD, shared),
+        ("lockfile", run_lockfile_and_scripts_check, (package_path,), lockfile_kind, lockfile_kwargs),
+        ("typo", run_typo_and_maintainer_check, (package_path,), THREAD, shared),
+        ("heuristics", run_js_heuristics, (package_path,), heuristics_kind, heuristics_kwargs),
+    ]
+    if deep and not as_dependency and static_result is None:
+        jobs.insert(0, ("static", run_static_analysis, (package_path,), THREAD, static_kwargs))
+    if not context.is_archive and (str(package_path).startswith("github:") or str(package_path).startswith("docker:")):
+        jobs.append(("signature", verify_with_cosign, (package_path,), THREAD))
+
+    results = run_analyzers(jobs, on_result=on_result, inline=inline)
+    if static_result is not None:
+        results = dict(static=static_result, **results)
+        if on_result is not None:
+            on_result("static", static_result)
+    metadata_result = results["metadata"]
 
     print("\n== Report ==")
-    print(f"📊 Static Score: {static_result['score']}")
+    if "static" in results:
+        print(f"📊 Static Score: {results['static']['score']}")
+    print(f"⚡ Heuristics Score: {results['heuristics']['score']}")
     print(f"📋 Metadata Score: {metadata_result['score']}")
     print(f"⚠️  Issues: {metadata_result['issues']}")
+    for name, result in results.items():
+        if result is not None:
+            print(f"⏱️  {name}: {result.get('elapsed', 0)}s")
 
-    total = (
-        static_result["score"]
-        + metadata_result["score"]
-        + secrets_result["score"]
-        + sbom_result["score"]
-        + lockfile_result["score"]
-        + typo_result["score"]
-    )
+    total = sum(results[name]["score"] for name in SCORED_ANALYZERS if name in results)
     print(f"🧮 Final Risk Score: {total}")
-    if total >= 5:
-        print("🚨 RISK: HIGH")
-    elif total >= 3:
-        print("⚠️ RISK: MODERATE")
-    else:
-        print("✅ RISK: LOW")
+    print(f"{RISK_ICONS[risk_level(total)]} RISK: {risk_level(total)}")
+    return {"results": results, "total": total}
+
 
+def write_outcome_report(package_path, outcome: Dict, download_stats: Optional[Dict], report_format: str,
+                         stream: Optional[ReportStream] = None):
+    results = outcome["results"]
     write_report(
-        static_result,
-        metadata_result,
-        total,
+        results.get("static"),
+        results["metadata"],
+        outcome["total"],
         package_path,
-        sig_result=sig_result,
-        secrets_result=secrets_result,
-        sbom_result=sbom_result,
-        lockfile_result=lockfile_result,
-        typo_result=typo_result,
+        sig_result=results.get("signature"),
+        secrets_result=results["secrets"],
+        sbom_result=results["sbom"],
+        lockfile_result=results["lockfile"],
+        typo_result=results["typo"],
+        heuristics_result=results["heuristics"],
+        download_stats=download_stats,
         format=report_format,
+        stream=stream,
     )
 
-    if fail_on is not None and total >= fail_on:
-        print(f"❌ Exiting with failure because total score {total} >= fail-on {fail_on}")
-        sys.exit(1)
+
+def print_history(min_score: Optional[int] = None, since_days: Optional[float] = None):
+    """List stored scan results, newest first (--history)."""
+    store = ScanStore(analyzer_version())
+    since = time.time() - since_days * 86400 if since_days is not None else None
+    rows = store.query(min_score=min_score, since=since)
+    store.close()
+    if not rows:
+        print("ℹ️ No stored results match.")
+    for row in rows:
+        scanned = datetime.fromtimestamp(row["scanned_at"]).strftime("%Y-%m-%d %H:%M")
+        version = f"@{row['version']}" if row["version"] else ""
+        print(f"{scanned}  {RISK_ICONS[row['risk']]} {row['total']:>2}  {row['ecosystem']}:{row['name']}{version}"
+              f"  ({row['analyzer_version']})")
 
 
 if __name__ == "__main__":
     print("📦 Starting robot...")
     print("Args:", sys.argv)
 
-    target, download, report_format, fail_on = parse_args(sys.argv)
+    (target, download, extract, report_format, fail_on, max_file_bytes, workers, use_cache,
+     offline, registry, batch, concurrency, deps, deep, semgrep_batch, semgrep_timeout, use_store, rescan, history,
+     min_score, since_days, profile) = parse_args(sys.argv)
+
+    if history:
+        # e.g. everything that scored >= 4 in the last week: --history --min-score=4 --since=7
+        print_history(min_score, since_days)
+        sys.exit(0)
+
+    if batch:
+        if profile:
+            print("⚠️  --profile applies to single-target scans; ignored with --batch")
+        # Many targets in one run; --workers is the number scanned at once.
+        from batch import run_batch
+        run_batch(batch, concurrency=concurrency, scan_workers=workers, report_format=report_format,
+                  max_file_bytes=max_file_bytes, use_cache=use_cache, offline=offline, registry=registry,
+                  fail_on=fail_on, deep=deep, semgrep_batch=semgrep_batch, semgrep_timeout=semgrep_timeout,
+                  use_store=use_store, rescan=rescan)
+        sys.exit(0)
 
     if not target:
         print("❌ No package path or source given.")
         print("Usage examples:")
         print("  python main.py express --download --format=both --fail-on=4")
         print("  python main.py github:vercel/next.js --download --format=json")
+        print("  python main.py ./huge-monorepo --format=ndjson")
         print("  python main.py ./my-local-package --format=md")
+        print("  python main.py ./my-local-package --deep --workers=8")
+        print("  python main.py npm:express@4.19.2 --download --offline")
+        print("  python main.py ./express-4.19.2.tgz --format=md")
+        print("  python main.py ./my-local-package --max-file-bytes=52428800 --workers=8")
+        print("  python main.py ./my-app --deps --concurrency=32 --format=both")
+        print("  python main.py --batch=targets.txt --concurrency=16 --workers=8 --format=both")
+        print("  python main.py --batch=targets.txt --deep --semgrep-batch=32 --semgrep-timeout=600")
+        print("  python main.py --history --min-score=4 --since=7")
+        print("  python main.py ./my-local-package --profile --no-cache")
         sys.exit(2)
 
+    download_stats = None
+    temp_dir = None
+    context = None
+    package_path = target
     if download:
-        if ":" in target:
-            source, name = target.split(":", 1)
+        download_stats = {}
+        # Tarballs, zipballs and packuments are cached locally; --offline never touches the network.
+        fetch_cache = FetchCache(offline=offline)
+        source, name = target.split(":", 1) if ":" in target else ("npm", target)
+        if source not in ("npm", "github"):
+            print(f"❌ Unknown source: {source}")
+            sys.exit(1)
+        try:
             if source == "npm":
-                package_path = download_and_extract_npm(name)
-            elif source == "github":
-                package_path = download_and_extract_github(name)
+                name, version = split_npm_spec(name)
+                if extract:
+                    package_path = download_and_extract_npm(name, version, stats=download_stats, registry=registry,
+                                                            cache=fetch_cache)
+                else:
+                    archive_path = download_npm_tarball(name, version, stats=download_stats, registry=registry,
+                                                        cache=fetch_cache)
             else:
-                print(f"❌ Unknown source: {source}")
-                sys.exit(1)
+                if extract:
+                    package_path = download_and_extract_github(name, stats=download_stats, cache=fetch_cache)
+                else:
+                    archive_path = download_github_zipball(name, stats=download_stats, cache=fetch_cache)
+        except OfflineCacheMiss as e:
+            print(f"❌ Offline and not cached: {e}")
+            sys.exit(1)
+        if extract:
+            # --extract: unpacked to a temp dir first (the pre-archive behaviour).
+            temp_dir = os.path.dirname(package_path)
         else:
-            # Default to NPM if no source prefix
-            package_path = download_and_extract_npm(target)
-    else:
-        # If not downloading, assume it's a local path
-        package_path = target
+            # Default: scan the cached archive without extracting.
+            context = ScanContext.from_archive(archive_path)
+            package_path = download_stats.get("source", target)
 
     # Run scanner
-    main(package_path, report_format=report_format, fail_on=fail_on)
+    try:
+        main(package_path, report_format=report_format, fail_on=fail_on, max_file_bytes=max_file_bytes,
+             workers=workers, use_cache=use_cache, download_stats=download_stats, context=context, deps=deps,
+             concurrency=concurrency, offline=offline, deep=deep, use_store=use_store, rescan=rescan, profile=profile)
+    finally:
+        if context is not None:
+            context.close()
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,261 @@
+"""FetchCache against a local HTTP server: revalidation, offline mode, integrity and pruning.
+
+Run with python -m pytest tests (or python -m unittest discover tests).
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzers.fetch_cache import FetchCache, OfflineCacheMiss, create_retrying_session  # noqa: E402
+
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Sat, 17 Oct 2026 00:00:00 GMT"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # server.routes: {path: (body, etag, last_modified)}; server.requests
+    # records (path, request headers) for every GET.
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        route = self.server.routes.get(self.path)
+        if route is None:
+            self.send_error(404)
+            return
+        body, etag, last_modified = route
+        if_none_match = self.headers.get("If-None-Match")
+        if (if_none_match is not None and if_none_match == etag) or \
+                (if_none_match is None and last_modified and self.headers.get("If-Modified-Since") == last_modified):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        if last_modified:
+            self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FetchCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.routes = {}
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="scd-fetch-test-")
+        self.server.routes.clear()
+        self.server.requests.clear()
+        self.session = create_retrying_session()
+
+    def tearDown(self):
+        self.session.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def serve(self, path: str, body: bytes, etag=ETAG, last_modified=LAST_MODIFIED) -> str:
+        self.server.routes[path] = (body, etag, last_modified)
+        return self.base + path
+
+    def last_headers(self):
+        return self.server.requests[-1][1]
+
+    # -- get_json -----------------------------------------------------------
+
+    def test_get_json_revalidates_with_304(self):
+        url = self.serve("/doc", json.dumps({"name": "a"}).encode())
+        cache = FetchCache(self.root)
+        body, nbytes = cache.get_json(self.session, url, "npm", "a")
+        self.assertEqual(body, {"name": "a"})
+        self.assertGreater(nbytes, 0)
+
+        # Fresh: served from the cache without a request.
+        self.assertEqual(cache.get_json(self.session, url, "npm", "a"), ({"name": "a"}, 0))
+        self.assertEqual(len(self.server.requests), 1)
+
+        # Stale: a conditional request, answered with 304.
+        body, _ = cache.get_json(self.session, url, "npm", "a", max_age=0)
+        self.assertEqual(body, {"name": "a"})
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["revalidated"], 1)
+
+    def test_get_json_sends_etag_and_last_modified(self):
+        url = self.serve("/doc", b'{"v": 1}')
+        cache = FetchCache(self.root)
+        cache.get_json(self.session, url, "npm", "doc")
+        self.assertNotIn("If-None-Match", self.last_headers())
+
+        # A new instance reads the validators back from disk.
+        cache = FetchCache(self.root)
+        cache.get_json(self.session, url, "npm", "doc", max_age=0)
+        self.assertEqual(self.last_headers().get("If-None-Match"), ETAG)
+        self.assertEqual(self.last_headers().get("If-Modified-Since"), LAST_MODIFIED)
+
+        # Changed on the server: the new body and validators replace the old.
+        self.serve("/doc", b'{"v": 2}', etag='"v2"', last_modified=None)
+        self.assertEqual(cache.get_json(self.session, url, "npm", "doc", max_age=0)[0], {"v": 2})
+        cache.get_json(self.session, url, "npm", "doc", max_age=0)
+        self.assertEqual(self.last_headers().get("If-None-Match"), '"v2"')
+        self.assertNotIn("If-Modified-Since", self.last_headers())
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["revalidated"], 2)
+
+    def test_get_json_last_modified_only(self):
+        url = self.serve("/doc", b'{"v": 1}', etag=None)
+        cache = FetchCache(self.root)
+        cache.get_json(self.session, url, "github", "doc")
+        body, _ = cache.get_json(self.session, url, "github", "doc", max_age=0)
+        self.assertEqual(body, {"v": 1})
+        self.assertNotIn("If-None-Match", self.last_headers())
+        self.assertEqual(self.last_headers().get("If-Modified-Since"), LAST_MODIFIED)
+        self.assertEqual(cache.stats()["revalidated"], 1)
+
+    def test_get_json_fresh_if_skips_revalidation(self):
+        url = self.serve("/doc", b'{"versions": {"1.0.0": {}}}')
+        cache = FetchCache(self.root)
+        cache.get_json(self.session, url, "npm", "doc")
+        body, nbytes = cache.get_json(self.session, url, "npm", "doc", max_age=0,
+                                      fresh_if=lambda doc: "1.0.0" in doc["versions"])
+        self.assertEqual(nbytes, 0)
+        self.assertEqual(len(self.server.requests), 1)
+
+    # -- offline mode -------------------------------------------------------
+
+    def test_offline_miss_raises(self):
+        url = self.serve("/doc", b"{}")
+        offline = FetchCache(self.root, offline=True)
+        with self.assertRaises(OfflineCacheMiss):
+            offline.get_json(self.session, url, "npm", "doc")
+        with self.assertRaises(OfflineCacheMiss):
+            offline.fetch_url_blob(self.session, url, "github", "zip")
+        with self.assertRaises(OfflineCacheMiss):
+            offline.fetch_blob(self.session, url, "sha512", hashlib.sha512(b"{}").digest())
+        self.assertEqual(self.server.requests, [])
+
+    def test_offline_uses_stale_entries(self):
+        doc_url = self.serve("/doc", b'{"v": 1}')
+        blob_url = self.serve("/repo.zip", b"zip bytes")
+        FetchCache(self.root).get_json(self.session, doc_url, "npm", "doc")
+        FetchCache(self.root).fetch_url_blob(self.session, blob_url, "github", "zip")
+        requests_made = len(self.server.requests)
+
+        offline = FetchCache(self.root, offline=True)
+        self.assertEqual(offline.get_json(self.session, doc_url, "npm", "doc", max_age=0), ({"v": 1}, 0))
+        path, nbytes = offline.fetch_url_blob(self.session, blob_url, "github", "zip", max_age=0)
+        self.assertEqual(nbytes, 0)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"zip bytes")
+        self.assertEqual(len(self.server.requests), requests_made)
+
+    # -- content-addressed blobs --------------------------------------------
+
+    def test_fetch_blob_downloads_once(self):
+        data = b"tarball" * 1000
+        url = self.serve("/a.tgz", data)
+        cache = FetchCache(self.root)
+        digest = hashlib.sha512(data).digest()
+        path, nbytes = cache.fetch_blob(self.session, url, "sha512", digest)
+        self.assertEqual(nbytes, len(data))
+        self.assertEqual(path, cache.blob_path("sha512", digest))
+        self.assertEqual(cache.fetch_blob(self.session, url, "sha512", digest), (path, 0))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_fetch_blob_integrity_mismatch_is_discarded(self):
+        url = self.serve("/a.tgz", b"tampered")
+        cache = FetchCache(self.root)
+        expected = hashlib.sha512(b"original").digest()
+        with self.assertRaises(ValueError):
+            cache.fetch_blob(self.session, url, "sha512", expected)
+        self.assertIsNone(cache.lookup_blob("sha512", expected))
+        self.assertIsNone(cache.lookup_blob("sha512", hashlib.sha512(b"tampered").digest()))
+        self.assertEqual(os.listdir(os.path.join(self.root, "tmp")), [])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "blobs")))
+
+    # -- URL-addressed blobs ------------------------------------------------
+
+    def test_fetch_url_blob_revalidates_with_304(self):
+        url = self.serve("/repo.zip", b"PK zip")
+        cache = FetchCache(self.root)
+        path, nbytes = cache.fetch_url_blob(self.session, url, "github", "repo")
+        self.assertEqual(nbytes, len(b"PK zip"))
+        self.assertEqual(cache.fetch_url_blob(self.session, url, "github", "repo"), (path, 0))
+        self.assertEqual(len(self.server.requests), 1)
+
+        self.assertEqual(cache.fetch_url_blob(self.session, url, "github", "repo", max_age=0), (path, 0))
+        self.assertEqual(self.last_headers().get("If-None-Match"), ETAG)
+        self.assertEqual(self.last_headers().get("If-Modified-Since"), LAST_MODIFIED)
+        self.assertEqual(cache.stats()["revalidated"], 1)
+
+    def test_fetch_url_blob_refetches_when_blob_is_gone(self):
+        url = self.serve("/repo.zip", b"PK zip")
+        cache = FetchCache(self.root)
+        path, _ = cache.fetch_url_blob(self.session, url, "github", "repo")
+        os.remove(path)
+        # No cached body to fall back on, so no conditional request either.
+        self.assertEqual(cache.fetch_url_blob(self.session, url, "github", "repo", max_age=0)[0], path)
+        self.assertNotIn("If-None-Match", self.last_headers())
+        self.assertTrue(os.path.exists(path))
+
+    def test_fetch_url_blob_validate_rejects(self):
+        url = self.serve("/repo.zip", b"<html>rate limited</html>")
+        cache = FetchCache(self.root)
+        with self.assertRaises(ValueError):
+            cache.fetch_url_blob(self.session, url, "github", "repo", validate=lambda path: False)
+        digest = hashlib.sha256(b"<html>rate limited</html>").digest()
+        self.assertIsNone(cache.lookup_blob("sha256", digest))
+        self.assertIsNone(cache._read_doc("github", "repo"))
+
+    # -- pruning ------------------------------------------------------------
+
+    def test_prune_drops_least_recently_used(self):
+        cache = FetchCache(self.root, max_bytes=350)
+        blobs = [bytes([i]) * 100 for i in range(4)]
+        paths = [cache.store_blob([blob])[0] for blob in blobs[:3]]
+        for i, path in enumerate(paths):
+            os.utime(path, (1000 + i, 1000 + i))
+        # A lookup marks the oldest blob as used again.
+        self.assertEqual(cache.lookup_blob("sha512", hashlib.sha512(blobs[0]).digest()), paths[0])
+
+        # 400 bytes is over budget: the least recently used blob goes.
+        paths.append(cache.store_blob([blobs[3]])[0])
+        self.assertEqual([os.path.exists(p) for p in paths], [True, False, True, True])
+        self.assertIsNone(cache.lookup_blob("sha512", hashlib.sha512(blobs[1]).digest()))
+
+    def test_prune_sizes_existing_store(self):
+        FetchCache(self.root).store_blob([b"x" * 200])
+        cache = FetchCache(self.root, max_bytes=250)
+        old = cache.blob_path("sha512", hashlib.sha512(b"x" * 200).digest())
+        os.utime(old, (1000, 1000))
+        new, _ = cache.store_blob([b"y" * 100])
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+
+
+if __name__ == "__main__":
+    unittest.main()